@@ -1,37 +1,64 @@
-import random
-import urllib.request
-import urllib.error
-import json
+# http.client, json ומודול הדילר נטענים רק בפעם הראשונה שפונים לדילר, כדי שהעלייה של המשחק לא תחכה להם
+import sqlite3
+import threading
+from typing import TYPE_CHECKING
 from models import Player, NumberBet, ColorBet, ParityBet, BaseBet
+from bet_engine import DEFAULT_TABLE
 from database import DatabaseManager
+from player_cache import PlayerCache
+from metrics import timed
+from rng import SecureRNG, WheelRNG
+
+if TYPE_CHECKING:
+    from dealer import DealerCache, KeepAliveClient
 
 class MainController:
     """
     מנהל העבודה (The Controller) של אפליקציית הרולטה בארכיטקטורת ה- MVC.
     זה החלק שמקשר בין הממשק כניסה/יציאה (Views) לבין האלמנטים הדאגים למידע והאחסון (Models & Database).
     """
-    def __init__(self, db_manager: DatabaseManager):
+    DEALER_URL = "http://localhost:11434/api/generate"
+    DEALER_MODEL = "llama3"
+    DEALER_OFFLINE_MESSAGE = "Dealer AI is offline. Please make sure Ollama is running in Docker (http://localhost:11434)."
+
+    def __init__(self, db_manager: DatabaseManager, dealer_cache: "DealerCache" = None, player_cache: PlayerCache = None,
+                 dealer_cache_file: str = None, rng: WheelRNG = None, replay_log=None):
         self.db = db_manager # שמירת הרפרנס למנהל מסד הנתונים
+        self.player_cache = player_cache # מטמון שחקנים בזיכרון (לא חובה); בלעדיו כל כניסה היא קריאה אחת למסד
         self.current_player = None # בתחילת התוכנית, עדיין לא התחבר שחקן למערכת
+        self._dealer_cache = dealer_cache # מטמון תשובות הדילר; אם לא ניתן, נוצר בשאלה הראשונה
+        self.dealer_cache_file = dealer_cache_file # קובץ SQLite לשמירת המטמון בין הפעלות (None = בזיכרון בלבד)
+        self._dealer_http = None # חיבור ה- Keep-Alive אל Ollama, נפתח רק כשצריך
+        self.rng = rng or SecureRNG() # מנוע ההגרלה (rng.py); ברירת המחדל קריפטוגרפית
+        self.replay_log = replay_log # יומן שחזור (replay.ReplayLog) לא חובה - כל סיבוב נרשם בו לאימות מאוחר יותר
 
+    @timed("login_or_register")
     def login_or_register(self, name: str, default_balance=5000.0) -> Player:
         """
         מנסה לטעון שחקן מהמאגר על פי שמו. אם השם קיים, מביא אותו. אם לא, פותח שחקן חדש.
+        הכל דרך login_player של המסד (או מהזיכרון, אם השחקן כבר נמצא במטמון השחקנים).
         """
-        player_data = self.db.load_player(name)
-        if player_data:
-            self.current_player = Player(
-                player_data["id"], 
-                player_data["name"], 
-                player_data["balance"]
-            )
+        if self.player_cache is not None:
+            self.current_player = self.player_cache.login(name, default_balance)
         else:
-            # מתקבל ID חדש ממסד הנתונים שמייצר אחד רציף למשתמש חדש (AUTOINCREMENT)
-            new_id = self.db.create_player(name, default_balance)
-            self.current_player = Player(new_id, name, default_balance)
-            
+            # מתקבל ID חדש ממסד הנתונים שמייצר אחד רציף למשתמש חדש (AUTOINCREMENT), או ה- ID הקיים
+            player_data = self.db.login_player(name, default_balance)
+            self.current_player = Player(player_data["id"], player_data["name"], player_data["balance"])
+
         return self.current_player
 
+    def delete_player(self, player_id: int):
+        """
+        מוחקת שחקן וכל הנתונים שלו. קודם הוא יוצא ממטמון השחקנים, כדי שכניסה הבאה באותו שם לא תחזיר את האובייקט הישן
+        (עם המזהה שנמחק).
+        """
+        if self.player_cache is not None:
+            self.player_cache.forget(player_id)
+        self.db.delete_player(player_id)
+        if self.current_player is not None and self.current_player.player_id == player_id:
+            self.current_player = None
+
+    @timed("resolve_spin")
     def resolve_spin(self, bet: BaseBet) -> dict:
         """
         הפונקציה שמנהלת את לוגיקת הסיבוב ברולטה:
@@ -43,7 +70,8 @@ class MainController:
         if not self.current_player.can_afford(bet.amount):
             raise ValueError("Insufficient funds for this bet.") # השלכת שגיאה אם השחקן ניסה להמר על כסף שכלל לא קיים אצלו
             
-        winning_number = random.randint(0, 36) # הגרלת הרולטה האמיתית בעזרת Random (בין 0 ל 36 כמו באירופה)
+        winning_number = self._spin_wheel() # הגרלת הרולטה האמיתית בעזרת מנוע ההגרלה (בין 0 ל 36 כמו באירופה)
+        self._begin_replay()
         is_win = bet.is_winning_bet(winning_number)
         
         # חישוב כספים
@@ -59,14 +87,21 @@ class MainController:
             status = "LOSS"
             
         # הרגע שבו אנחנו מבקשים מה-DB לכתוב את כל הנתונים של המשחק פיזית לקובץ השמירה
-        self.db.update_player_balance(self.current_player.player_id, self.current_player.get_balance())
-        self.db.record_bet_history(
-            self.current_player.player_id,
-            bet.get_description(),
-            bet.amount,
-            status,
-            winning_number
-        )
+        # היתרה ושורת ההיסטוריה נשמרות בטרנזקציה אחת כדי שלא ייצאו מסנכרון
+        try:
+            self.db.settle_spin(
+                self.current_player.player_id,
+                self.current_player.get_balance(),
+                bet.get_description(),
+                bet.amount,
+                status,
+                winning_number
+            )
+        except sqlite3.Error:
+            # הסיבוב לא נשמר (למשל database is locked) - מחזירים גם את היתרה בזיכרון, כדי שלא תסטה מהמסד
+            self.current_player.update_balance(-(payout - bet.amount))
+            raise
+        self._after_settle(winning_number, 1)
         
         # החזרת אובייקט עם תשובות המשחק לטובת ה- views שיוכל להדפיס זאת בקונסול
         return {
@@ -76,29 +111,177 @@ class MainController:
             "new_balance": self.current_player.get_balance()
         }
 
+    @timed("resolve_slip")
+    def resolve_slip(self, bets: list[BaseBet]) -> dict:
+        """
+        סיבוב אחד עבור טופס הימורים (Slip) שלם - כמה הימורים על אותו מספר זוכה, כמו בשולחן אמיתי:
+        1. בודקת פעם אחת אם יש תקציב לכל הטופס.
+        2. מגרילה מספר זוכה אחד בלבד.
+        3. מחשבת את כל ההימורים במעבר אחד.
+        4. שומרת את היתרה ואת כל שורות ההיסטוריה בטרנזקציה אחת.
+        """
+        if not bets:
+            raise ValueError("Betting slip is empty.")
+        total_wager = sum(bet.amount for bet in bets)
+        if not self.current_player.can_afford(total_wager):
+            raise ValueError("Insufficient funds for this betting slip.")
+
+        winning_number = self._spin_wheel()
+        self._begin_replay()
+
+        # כל הטופס מקומפל לוקטור (רשומה בטבלה, סכום), והתשלומים נשלפים משורת המספר הזוכה במטריצת התשלומים
+        payouts = DEFAULT_TABLE.settle(DEFAULT_TABLE.compile_slip(bets), winning_number)
+        total_payout = sum(payouts)
+
+        results = []
+        bet_rows = []
+        for bet, payout in zip(bets, payouts):
+            is_win = payout > 0
+            results.append({"bet": bet, "is_win": is_win, "payout": payout})
+            bet_rows.append((bet.get_description(), bet.amount, "WIN" if is_win else "LOSS"))
+
+        # הרווח הנקי של הטופס כולו: כל התשלומים פחות כל הסכומים שהונחו על השולחן
+        self.current_player.update_balance(total_payout - total_wager)
+        try:
+            self.db.settle_slip(
+                self.current_player.player_id,
+                self.current_player.get_balance(),
+                winning_number,
+                bet_rows
+            )
+        except sqlite3.Error:
+            self.current_player.update_balance(total_wager - total_payout)
+            raise
+        self._after_settle(winning_number, len(bet_rows))
+
+        return {
+            "winning_number": winning_number,
+            "results": results,
+            "total_wager": total_wager,
+            "total_payout": total_payout,
+            "new_balance": self.current_player.get_balance()
+        }
+
+    @timed("rng")
+    def _spin_wheel(self) -> int:
+        """ההגרלה עצמה, בפונקציה נפרדת כדי שהזמן שלה יופיע בנפרד במדדים."""
+        return self.rng.spin()
+
+    def _begin_replay(self):
+        """פעם אחת לכל שחקן ביומן השחזור: רושמת את נקודת ההתחלה שלו (היתרה לפני הסיבוב ומיקומו בהיסטוריה)."""
+        if self.replay_log is not None:
+            self.replay_log.begin(self.db, self.current_player.player_id, self.current_player.get_balance())
+
+    def _after_settle(self, winning_number: int, bet_count: int):
+        """היתרה כבר נכתבה (או נכנסה לתור ה- Write-Behind) יחד עם ההיסטוריה; הסיבוב נרשם גם ביומן השחזור, אם יש."""
+        if self.replay_log is not None:
+            self.replay_log.record(self.current_player.player_id, winning_number, bet_count, self.current_player.get_balance())
+
+    def _dealer_payload(self, prompt: str, stream: bool) -> dict:
+        """גוף הבקשה (JSON) שנשלח אל Ollama."""
+        return {
+            "model": self.DEALER_MODEL,  # הדרישה לשימוש במודל סטנדרטי שנמצא ברקע של Ollama
+            "prompt": f"You are a snarky casino roulette dealer. Answer this question briefly: {prompt}",
+            "stream": stream
+        }
+
+    @property
+    def dealer_cache(self) -> "DealerCache":
+        """מטמון תשובות הדילר. נוצר (וגם נטען מהקובץ) רק כשהוא נדרש לראשונה."""
+        if self._dealer_cache is None:
+            from dealer import DealerCache
+            self._dealer_cache = DealerCache(db_file=self.dealer_cache_file)
+        return self._dealer_cache
+
+    def _dealer_client(self) -> "KeepAliveClient":
+        """החיבור הקבוע (Keep-Alive) אל Ollama נפתח בפעם הראשונה שפונים לדילר ומשמש את כל השאלות הבאות."""
+        if self._dealer_http is None:
+            from dealer import KeepAliveClient
+            # Timeout של 5 שניות שאם התוכנה יורדת למטה האפליקציה ב- Python לא תתקע ותקרוס
+            self._dealer_http = KeepAliveClient(self.DEALER_URL, timeout=5)
+        return self._dealer_http
+
+    @timed("ask_ai_dealer")
     def ask_ai_dealer(self, prompt: str) -> str:
         """
         דרישת השילוב של AI במסוף:
         מבצע התקשרות HTTP פנימית אל המכולה (Docker) של Ollama שמריצה את מודל llama3
         בכתובת 11434. זה מאפשר לקבל תוכן AI מקומית לחלוטין.
+        תשובות נשמרות במטמון, כך ששאלה שכבר נשאלה חוזרת מיד בלי לפנות למודל.
         """
-        url = "http://localhost:11434/api/generate"
-        payload = {
-            "model": "llama3",  # הדרישה לשימוש במודל סטנדרטי שנמצא ברקע של Ollama
-            "prompt": f"You are a snarky casino roulette dealer. Answer this question briefly: {prompt}",
-            "stream": False # נרצה שהתשובה תחזור כבלוק 1 ב- JSON
-        }
-        
+        import http.client
+        cached = self.dealer_cache.get(self.DEALER_MODEL, prompt)
+        if cached is not None:
+            return cached
         try:
-            # מרכיבים את בקשת הרשת (Request) ושולחים כ-JSON דרגן urllib
-            req = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'))
-            req.add_header('Content-Type', 'application/json')
-            
-            # ביצוע הקריאה, פועלת עם Timeout של 5 שניות שאם התוכנה יורדת למטה האפליקציה ב- Python לא תתקע ותקרוס
-            with urllib.request.urlopen(req, timeout=5) as response:
-                result = json.loads(response.read().decode('utf-8'))
-                return result.get("response", "The AI is silent...") # אם הייתה הצלחה מוחזר הטקסט של ה-AI
-                
-        except (urllib.error.URLError, TimeoutError):
+            # נרצה שהתשובה תחזור כבלוק 1 ב- JSON
+            result = self._dealer_client().post_json(self._dealer_payload(prompt, stream=False))
+        except (OSError, http.client.HTTPException, ValueError):
             # טיפול במצב שבו הדוקר כבוי או Ollama לא מותקן - לא נקריס את התוכנה למנהל באקדמיה לעולם!
-            return "Dealer AI is offline. Please make sure Ollama is running in Docker (http://localhost:11434)."
+            return self.DEALER_OFFLINE_MESSAGE
+        if "error" in result:
+            # Ollama החזיר שגיאה בגוף התשובה - כמו דוקר כבוי, ובלי לשמור אותה במטמון
+            return self.DEALER_OFFLINE_MESSAGE
+        if "response" not in result:
+            return "The AI is silent..."
+        self.dealer_cache.put(self.DEALER_MODEL, prompt, result["response"])
+        return result["response"] # אם הייתה הצלחה מוחזר הטקסט של ה-AI
+
+    def stream_ai_dealer(self, prompt: str):
+        """
+        גרסת ה- Streaming של הדילר: גנרטור שמחזיר כל מילה (Token) ברגע שהיא מגיעה מ- Ollama,
+        במקום לחכות לכל התשובה. Ollama שולח שורת JSON נפרדת (NDJSON) לכל חתיכה, והאחרונה מסומנת ב- done.
+        תשובה מהמטמון מוחזרת כחתיכה אחת מיידית, ותשובה מלאה שהגיעה ב- Streaming נשמרת במטמון.
+        """
+        import http.client
+        import json
+        cached = self.dealer_cache.get(self.DEALER_MODEL, prompt)
+        if cached is not None:
+            yield cached
+            return
+        tokens = []
+        done = False
+        try:
+            # קריאה שורה-שורה מהחיבור - כל שורה מגיעה ברגע ש- Ollama שולח אותה.
+            # ממשיכים לקרוא גם אחרי done עד סוף הגוף, כדי שהחיבור יישאר פתוח לשאלה הבאה
+            for line in self._dealer_client().stream_lines(self._dealer_payload(prompt, stream=True)):
+                if not line.strip() or done:
+                    continue
+                chunk = json.loads(line.decode('utf-8'))
+                if "error" in chunk:
+                    # Ollama מדווח על תקלה (גם באמצע ה- Streaming) בשורה עם error במקום response
+                    raise ValueError(chunk["error"])
+                if chunk.get("response"):
+                    tokens.append(chunk["response"])
+                    yield chunk["response"]
+                done = bool(chunk.get("done"))
+        except (OSError, http.client.HTTPException, ValueError):
+            # הודעת ה- Offline רק אם עוד לא נשלחה אף מילה; תשובה שנקטעה באמצע פשוט נגמרת (ולא נשמרת במטמון)
+            if not tokens:
+                yield self.DEALER_OFFLINE_MESSAGE
+            return
+        if done:
+            self.dealer_cache.put(self.DEALER_MODEL, prompt, "".join(tokens))
+
+    def ask_ai_dealer_in_background(self, prompt: str, on_token, on_done=None) -> threading.Thread:
+        """
+        מריצה את הדילר ב- Thread רקע כדי שתפריט ההימורים ימשיך לעבוד בזמן שהדילר "מדבר".
+        on_token נקראת עבור כל מילה שמגיעה, ו- on_done (אם ניתנה) בסוף התשובה.
+        """
+        def worker():
+            for token in self.stream_ai_dealer(prompt):
+                on_token(token)
+            if on_done:
+                on_done()
+
+        thread = threading.Thread(target=worker, name="ai-dealer", daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        """סוגרת את מה שנפתח בשביל הדילר (החיבור ל- Ollama והמטמון), אם נפתח בכלל."""
+        if self._dealer_http is not None:
+            self._dealer_http.close()
+            self._dealer_http = None
+        if self._dealer_cache is not None:
+            self._dealer_cache.close()
@@ -0,0 +1,316 @@
+# benchmark.py
+# חבילת מדידות ביצועים (Benchmarks) למנוע ההימורים, למסד הנתונים ולדילר.
+# כל מדידה רצה מול קובץ casino.db זמני (ולא מול הקובץ האמיתי), התוצאות נכתבות ל- JSON,
+# ואפשר להשוות אותן לקובץ בסיס (Baseline) שמור עם סף נסיגה (Regression) לכל מדד.
+#
+# דוגמאות:
+#   python benchmark.py --output results.json --save-baseline benchmark_baseline.json
+#   python benchmark.py --baseline benchmark_baseline.json --threshold 0.15 --threshold-for history_10000000_p99_ms=0.5
+#   python benchmark.py --only settlement,dealer --history-sizes 10000
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bet_engine import DEFAULT_TABLE
+from database import DatabaseManager
+from dealer import DealerCache
+from MainController import MainController
+from models import ColorBet, NumberBet, ParityBet, TableBet
+
+WORKLOADS = ("settlement", "resolve_spin", "record_history", "history", "dealer", "startup")
+DEFAULT_HISTORY_SIZES = (10_000, 1_000_000, 10_000_000)
+
+
+def _percentiles(samples_ns: list, prefix: str) -> dict:
+    """p50/p99/ממוצע (במילישניות) מתוך רשימת זמנים בננו-שניות."""
+    ordered = sorted(samples_ns)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] / 1e6
+
+    return {
+        f"{prefix}_p50_ms": (pick(0.50), "ms", "lower"),
+        f"{prefix}_p99_ms": (pick(0.99), "ms", "lower"),
+        f"{prefix}_mean_ms": (sum(ordered) / len(ordered) / 1e6, "ms", "lower"),
+    }
+
+
+def _rate(count: int, elapsed_ns: int, name: str) -> dict:
+    return {name: (count / (elapsed_ns / 1e9), "ops/s", "higher")}
+
+
+def bench_settlement(n: int = 200_000) -> dict:
+    """התשלום של הימורי models.py בלבד, בלי מסד ובלי הגרלה: is_winning_bet + מכפיל, ואז טופס שלם דרך טבלת התשלומים."""
+    rng = random.Random(0)
+    numbers = [rng.randint(0, 36) for _ in range(n)]
+    bets = [NumberBet(10, 17), ColorBet(10, "red"), ParityBet(10, "even"), TableBet(10, "dozen:2")]
+    results = {}
+    for bet in bets:
+        start = time.perf_counter_ns()
+        total = 0
+        for number in numbers:
+            if bet.is_winning_bet(number):
+                total += bet.amount * bet.get_payout_multiplier()
+        results.update(_rate(n, time.perf_counter_ns() - start, f"settle_{type(bet).__name__}_ops"))
+
+    compiled = DEFAULT_TABLE.compile_slip(bets)
+    start = time.perf_counter_ns()
+    for number in numbers:
+        DEFAULT_TABLE.settle(compiled, number)
+    results.update(_rate(n, time.perf_counter_ns() - start, "settle_slip4_ops"))
+    return results
+
+
+def bench_resolve_spin(workdir: str, n: int = 5_000) -> dict:
+    """resolve_spin מקצה לקצה (הגרלה, תשלום, כתיבה לקובץ) - פעם במצב כתיבה מיידית ופעם עם Write-Behind."""
+    results = {}
+    for label, write_behind in (("resolve_spin", False), ("resolve_spin_write_behind", True)):
+        db = DatabaseManager(os.path.join(workdir, f"{label}.db"), write_behind=write_behind)
+        try:
+            controller = MainController(db)
+            controller.login_or_register("bench", 1e12)
+            bet = ColorBet(10, "red")
+            samples = []
+            start = time.perf_counter_ns()
+            for _ in range(n):
+                t0 = time.perf_counter_ns()
+                controller.resolve_spin(bet)
+                samples.append(time.perf_counter_ns() - t0)
+            db.flush()  # הכתיבות שבתור הן חלק מהעבודה
+            results.update(_rate(n, time.perf_counter_ns() - start, f"{label}_ops"))
+            results.update(_percentiles(samples, label))
+        finally:
+            db.close()
+    return results
+
+
+def bench_record_history(workdir: str, n: int = 5_000) -> dict:
+    """זמן ההשהיה (Latency) של כתיבת שורת היסטוריה בודדת עם commit."""
+    db = DatabaseManager(os.path.join(workdir, "record_history.db"))
+    try:
+        player_id = db.create_player("bench", 5000.0)
+        samples = []
+        for i in range(n):
+            t0 = time.perf_counter_ns()
+            db.record_bet_history(player_id, "Color Red", 10.0, "WIN" if i % 2 else "LOSS", i % 37)
+            samples.append(time.perf_counter_ns() - t0)
+        return _percentiles(samples, "record_bet_history")
+    finally:
+        db.close()
+
+
+def _seed_history(db_file: str, start_row: int, end_row: int, players: int):
+    """
+    ממלאת את טבלת ההיסטוריה ישירות (חיבור נפרד, טרנזקציה אחת ו- executemany) עד end_row שורות,
+    מפוזרות בסבב בין players שחקנים - כמו טבלה אמיתית שבה השחקן הנמדד הוא רק חלק קטן מהשורות.
+    """
+    descs = [entry.description for entry in (DEFAULT_TABLE.get("color:red"), DEFAULT_TABLE.get("number:17"))]
+    conn = sqlite3.connect(db_file)
+    try:
+        conn.execute("PRAGMA synchronous = OFF")
+        with conn:
+            conn.executemany(
+                "INSERT INTO history (player_id, bet_desc, amount, status, outcome_number) VALUES (?, ?, ?, ?, ?)",
+                ((i % players + 1, descs[i % 2], 10.0, "WIN" if i % 3 == 0 else "LOSS", i % 37) for i in range(start_row, end_row))
+            )
+    finally:
+        conn.close()
+
+
+def bench_history(workdir: str, sizes=DEFAULT_HISTORY_SIZES, players: int = 1000, queries: int = 500) -> dict:
+    """
+    get_player_history (20 השורות האחרונות) על טבלאות בגדלים שונים. הטבלה גדלה בהדרגה מהגודל הקטן לגדול,
+    כך שהמילוי של 10M שורות נעשה פעם אחת בלבד.
+    """
+    db_file = os.path.join(workdir, "history.db")
+    db = DatabaseManager(db_file)
+    try:
+        for i in range(players):
+            db.create_player(f"bench{i}", 5000.0)
+        seeded = 0
+        rng = random.Random(0)
+        results = {}
+        for size in sorted(sizes):
+            _seed_history(db_file, seeded, size, players)
+            seeded = size
+            samples = []
+            for _ in range(queries):
+                player_id = rng.randint(1, players)
+                t0 = time.perf_counter_ns()
+                db.get_player_history(player_id)
+                samples.append(time.perf_counter_ns() - t0)
+            results.update(_percentiles(samples, f"history_{size}"))
+        return results
+    finally:
+        db.close()
+
+
+class _StubDealerHandler(BaseHTTPRequestHandler):
+    """שרת דמה במקום Ollama: מחזיר תשובה קבועה מיד, עם Keep-Alive (HTTP/1.1)."""
+    protocol_version = "HTTP/1.1"
+    # הכותרות והגוף נכתבים בשתי קריאות; בלי זה Nagle + Delayed ACK מוסיפים כ- 40ms לכל תשובה ומסתירים את מה שנמדד
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({"response": "The house always wins.", "done": True}).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def bench_dealer(n: int = 1_000) -> dict:
+    """סבב מלא של ask_ai_dealer מול שרת דמה מקומי. כל שאלה שונה, כך שהמטמון לא מקצר את הדרך."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubDealerHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        controller = MainController(None, DealerCache())
+        controller.DEALER_URL = f"http://127.0.0.1:{server.server_address[1]}/api/generate"
+        samples = []
+        for i in range(n):
+            t0 = time.perf_counter_ns()
+            controller.ask_ai_dealer(f"benchmark question {i}")
+            samples.append(time.perf_counter_ns() - t0)
+        controller.close()
+        return _percentiles(samples, "dealer_round_trip")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def bench_startup(workdir: str, runs: int = 10) -> dict:
+    """
+    הזמן מהפעלת התהליך (python main.py) ועד שתפריט האפשרויות הראשון מחכה לקלט - כולל עליית המפרש, הייבוא,
+    פתיחת המסד והכניסה של השחקן. ההרצה הראשונה יוצרת את casino.db ונמדדת בנפרד; השאר רצות מול קובץ קיים.
+    """
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    samples = []
+    first_run = None
+    for i in range(runs + 1):
+        start = time.perf_counter_ns()
+        proc = subprocess.Popen([sys.executable, main_py], cwd=workdir, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        proc.stdin.write(b"bench\n")
+        proc.stdin.flush()
+        output = b""
+        while b"Select option" not in output:
+            chunk = proc.stdout.read1(4096)
+            if not chunk:
+                raise RuntimeError("main.py exited before showing the menu")
+            output += chunk
+        elapsed = time.perf_counter_ns() - start
+        proc.communicate(b"5\n")
+        if i == 0:
+            first_run = elapsed
+        else:
+            samples.append(elapsed)
+    results = {"startup_new_db_ms": (first_run / 1e6, "ms", "lower")}
+    results.update(_percentiles(samples, "startup"))
+    return results
+
+
+def run(workloads=WORKLOADS, history_sizes=DEFAULT_HISTORY_SIZES) -> dict:
+    """מריצה את המדידות שנבחרו ומחזירה את מסמך התוצאות (כפי שהוא נשמר ל- JSON)."""
+    metrics = {}
+    with tempfile.TemporaryDirectory(prefix="roulette-bench-") as workdir:
+        for workload in workloads:
+            print(f"Running {workload}...", file=sys.stderr)
+            if workload == "settlement":
+                found = bench_settlement()
+            elif workload == "resolve_spin":
+                found = bench_resolve_spin(workdir)
+            elif workload == "record_history":
+                found = bench_record_history(workdir)
+            elif workload == "history":
+                found = bench_history(workdir, history_sizes)
+            elif workload == "dealer":
+                found = bench_dealer()
+            else:
+                found = bench_startup(workdir)
+            metrics.update(found)
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sqlite": sqlite3.sqlite_version,
+        },
+        "results": {name: {"value": value, "unit": unit, "better": better} for name, (value, unit, better) in metrics.items()},
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float = 0.10, overrides: dict = None) -> list:
+    """
+    משווה את התוצאות לקובץ הבסיס ומחזירה רשימת נסיגות (שם, ערך בסיס, ערך נוכחי, שינוי יחסי).
+    מדד נחשב לנסיגה אם הוא גרוע מהבסיס ביותר מהסף שלו (ברירת המחדל threshold, או הסף שהוגדר לו ב- overrides).
+    מדדים שקיימים רק באחד הקבצים לא נבדקים.
+    """
+    overrides = overrides or {}
+    regressions = []
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None or not base["value"]:
+            continue
+        change = (result["value"] - base["value"]) / base["value"]
+        if result["better"] == "higher":
+            change = -change  # בתפוקה ירידה היא ההרעה
+        if change > overrides.get(name, threshold):
+            regressions.append((name, base["value"], result["value"], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Roulette performance benchmarks")
+    parser.add_argument("--only", default=",".join(WORKLOADS), help=f"comma-separated subset of: {', '.join(WORKLOADS)}")
+    parser.add_argument("--history-sizes", default=",".join(map(str, DEFAULT_HISTORY_SIZES)))
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=None, help="compare against this results file")
+    parser.add_argument("--save-baseline", default=None, help="also write the results to this baseline file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative slowdown (0.10 = 10%%)")
+    parser.add_argument("--threshold-for", action="append", default=[], metavar="METRIC=RATIO",
+                        help="per-metric threshold override (repeatable)")
+    opts = parser.parse_args()
+
+    workloads = [w.strip() for w in opts.only.split(",") if w.strip()]
+    unknown = set(workloads) - set(WORKLOADS)
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(sorted(unknown))}")
+    overrides = {}
+    for item in opts.threshold_for:
+        name, _, ratio = item.partition("=")
+        overrides[name] = float(ratio)
+
+    current = run(workloads, [int(s) for s in opts.history_sizes.split(",") if s])
+    for path in filter(None, (opts.output, opts.save_baseline)):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+
+    for name, result in current["results"].items():
+        print(f"{name}: {result['value']:.4f} {result['unit']}")
+
+    if opts.baseline:
+        with open(opts.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, opts.threshold, overrides)
+        for name, before, after, change in regressions:
+            print(f"REGRESSION {name}: {before:.4f} -> {after:.4f} ({change:+.1%} worse)")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# bet_engine.py
+# מנוע ההימורים: כל סוג הימור מתורגם ("מקומפל") פעם אחת למסכת ביטים (Bitmask) של 37 ביטים - ביט לכל מספר על הגלגל -
+# ולמכפיל תשלום. במקום קוד מסתעף והשוואות מחרוזות בכל סיבוב, בדיקת זכייה היא בדיקת ביט אחת,
+# וסגירת טופס הימורים שלם היא שליפת שורה מטבלה מחושבת מראש (37 על K) ומכפלה סקלרית (Dot Product) מול הסכומים.
+
+WHEEL_SIZE = 37  # רולטה אירופאית: המספרים 0 עד 36
+
+# קבוצה של כל המספרים האדומים ברולטה אירופאית קלאסית
+RED_NUMBERS = frozenset({1, 3, 5, 7, 9, 12, 14, 16, 18, 19, 21, 23, 25, 27, 30, 32, 34, 36})
+
+
+def numbers_to_mask(numbers) -> int:
+    """ממירה אוסף מספרים על הגלגל למסכת ביטים (ביט n דולק אם המספר n זוכה)."""
+    mask = 0
+    for n in numbers:
+        if not 0 <= n < WHEEL_SIZE:
+            raise ValueError(f"Number {n} is not on the wheel.")
+        mask |= 1 << n
+    return mask
+
+
+class TableEntry:
+    """
+    שורה אחת בטבלת התשלומים: מפתח, תיאור, מסכת הזכייה ומכפיל התשלום (כולל הקרן, כמו ב- models.py).
+    לרשומה של הימור מותאם אישית (ראו PayoutTable.compile_bet) אין עמודה במטריצה, וה- index שלה הוא -1.
+    """
+    __slots__ = ("index", "key", "description", "mask", "multiplier")
+
+    def __init__(self, index: int, key: str, description: str, mask: int, multiplier: int):
+        self.index = index
+        self.key = key
+        self.description = description
+        self.mask = mask
+        self.multiplier = multiplier
+
+    def wins(self, winning_number: int) -> bool:
+        return (self.mask >> winning_number) & 1 == 1
+
+
+class PayoutTable:
+    """
+    טבלת התשלומים המרכזית. כל הימור אפשרי הוא רשומה (Entry) בטבלה, ולכן הוספת סוג הימור חדש
+    (Split, Street, Corner וכו') היא רק הוספת רשומה - בלי מחלקה חדשה ובלי לוגיקה חדשה.
+    """
+    CUSTOM_CACHE_SIZE = 1024  # כמות ההימורים המותאמים אישית (לפי מחלקה ותיאור) שנשמרים מקומפלים
+
+    def __init__(self):
+        self._entries = []
+        self._by_key = {}
+        self._by_description = {}  # תיאור (כפי שנשמר בהיסטוריה) -> רשומה
+        self._matrix = None  # מטריצת 37 על K שנבנית בעצלות (Lazy) ומתאפסת כשנוספת רשומה
+        self._custom = {}  # (מחלקה, תיאור) -> רשומה מקומפלת של הימור מותאם אישית, מחוץ לטבלה
+        self._custom_by_description = {}
+
+    def register(self, key: str, numbers, multiplier: int, description: str = None) -> TableEntry:
+        """מוסיפה (או מחזירה אם כבר קיימת) רשומה לטבלה."""
+        if key in self._by_key:
+            return self._by_key[key]
+        entry = TableEntry(len(self._entries), key, description or key, numbers_to_mask(numbers), multiplier)
+        self._entries.append(entry)
+        self._by_key[key] = entry
+        self._by_description.setdefault(entry.description, entry)
+        self._matrix = None
+        return entry
+
+    def get(self, key: str) -> TableEntry:
+        """מחזירה את הרשומה לפי מפתח, או None אם אין כזו."""
+        return self._by_key.get(key)
+
+    def get_by_description(self, description: str) -> TableEntry:
+        """מחזירה את הרשומה לפי התיאור שנשמר בטבלת ההיסטוריה (או של הימור מותאם אישית שקומפל לאחרונה), או None אם אין כזו."""
+        entry = self._by_description.get(description)
+        return entry if entry is not None else self._custom_by_description.get(description)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._by_key
+
+    @property
+    def matrix(self) -> list:
+        """
+        מטריצת התשלומים: matrix[n][k] הוא המכפיל שרשומה k משלמת כשיוצא המספר n (או 0 בהפסד).
+        """
+        if self._matrix is None:
+            self._matrix = [
+                [e.multiplier if (e.mask >> n) & 1 else 0 for e in self._entries]
+                for n in range(WHEEL_SIZE)
+            ]
+        return self._matrix
+
+    def compile_bet(self, bet) -> TableEntry:
+        """
+        מקמפלת אובייקט BaseBet לרשומה בטבלה. הימורים עם get_table_key() נשלפים ישירות;
+        מחלקות הימור אחרות (שלא מכירות את הטבלה) מקומפלות ע"י הרצת is_winning_bet על כל 37 המספרים לרשומה שלא נכנסת לטבלה
+        עצמה - כך הן לא מגדילות את הטבלה המשותפת ולא מאפסות את המטריצה. הרשומות נשמרות במטמון לפי המחלקה והתיאור,
+        שמתרוקן כשהוא מגיע ל- CUSTOM_CACHE_SIZE (הימורים עם תיאור חדש בכל פעם לא צוברים זיכרון).
+        """
+        entry = self._by_key.get(bet.get_table_key())
+        if entry is not None:
+            return entry
+        description = bet.get_description()
+        key = (type(bet).__name__, description)
+        entry = self._custom.get(key)
+        if entry is None:
+            mask = numbers_to_mask(n for n in range(WHEEL_SIZE) if bet.is_winning_bet(n))
+            entry = TableEntry(-1, f"custom:{key[0]}:{description}", description, mask, bet.get_payout_multiplier())
+            if len(self._custom) >= self.CUSTOM_CACHE_SIZE:
+                self._custom.clear()
+                self._custom_by_description.clear()
+            self._custom[key] = entry
+            self._custom_by_description[description] = entry
+        return entry
+
+    def compile_slip(self, bets) -> list:
+        """מקמפלת טופס הימורים לרשימה של (רשומה, סכום) - וקטור ההימורים הדליל."""
+        return [(self.compile_bet(bet), bet.amount) for bet in bets]
+
+    def settle(self, compiled_slip: list, winning_number: int) -> list:
+        """
+        מחזירה את התשלום לכל הימור בטופס (0 בהפסד). סכום הרשימה הוא המכפלה הסקלרית של השורה בסכומים;
+        הימור מותאם אישית (בלי עמודה במטריצה) נבדק מול מסכת הביטים שלו.
+        """
+        row = self.matrix[winning_number]
+        return [
+            (row[entry.index] if entry.index >= 0 else entry.multiplier * entry.wins(winning_number)) * amount
+            for entry, amount in compiled_slip
+        ]
+
+
+def build_standard_table() -> PayoutTable:
+    """בונה את טבלת התשלומים הסטנדרטית של רולטה אירופאית."""
+    table = PayoutTable()
+    numbers = range(1, WHEEL_SIZE)
+
+    # הימורים פנימיים (Inside Bets)
+    for n in range(WHEEL_SIZE):
+        table.register(f"number:{n}", [n], 36, f"Number {n}")
+    for n in numbers:
+        if n % 3 != 0:  # שכנים באותה שורה
+            table.register(f"split:{n}-{n + 1}", [n, n + 1], 18, f"Split {n}/{n + 1}")
+        if n <= 33:  # שכנים באותו טור
+            table.register(f"split:{n}-{n + 3}", [n, n + 3], 18, f"Split {n}/{n + 3}")
+    for n in (1, 2, 3):
+        table.register(f"split:0-{n}", [0, n], 18, f"Split 0/{n}")
+    for first in range(1, WHEEL_SIZE, 3):
+        table.register(f"street:{first}", [first, first + 1, first + 2], 12, f"Street {first}-{first + 2}")
+    for n in range(1, 33):
+        if n % 3 != 0:
+            corner = [n, n + 1, n + 3, n + 4]
+            table.register("corner:" + "-".join(map(str, corner)), corner, 9, "Corner " + "/".join(map(str, corner)))
+
+    # הימורים חיצוניים (Outside Bets) - 0 תמיד מפסיד בהם
+    table.register("color:red", RED_NUMBERS, 2, "Color Red")
+    table.register("color:black", [n for n in numbers if n not in RED_NUMBERS], 2, "Color Black")
+    table.register("parity:even", [n for n in numbers if n % 2 == 0], 2, "Parity Even")
+    table.register("parity:odd", [n for n in numbers if n % 2 == 1], 2, "Parity Odd")
+    table.register("range:low", range(1, 19), 2, "Low 1-18")
+    table.register("range:high", range(19, 37), 2, "High 19-36")
+    for d in (1, 2, 3):
+        table.register(f"dozen:{d}", range(12 * d - 11, 12 * d + 1), 3, f"Dozen {d} ({12 * d - 11}-{12 * d})")
+    for c in (1, 2, 3):
+        table.register(f"column:{c}", [n for n in numbers if (n - c) % 3 == 0], 3, f"Column {c}")
+    return table
+
+
+# הטבלה המשותפת שבה משתמשים המודלים וה- Controller
+DEFAULT_TABLE = build_standard_table()
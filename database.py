@@ -1,32 +1,103 @@
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+from models import GameHistoryRecord
+from stats import PlayerStats, iter_spins, spin_key
+from metrics import timed
 
 class DatabaseManager:
     """
     מנהל מסד הנתונים שמטפל בכל האינטראקציות מול מסד הנתונים SQLite3.
-    כאשר המחלקה נוצרת, היא פותחת חיבור ובודקת האם הטבלאות הנדרשות קיימות במידה ולא יוצרת אותן.
+    כאשר המחלקה נוצרת, היא פותחת חיבור אחד ארוך-טווח (Persistent Connection) ובודקת האם הטבלאות הנדרשות קיימות במידה ולא יוצרת אותן.
+    החיבור משותף לכל המתודות ומוגן במנעול (Lock) כך שניתן להשתמש במנהל גם מכמה Threads.
     """
-    def __init__(self, db_file="casino.db"):
+    # כמות ה-Prepared Statements ש-sqlite3 שומר במטמון לכל חיבור (ברירת המחדל של פייתון היא 128)
+    STATEMENT_CACHE_SIZE = 256
+    STATS_RECENT_SIZE = 10  # כמות התוצאות האחרונות שנשמרות בסטטיסטיקה של כל שחקן
+
+    def __init__(self, db_file="casino.db", write_behind=False, flush_every=500, flush_interval=1.0):
         self.db_file = db_file  # קובץ שעליו נשמר נתוני ה SQLite
+        self._lock = threading.RLock()  # מנעול שמונע משני Threads לעבוד על החיבור בו זמנית
+        self._stats = {}  # player_id -> PlayerStats שנטענו לזיכרון
+        self._dirty_stats = set()  # שחקנים שהסטטיסטיקה שלהם עודכנה בזיכרון ועוד לא נכתבה
+        self._conn = self._open_connection()
         self._initialize_db()
 
-    def _get_connection(self):
-        """צורת חיבור אל מסד הנתונים, מתודה שעוזרת לנו לפתוח התקשרות (Connection)."""
-        return sqlite3.connect(self.db_file)
+        # מצב Write-Behind: סיבובים נאספים בזיכרון ונכתבים לדיסק במנות (Group Commit)
+        self.write_behind = write_behind
+        self.flush_every = flush_every  # כמות שורות בתור שמפעילה כתיבה מיידית
+        self.flush_interval = flush_interval  # מספר השניות המקסימלי ששורה ממתינה בתור
+        self._pending_balances = {}  # player_id -> היתרה האחרונה (רק האחרונה רלוונטית)
+        self._pending_history = []  # שורות היסטוריה שממתינות ל- executemany
+        self._stop_flusher = threading.Event()
+        self._flusher = None
+        self.flush_errors = 0  # ניסיונות ריקון של התור שנכשלו (למשל database is locked) ונדחו לסבב הבא
+        if write_behind:
+            self._flusher = threading.Thread(target=self._flush_loop, name="db-write-behind", daemon=True)
+            self._flusher.start()
 
-    def _initialize_db(self):
+    def _open_connection(self) -> sqlite3.Connection:
+        """
+        פותח את החיבור הקבוע ומגדיר את ה-PRAGMA פעם אחת בלבד בעליית המערכת:
+        WAL מאפשר קריאות במקביל לכתיבה, ו- synchronous=NORMAL חוסך fsync על כל commit.
+        auto_vacuum חייב להיקבע לפני כל כתיבה לקובץ חדש (גם לפני המעבר ל- WAL); בקובץ קיים הוא לא משנה כלום,
+        וההמרה נעשית פעם אחת דרך retention.py --convert-vacuum.
+        """
+        conn = sqlite3.connect(
+            self.db_file,
+            check_same_thread=False,
+            cached_statements=self.STATEMENT_CACHE_SIZE
+        )
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _get_connection(self):
         """
-        פונקציה זו מרכזת את כל פקודות ה- DDl (Data Definition Language).
-        עוברת ויוצרת טבלאות של 'שחקן' ושל 'היסטוריית הימורים'.
+        צורת חיבור אל מסד הנתונים. במקום לפתוח חיבור חדש בכל קריאה, מחזירה את החיבור הקבוע
+        תחת מנעול ובתוך טרנזקציה (commit בהצלחה, rollback במקרה של שגיאה).
         """
-        query_players = '''
+        if self._conn is None:
+            raise sqlite3.ProgrammingError("DatabaseManager is closed.")
+        with self._lock:
+            with self._conn:
+                yield self._conn
+
+    def close(self):
+        """סגירה מסודרת של החיבור הקבוע בזמן כיבוי התוכנית (כולל ריקון תור ה- Write-Behind). בטוח לקריאה יותר מפעם אחת."""
+        self._stop_flusher.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        with self._lock:
+            if self._conn is not None:
+                self.flush()
+                self._conn.close()
+                self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # רשימת ההגירות (Migrations) של הסכמה, לפי הסדר. הגרסה של קובץ נשמרת ב- PRAGMA user_version, והגרסה הנוכחית
+    # של הקוד היא מספר ההגירות ברשימה. מוסיפים רק בסוף הרשימה - לעולם לא משנים הגירה שכבר שוחררה.
+    # כולן כתובות עם IF NOT EXISTS, כי קבצים מלפני הגירסאות (user_version = 0) כבר מכילים חלק מהטבלאות.
+    MIGRATIONS = (
+        # 1: הטבלאות הבסיסיות של שחקנים והיסטוריית הימורים
+        (
+            '''
             CREATE TABLE IF NOT EXISTS players (
                 id INTEGER PRIMARY KEY AUTOINCREMENT, 
                 name TEXT UNIQUE NOT NULL,
                 balance REAL NOT NULL
             )
-        '''
-        query_history = '''
+            ''',
+            '''
             CREATE TABLE IF NOT EXISTS history (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 player_id INTEGER,
@@ -37,22 +108,118 @@ class DatabaseManager:
                 timestamp TEXT,
                 FOREIGN KEY(player_id) REFERENCES players(id)
             )
-        '''
+            ''',
+        ),
+        # 2: אינדקס מורכב: סינון לפי שחקן ומיון לפי id יורד נעשים ישירות מהאינדקס, בלי סריקה ובלי מיון
+        (
+            "CREATE INDEX IF NOT EXISTS idx_history_player_id ON history (player_id, id)",
+        ),
+        # 3: צבירה מתמשכת של סטטיסטיקות לכל שחקן (מתעדכנת יחד עם ההיסטוריה באותה טרנזקציה)
+        (
+            '''
+            CREATE TABLE IF NOT EXISTS player_stats (
+                player_id INTEGER PRIMARY KEY,
+                spins INTEGER NOT NULL,
+                total_bets INTEGER NOT NULL,
+                total_wagered REAL NOT NULL,
+                net_pl REAL NOT NULL,
+                max_win REAL NOT NULL,
+                max_loss REAL NOT NULL,
+                win_count INTEGER NOT NULL,
+                outcome_counts TEXT NOT NULL,
+                recent TEXT NOT NULL
+            )
+            ''',
+        ),
+        # 4: סיכומים יומיים לכל שחקן של שורות היסטוריה שעברו לארכיון (retention.py), באותן עמודות כמו player_stats
+        (
+            '''
+            CREATE TABLE IF NOT EXISTS history_daily (
+                player_id INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                spins INTEGER NOT NULL,
+                total_bets INTEGER NOT NULL,
+                total_wagered REAL NOT NULL,
+                net_pl REAL NOT NULL,
+                max_win REAL NOT NULL,
+                max_loss REAL NOT NULL,
+                win_count INTEGER NOT NULL,
+                outcome_counts TEXT NOT NULL,
+                PRIMARY KEY (player_id, day)
+            )
+            ''',
+        ),
+        # 5: מזהה סיבוב לכל שורת היסטוריה - ה- id של השורה הראשונה באותו סיבוב (ראו _write_settlements).
+        # לשורות ישנות אין מזהה אמיתי, ולכן הן מקבלות אותו פעם אחת לפי הקיבוץ הישן: שורות רצופות של אותו שחקן
+        # עם אותו זמן ואותו מספר זוכה. קודם מסומנות השורות שפותחות סיבוב (השורה הקודמת של השחקן שונה או שאין כזו)
+        (
+            "ALTER TABLE history ADD COLUMN spin_id INTEGER",
+            '''
+            UPDATE history SET spin_id = id WHERE NOT EXISTS (
+                SELECT 1 FROM history AS prev
+                WHERE prev.id = (SELECT MAX(id) FROM history AS p WHERE p.player_id = history.player_id AND p.id < history.id)
+                  AND prev.timestamp IS history.timestamp AND prev.outcome_number IS history.outcome_number
+            )
+            ''',
+            # שאר השורות מקבלות את המזהה של השורה הקודמת הקרובה של אותו שחקן שכבר יש לה מזהה (תחילת הסיבוב).
+            # תת-שאילתות מתואמות ולא UPDATE ... FROM או פונקציות חלון, שדורשים SQLite חדש (3.33 / 3.25)
+            '''
+            UPDATE history SET spin_id = (
+                SELECT s.spin_id FROM history AS s
+                WHERE s.player_id = history.player_id AND s.id < history.id AND s.spin_id IS NOT NULL
+                ORDER BY s.id DESC LIMIT 1
+            ) WHERE spin_id IS NULL
+            ''',
+        ),
+        # 6: מטמון תשובות הדילר (dealer.DealerCache), לפי (מודל, שאלה מנורמלת), כדי שישרוד בין הפעלות
+        (
+            '''
+            CREATE TABLE IF NOT EXISTS dealer_cache (
+                model TEXT NOT NULL,
+                prompt TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (model, prompt)
+            )
+            ''',
+        ),
+    )
+
+    @property
+    def schema_version(self) -> int:
         with self._get_connection() as conn:
-            # ה-Cursor מריץ שאילתות על מסד הנתונים
-            cursor = conn.cursor()
-            cursor.execute(query_players)
-            cursor.execute(query_history)
-            # פעולת commit שומרת את השינויים סופית לקובץ
-            conn.commit()
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def _initialize_db(self):
+        """
+        מביאה את הסכמה לגרסה העדכנית. בהפעלה רגילה (קובץ שכבר עדכני) זו קריאה אחת של PRAGMA user_version בלי שום DDL;
+        אחרת רצות רק ההגירות החסרות, כל אחת בטרנזקציה משלה יחד עם עדכון הגרסה, כך שהגירה שנכשלה באמצע לא נרשמת.
+        """
+        version = self.schema_version
+        if version > len(self.MIGRATIONS):
+            raise sqlite3.DatabaseError(
+                f"{self.db_file} has schema version {version}, newer than this version of the game ({len(self.MIGRATIONS)})."
+            )
+        for number, statements in enumerate(self.MIGRATIONS[version:], start=version + 1):
+            with self._get_connection() as conn:
+                # sqlite3 פותח טרנזקציה אוטומטית רק לפני INSERT/UPDATE/DELETE, ופקודות DDL רצות אצלו ב- Autocommit.
+                # ה- BEGIN המפורש עוטף את כל ההגירה (כולל user_version, שנשמר בכותרת הקובץ) בטרנזקציה אחת,
+                # וה- with של החיבור עושה לה commit, או rollback אם אחת הפקודות נכשלה
+                conn.execute("BEGIN")
+                for statement in statements:
+                    conn.execute(statement)
+                # PRAGMA לא מקבל פרמטרים (?), אבל number הוא תמיד מספר שלם מהקוד עצמו
+                conn.execute(f"PRAGMA user_version = {number}")
 
     # --- לוגיקה הקשורה לשחקן (Player) ---
+    @timed("db.load_player")
     def load_player(self, name: str) -> dict:
         """
         מבצעת טעינה (Read) של נתוני השחקן מקובץ מסד הנתונים של SQLite.
         אם השחקן לא קיים, הפונקציה מחזירה None.
         """
         query = "SELECT id, name, balance FROM players WHERE name = ?"
+        self.flush()  # קודם כותבים את מה שממתין בתור ה- Write-Behind כדי שהמסד יהיה עדכני
         with self._get_connection() as conn:
             cursor = conn.cursor()
             # מחליפים את הסימן '?' בערך של השם
@@ -62,6 +229,15 @@ class DatabaseManager:
                 return {"id": row[0], "name": row[1], "balance": row[2]}
         return None
 
+    @timed("db.load_player_by_id")
+    def load_player_by_id(self, player_id: int) -> dict:
+        """כמו load_player, אבל לפי המזהה."""
+        self.flush()
+        with self._get_connection() as conn:
+            row = conn.execute("SELECT id, name, balance FROM players WHERE id = ?", (player_id,)).fetchone()
+        return {"id": row[0], "name": row[1], "balance": row[2]} if row else None
+
+    @timed("db.create_player")
     def create_player(self, name: str, starting_balance: float) -> int:
         """
         יוצר שחקן חדש (Create) ומחזיר את מזהה ה-ID הספציפי שלו מתוך מסד הנתונים.
@@ -74,58 +250,467 @@ class DatabaseManager:
             # השגת המזהה החדש ש- SQLite נתן לשורה כרגע
             return cursor.lastrowid
 
+    @timed("db.login_player")
+    def login_player(self, name: str, starting_balance: float) -> dict:
+        """
+        כניסה או הרשמה: שחקן קיים נטען ב- SELECT אחד (בלי כתיבה למסד), ורק שם חדש מוסיף שורה.
+        ההכנסה היא INSERT OR IGNORE ואחריה SELECT נוסף, כך שאם תהליך אחר רשם את אותו שם בינתיים, מקבלים את השורה שלו
+        במקום שגיאה על השם הייחודי (UNIQUE). כל ניסיון INSERT מקדם את מונה ה- AUTOINCREMENT גם כשהוא לא מוסיף שורה,
+        ולכן לא מנסים להכניס שם שכבר קיים.
+        """
+        query_load = "SELECT id, name, balance FROM players WHERE name = ?"
+        self.flush()
+        with self._get_connection() as conn:
+            row = conn.execute(query_load, (name,)).fetchone()
+            if row is None:
+                conn.execute("INSERT OR IGNORE INTO players (name, balance) VALUES (?, ?)", (name, starting_balance))
+                row = conn.execute(query_load, (name,)).fetchone()
+            return {"id": row[0], "name": row[1], "balance": row[2]}
+
+    @timed("db.update_player_balance")
     def update_player_balance(self, player_id: int, new_balance: float):
         """
         מעדכן (Update) את התקציב של השחקן בתוך המסד, מופעל לאחר סיום ההימור.
         """
         query = "UPDATE players SET balance = ? WHERE id = ?"
+        self.flush()
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, (new_balance, player_id))
             conn.commit()
             
+    @timed("db.delete_player")
     def delete_player(self, player_id: int):
         """פועלת עבור (Delete), מחיקת כל הנתונים השייכים לשחקן לחלוטין."""
+        self.flush()
         with self._get_connection() as conn:
             cursor = conn.cursor()
             # חייבים קודם למחוק את ההיסטוריה ואז שחקן, למניעת בעיות "מפתח זר" (Foreign Key)
             cursor.execute("DELETE FROM history WHERE player_id = ?", (player_id,))
+            cursor.execute("DELETE FROM player_stats WHERE player_id = ?", (player_id,))
+            cursor.execute("DELETE FROM history_daily WHERE player_id = ?", (player_id,))
             cursor.execute("DELETE FROM players WHERE id = ?", (player_id,))
             conn.commit()
+        self._invalidate_stats(player_id)
+
+    def reserve_id_range(self, first_id: int, last_id: int):
+        """
+        מעבירה את המונים של AUTOINCREMENT (שחקנים והיסטוריה) לתחילת הטווח [first_id, last_id], כך שלכל קובץ (Shard) יש טווח מזהים
+        משלו ואפשר לדעת מהמזהה לבד באיזה קובץ הוא נמצא (sharding.py). קובץ שכבר יש בו מזהים מחוץ לטווח שייך לחלוקה אחרת.
+        """
+        self.flush()
+        with self._get_connection() as conn:
+            for table in ("players", "history"):
+                lowest, highest = conn.execute(f"SELECT MIN(id), MAX(id) FROM {table}").fetchone()
+                if lowest is not None and (lowest < first_id or highest > last_id):
+                    raise sqlite3.DatabaseError(
+                        f"{self.db_file} has {table} ids outside {first_id}-{last_id}; it belongs to a different shard layout."
+                    )
+                row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,)).fetchone()
+                if row is None:
+                    conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)", (table, first_id - 1))
+                elif row[0] < first_id - 1:
+                    conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = ?", (first_id - 1, table))
+
+    # --- דוחות על כל השחקנים ---
+    @timed("db.get_leaderboard")
+    def get_leaderboard(self, limit: int = 10) -> list:
+        """השחקנים עם היתרה הגבוהה ביותר, כרשימה של (id, name, balance)."""
+        self.flush()
+        with self._get_connection() as conn:
+            return conn.execute("SELECT id, name, balance FROM players ORDER BY balance DESC, id LIMIT ?", (limit,)).fetchall()
+
+    @timed("db.get_casino_totals")
+    def get_casino_totals(self) -> dict:
+        """סיכום על כל השחקנים: כמה שחקנים, וסך הסיבובים, ההימורים, הסכום שהומר והרווח/ההפסד שלהם (מטבלת player_stats)."""
+        self.flush()
+        with self._get_connection() as conn:
+            players = conn.execute("SELECT COUNT(*) FROM players").fetchone()[0]
+            spins, bets, wagered, net = conn.execute(
+                "SELECT COALESCE(SUM(spins), 0), COALESCE(SUM(total_bets), 0), COALESCE(SUM(total_wagered), 0.0), "
+                "COALESCE(SUM(net_pl), 0.0) FROM player_stats"
+            ).fetchone()
+        return {"players": players, "spins": spins, "total_bets": bets, "total_wagered": wagered, "net_pl": net}
 
     # --- לוגיקה הקשורה להיסטורית המשחקים (History) ---
+    @timed("db.record_bet_history")
     def record_bet_history(self, player_id: int, bet_desc: str, amount: float, status: str, outcome_number: int):
         """
         שומרת שורה בהיסטוריית הרולטה לאחר הפעלה - הימור, סכום, תוצאה והאם התבצע רווח או לא.
         """
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        query = '''
-            INSERT INTO history (player_id, bet_desc, amount, status, outcome_number, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?)
+        self.flush()
+        with self._lock:
+            # השורה והסטטיסטיקה המעודכנת של השחקן נכתבות יחד באותה טרנזקציה
+            self._write_now({}, [[(player_id, bet_desc, amount, status, outcome_number, timestamp, 0)]])
+
+    # --- סגירת סיבוב (Settlement) ---
+    @timed("db.settle_spin")
+    def settle_spin(self, player_id: int, new_balance: float, bet_desc: str, amount: float, status: str, outcome_number: int):
+        """
+        שומרת את תוצאת הסיבוב כיחידה אטומית אחת: עדכון היתרה ושורת ההיסטוריה נכתבים באותה טרנזקציה,
+        כך שקריסה באמצע לא תשאיר יתרה שלא תואמת להיסטוריה.
+        במצב Write-Behind הסיבוב נכנס לתור ונכתב יחד עם סיבובים אחרים ב- commit אחד.
+        """
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        row = (player_id, bet_desc, amount, status, outcome_number, timestamp, 0)
+        self._queue_or_write({player_id: new_balance}, [[row]])
+
+    @timed("db.settle_slip")
+    def settle_slip(self, player_id: int, new_balance: float, outcome_number: int, bet_rows: list):
+        """
+        שומרת סיבוב של טופס הימורים (Slip) שלם: עדכון יתרה אחד וכל שורות ההיסטוריה בהכנסה מרוכזת אחת (executemany).
+        bet_rows היא רשימה של (bet_desc, amount, status) - שורה לכל הימור בטופס.
+        """
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = [(player_id, desc, amount, status, outcome_number, timestamp, index)
+                for index, (desc, amount, status) in enumerate(bet_rows)]
+        self._queue_or_write({player_id: new_balance}, [rows])
+
+    @timed("db.settle_table")
+    def settle_table(self, outcome_number: int, settlements: list):
+        """
+        שומרת סיבוב של שולחן שלם - כל השחקנים שהימרו על אותו מספר זוכה - בטרנזקציה אחת.
+        settlements היא רשימה של (player_id, new_balance, bet_rows) כמו ב- settle_slip.
+        """
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        balances = {}
+        spins = []
+        for player_id, new_balance, bet_rows in settlements:
+            balances[player_id] = new_balance
+            spins.append([(player_id, desc, amount, status, outcome_number, timestamp, index)
+                          for index, (desc, amount, status) in enumerate(bet_rows)])
+        self._queue_or_write(balances, [rows for rows in spins if rows])
+
+    @timed("db.flush")
+    def flush(self):
+        """כותבת לדיסק את כל מה שממתין בתור ה- Write-Behind בטרנזקציה אחת."""
+        with self._lock:
+            if not self._pending_balances and not self._pending_history:
+                return
+            self._write_settlements(self._pending_balances, self._pending_history)
+            # מנקים את התור רק אחרי שהכתיבה הצליחה, כדי לא לאבד סיבובים במקרה של שגיאה
+            self._pending_balances = {}
+            self._pending_history = []
+
+    def _queue_or_write(self, balances: dict, spins: list):
+        """
+        כותבת מיד בטרנזקציה אחת, או במצב Write-Behind מכניסה לתור ומרוקנת כשהמנה מלאה.
+        spins היא רשימה של סיבובים, וכל סיבוב הוא רשימת שורות היסטוריה של שחקן אחד:
+        (player_id, bet_desc, amount, status, outcome_number, timestamp, המיקום של השורה בתוך הסיבוב).
+        """
+        with self._lock:
+            if not self.write_behind:
+                self._write_now(balances, spins)
+                return
+            # טעינת הסטטיסטיקה של שחקן חדש עלולה לרוקן את התור (backfill_stats), ולכן כולם נטענים לפני שמשהו מהסיבוב נכנס לתור:
+            # אחרת שורות ההיסטוריה של שחקן אחד היו נכתבות בלי היתרה החדשה שלו
+            for rows in spins:
+                self._stats_for(rows[0][0])
+            # במצב Write-Behind הסטטיסטיקה בזיכרון מתעדכנת מיד, ונכתבת לדיסק יחד עם התור
+            for rows in spins:
+                self._apply_stats(rows[0][0], rows)
+                self._pending_history.extend(rows)
+            self._pending_balances.update(balances)
+            if len(self._pending_history) >= self.flush_every:
+                try:
+                    self.flush()
+                except sqlite3.Error:
+                    # הסיבוב כבר בתור ונחשב שמור; ה- Thread ברקע ינסה לכתוב שוב, כמו ב- _flush_loop
+                    self.flush_errors += 1
+
+    def _write_now(self, balances: dict, spins: list):
+        """כתיבה מיידית של סיבובים כולל עדכון הסטטיסטיקה. אם הכתיבה נכשלת, הסטטיסטיקה בזיכרון נזרקת ותיטען מחדש."""
+        for rows in spins:
+            self._apply_stats(rows[0][0], rows)
+        try:
+            self._write_settlements(balances, [row for rows in spins for row in rows])
+        except sqlite3.Error:
+            for rows in spins:
+                self._invalidate_stats(rows[0][0])
+            raise
+
+    @timed("db.commit")
+    def _write_settlements(self, balances: dict, history_rows: list):
+        """
+        כתיבה באצווה (executemany) של יתרות, שורות היסטוריה והסטטיסטיקות שהשתנו, בתוך טרנזקציה אחת.
+        מזהה הסיבוב (spin_id) הוא ה- id של השורה הראשונה בסיבוב: ה- id הבא הוא הערך ב- sqlite_sequence ועוד 1 (הוא מתעדכן
+        אחרי כל שורה, גם בתוך executemany), ומזה מורידים את המיקום של השורה בסיבוב. הכתיבה מחזיקה את נעילת הכתיבה של הקובץ,
+        ולכן המזהה נכון גם כשכמה תהליכים כותבים לאותו מסד.
+        """
+        query_balance = "UPDATE players SET balance = ? WHERE id = ?"
+        query_history = '''
+            INSERT INTO history (player_id, bet_desc, amount, status, outcome_number, timestamp, spin_id)
+            VALUES (?, ?, ?, ?, ?, ?, COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'history'), 0) + 1 - ?)
         '''
         with self._get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute(query, (player_id, bet_desc, amount, status, outcome_number, timestamp))
-            conn.commit()
+            cursor.executemany(query_balance, [(balance, pid) for pid, balance in balances.items()])
+            cursor.executemany(query_history, history_rows)
+            self._write_stats(cursor, [self._stats[pid] for pid in self._dirty_stats if pid in self._stats])
+        self._dirty_stats.clear()
+
+    def _flush_loop(self):
+        """Thread רקע שמרוקן את התור כל flush_interval שניות, גם כשאין מספיק סיבובים למנה מלאה."""
+        while not self._stop_flusher.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # השורות נשארות בתור וננסה שוב בסבב הבא
+                self.flush_errors += 1
+
+    # --- סטטיסטיקות שחקן (Stats) ---
+    @timed("db.get_player_stats")
+    def get_player_stats(self, player_id: int) -> PlayerStats:
+        """
+        מחזירה את הסטטיסטיקה המצטברת של השחקן ב- O(1) מהזיכרון.
+        בפעם הראשונה היא נטענת מטבלת player_stats, או מחושבת פעם אחת מתוך ההיסטוריה הקיימת (Backfill).
+        """
+        with self._lock:
+            return self._stats_for(player_id)
+
+    @timed("db.backfill_stats")
+    def backfill_stats(self, player_id: int = None):
+        """
+        מחשבת מחדש את הסטטיסטיקות (לשחקן אחד או לכולם) ושומרת אותן: קודם הסיכומים היומיים של שורות שכבר הועברו לארכיון
+        (history_daily), ואחריהם השורות שעדיין בטבלת ההיסטוריה, מקובצות לסיבובים עם stats.iter_spins.
+        """
+        query = "SELECT player_id, bet_desc, amount, status, outcome_number, timestamp, spin_id FROM history"
+        query_daily = "SELECT * FROM history_daily"
+        params = ()
+        if player_id is not None:
+            query += " WHERE player_id = ?"
+            query_daily += " WHERE player_id = ?"
+            params = (player_id,)
+        query += " ORDER BY player_id, id"
+        query_daily += " ORDER BY player_id, day"
+        self.flush()
+        with self._get_connection() as conn:
+            rebuilt = {}
+            if player_id is not None:
+                rebuilt[player_id] = PlayerStats(player_id, self.STATS_RECENT_SIZE)
+            for row in conn.execute(query_daily, params):
+                if row[0] not in rebuilt:
+                    rebuilt[row[0]] = PlayerStats(row[0], self.STATS_RECENT_SIZE)
+                rebuilt[row[0]].merge(self._daily_stats(row))
+            # הקורסור עובר על השורות אחת-אחת (Streaming) ולא טוען את כל הטבלה לזיכרון
+            for pid, _, outcome, bet_rows in iter_spins(conn.execute(query, params)):
+                if pid not in rebuilt:
+                    rebuilt[pid] = PlayerStats(pid, self.STATS_RECENT_SIZE)
+                rebuilt[pid].apply_spin(outcome, bet_rows)
+
+            if player_id is None:
+                conn.execute("DELETE FROM player_stats")
+            self._write_stats(conn.cursor(), list(rebuilt.values()))
+            if player_id is None:
+                self._stats = {}
+            self._stats.update(rebuilt)
+
+    @staticmethod
+    def _daily_stats(row) -> PlayerStats:
+        """שורה של history_daily כ- PlayerStats (אותן עמודות כמו player_stats, עם day ובלי recent)."""
+        return PlayerStats.from_row(tuple(row[:1]) + tuple(row[2:]) + ("",))
 
+    def _stats_for(self, player_id: int) -> PlayerStats:
+        stats = self._stats.get(player_id)
+        if stats is None:
+            with self._get_connection() as conn:
+                row = conn.execute("SELECT * FROM player_stats WHERE player_id = ?", (player_id,)).fetchone()
+            if row:
+                stats = self._stats[player_id] = PlayerStats.from_row(row, self.STATS_RECENT_SIZE)
+            else:
+                self.backfill_stats(player_id)
+                stats = self._stats[player_id]
+        return stats
+
+    def _apply_stats(self, player_id: int, history_rows: list):
+        """מעדכנת בזיכרון את הסטטיסטיקה של השחקן עם סיבוב אחד (כל השורות של אותו מספר זוכה)."""
+        self._stats_for(player_id).apply_spin(history_rows[0][4], [(r[1], r[2], r[3]) for r in history_rows])
+        self._dirty_stats.add(player_id)
+
+    def _write_stats(self, cursor, stats_list: list):
+        query = "INSERT OR REPLACE INTO player_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        cursor.executemany(query, [stats.to_row() for stats in stats_list])
+
+    def _invalidate_stats(self, player_id: int):
+        """זורקת את הסטטיסטיקה מהזיכרון כך שבפעם הבאה היא תיטען מחדש מהמסד."""
+        with self._lock:
+            self._stats.pop(player_id, None)
+            self._dirty_stats.discard(player_id)
+
+    @timed("db.get_player_history")
     def get_player_history(self, player_id: int, limit: int = 20):
         """
         מושכת ממסר הנתונים את ההיסטוריה העדכנית בהדגש על הזמנים (ORDER BY id DESC). 
         מוגבל ל- 20 משחקים כברירת מחדל כדי לא להעמיס.
         """
         query = "SELECT id, player_id, bet_desc, amount, status, outcome_number, timestamp FROM history WHERE player_id = ? ORDER BY id DESC LIMIT ?"
+        self.flush()
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, (player_id, limit))
             # fetchall() מחזירה את כל השורות שנמצאו
             return cursor.fetchall()
-            
+
+    def iter_player_history(self, player_id: int, page_size: int = 500, before_id: int = None):
+        """
+        גנרטור שמחזיר את היסטוריית השחקן מהחדש לישן כאובייקטי GameHistoryRecord, עמוד אחרי עמוד.
+        הדפדוף הוא לפי מפתח (Keyset Pagination - id < last_id) ולא לפי OFFSET, כך שכל עמוד עולה אותו דבר
+        והזיכרון קבוע גם עבור מאות אלפי שורות.
+        """
+        query = '''
+            SELECT id, player_id, bet_desc, amount, status, outcome_number, timestamp FROM history
+            WHERE player_id = ? AND id < ? ORDER BY id DESC LIMIT ?
+        '''
+        self.flush()
+        last_id = before_id if before_id is not None else 2 ** 63 - 1
+        while True:
+            with self._get_connection() as conn:
+                rows = conn.execute(query, (player_id, last_id, page_size)).fetchall()
+            # ה- yield נעשה מחוץ למנעול כדי שצרכן איטי לא יחסום את שאר המערכת
+            for row in rows:
+                yield GameHistoryRecord(*row)
+            if len(rows) < page_size:
+                return
+            last_id = rows[-1][0]
+
+    def iter_history_chunks(self, player_id: int, chunk_size: int = 50000, after_id: int = 0):
+        """
+        גנרטור שמחזיר את ההיסטוריה של השחקן מהישן לחדש (החל מאחרי after_id) כמנות של שורות גולמיות
+        (באותו מבנה כמו get_player_history). משמש למילוי HistoryFrame ולאימות יומן שחזור בלי ליצור אובייקט לכל שורה;
+        גם כאן הדפדוף הוא לפי מפתח (id > last_id).
+        """
+        query = '''
+            SELECT id, player_id, bet_desc, amount, status, outcome_number, timestamp FROM history
+            WHERE player_id = ? AND id > ? ORDER BY id LIMIT ?
+        '''
+        self.flush()
+        last_id = after_id
+        while True:
+            with self._get_connection() as conn:
+                rows = conn.execute(query, (player_id, last_id, chunk_size)).fetchall()
+            if rows:
+                yield rows
+            if len(rows) < chunk_size:
+                return
+            last_id = rows[-1][0]
+
+    @timed("db.last_history_id")
+    def last_history_id(self, player_id: int) -> int:
+        """ה- id של שורת ההיסטוריה האחרונה של השחקן (0 אם אין), ישירות מקצה האינדקס (player_id, id)."""
+        self.flush()
+        with self._get_connection() as conn:
+            return conn.execute("SELECT MAX(id) FROM history WHERE player_id = ?", (player_id,)).fetchone()[0] or 0
+
+    @timed("db.clear_player_history")
     def clear_player_history(self, player_id: int):
         """
         מוחקת במיוחד את היסטורית ההימורים של הישן בלבד מבלי למחוק את השחקן והיתרה שלו.
         """
         query = "DELETE FROM history WHERE player_id = ?"
+        self.flush()
         with self._get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(query, (player_id,))
+            # הסטטיסטיקה והסיכומים היומיים נגזרים מההיסטוריה, ולכן מתאפסים יחד איתה
+            cursor.execute("DELETE FROM player_stats WHERE player_id = ?", (player_id,))
+            cursor.execute("DELETE FROM history_daily WHERE player_id = ?", (player_id,))
             conn.commit()
+        self._invalidate_stats(player_id)
+
+    # --- שמירת היסטוריה לטווח ארוך (Retention) ---
+    @timed("db.compact_history")
+    def compact_history(self, cutoff: str, archive_file: str, chunk_size: int = 5000, max_chunks: int = None) -> dict:
+        """
+        מעבירה שורות היסטוריה ישנות מ- cutoff (חותמת זמן בפורמט של הטבלה) לקובץ ארכיון, ומשאירה במקומן סיכום יומי לכל שחקן
+        ב- history_daily. העבודה נעשית במנות של chunk_size שורות, כל מנה בטרנזקציות קצרות משלה, כך שסיבובים ממשיכים להיכתב במקביל.
+        כל מנה נכתבת קודם לארכיון (INSERT OR IGNORE לפי id) ורק אז נמחקת מכאן - אם התהליך נקטע באמצע, הרצה חוזרת משלימה בלי כפילויות.
+        הסטטיסטיקות של השחקנים (player_stats) לא משתנות: הן כבר כוללות את השורות האלו, ו- backfill_stats משחזר אותן מהסיכומים.
+        """
+        query = '''
+            SELECT id, player_id, bet_desc, amount, status, outcome_number, timestamp, spin_id FROM history
+            WHERE id > ? AND timestamp < ? ORDER BY id LIMIT ?
+        '''
+        self.flush()
+        archive = sqlite3.connect(archive_file)
+        report = {"moved": 0, "chunks": 0, "rollups": 0, "freed_pages": 0}
+        try:
+            with archive:
+                archive.execute('''
+                    CREATE TABLE IF NOT EXISTS history (
+                        id INTEGER PRIMARY KEY,
+                        player_id INTEGER,
+                        bet_desc TEXT,
+                        amount REAL,
+                        status TEXT,
+                        outcome_number INTEGER,
+                        timestamp TEXT,
+                        spin_id INTEGER
+                    )
+                ''')
+                # ארכיון שנוצר לפני spin_id מקבל את העמודה (השורות הישנות בו נשארות עם NULL)
+                if "spin_id" not in {row[1] for row in archive.execute("PRAGMA table_info(history)")}:
+                    archive.execute("ALTER TABLE history ADD COLUMN spin_id INTEGER")
+                archive.execute("CREATE INDEX IF NOT EXISTS idx_history_player_id ON history (player_id, id)")
+            last_id = 0
+            while max_chunks is None or report["chunks"] < max_chunks:
+                with self._get_connection() as conn:
+                    rows = conn.execute(query, (last_id, cutoff, chunk_size)).fetchall()
+                if not rows:
+                    break
+                if len(rows) == chunk_size:
+                    # לא חוצים סיבוב בין שתי מנות, אחרת הוא ייספר פעמיים בסיכום היומי
+                    last_key = self._row_spin_key(rows[-1])
+                    whole = len(rows)
+                    while whole > 1 and self._row_spin_key(rows[whole - 1]) == last_key:
+                        whole -= 1
+                    if whole > 1 or self._row_spin_key(rows[0]) != last_key:
+                        rows = rows[:whole]
+
+                with archive:
+                    archive.executemany(
+                        "INSERT OR IGNORE INTO history (id, player_id, bet_desc, amount, status, outcome_number, timestamp, spin_id) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+                    )
+
+                rollups = {}
+                for pid, timestamp, outcome, bet_rows in iter_spins(row[1:] for row in rows):
+                    key = (pid, timestamp[:10])
+                    if key not in rollups:
+                        rollups[key] = PlayerStats(pid)
+                    rollups[key].apply_spin(outcome, bet_rows)
+
+                with self._get_connection() as conn:
+                    for (pid, day), stats in rollups.items():
+                        existing = conn.execute("SELECT * FROM history_daily WHERE player_id = ? AND day = ?", (pid, day)).fetchone()
+                        if existing:
+                            stats.merge(self._daily_stats(existing))
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO history_daily VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        [(pid, day) + stats.to_row()[1:-1] for (pid, day), stats in rollups.items()]
+                    )
+                    conn.executemany("DELETE FROM history WHERE id = ?", [(row[0],) for row in rows])
+                report["freed_pages"] += self._incremental_vacuum()
+
+                last_id = rows[-1][0]
+                report["moved"] += len(rows)
+                report["rollups"] += len(rollups)
+                report["chunks"] += 1
+        finally:
+            archive.close()
+        return report
+
+    @staticmethod
+    def _row_spin_key(row) -> tuple:
+        """מפתח הסיבוב (stats.spin_key) של שורה מהשאילתה של compact_history."""
+        return spin_key(row[1], row[6], row[5], row[7])
+
+    def _incremental_vacuum(self) -> int:
+        """
+        מחזירה לדיסק את הדפים הפנויים (עובד רק בקובץ עם auto_vacuum = INCREMENTAL) ומחזירה כמה דפים שוחררו.
+        execute רגיל של sqlite3 עוצר אחרי צעד אחד של פקודה שלא מחזירה שורות (דף אחד), ולכן משתמשים ב- executescript.
+        """
+        with self._lock:
+            before = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+            self._conn.executescript("PRAGMA incremental_vacuum;")
+            return before - self._conn.execute("PRAGMA freelist_count").fetchone()[0]
@@ -0,0 +1,178 @@
+# dealer.py
+# תשתית הרשת של הדילר החכם: חיבור HTTP קבוע (Keep-Alive) אל Ollama, ומטמון (Cache) לתשובות
+# עם פינוי LRU ותפוגה לפי זמן (TTL), כך ששאלות כמעט-זהות (כמו תגובות לניצחון או הפסד) לא מחכות שוב לכל יצירת הטקסט.
+import http.client
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+
+class KeepAliveClient:
+    """
+    לקוח HTTP שמחזיק חיבור TCP אחד פתוח אל השרת ומשתמש בו שוב ושוב, במקום לפתוח חיבור חדש בכל בקשה כמו urllib.
+    אם השרת סגר את החיבור בינתיים, הבקשה נשלחת שוב פעם אחת על חיבור חדש.
+    """
+    def __init__(self, url: str, timeout: float = 5):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.path = parts.path or "/"
+        self.timeout = timeout
+        self._conn = None
+        self._lock = threading.Lock()  # חיבור אחד = בקשה אחת בכל רגע
+
+    def _connection(self) -> http.client.HTTPConnection:
+        if self._conn is None:
+            self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return self._conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _send(self, payload: dict) -> http.client.HTTPResponse:
+        body = json.dumps(payload).encode('utf-8')
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        for attempt in (1, 2):
+            try:
+                conn = self._connection()
+                conn.request("POST", self.path, body=body, headers=headers)
+                return conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # החיבור הישן נסגר בצד השרת - פותחים חדש ומנסים שוב פעם אחת
+                self.close()
+                if attempt == 2:
+                    raise
+            except (OSError, http.client.HTTPException):
+                self.close()
+                raise
+
+    @staticmethod
+    def _check_status(response: http.client.HTTPResponse):
+        """תשובה שאינה 200 (למשל מודל שלא הותקן) היא שגיאה, בדיוק כמו HTTPError של urllib."""
+        if response.status != 200:
+            detail = response.read().decode('utf-8', 'replace').strip()
+            raise http.client.HTTPException(f"HTTP {response.status}: {detail}")
+
+    def post_json(self, payload: dict) -> dict:
+        """שולחת בקשה ומחזירה את גוף התשובה כ- JSON."""
+        with self._lock:
+            response = self._send(payload)
+            try:
+                self._check_status(response)
+                # חייבים לקרוא את כל הגוף כדי שאפשר יהיה להשתמש שוב באותו חיבור
+                return json.loads(response.read().decode('utf-8'))
+            except (OSError, http.client.HTTPException):
+                self.close()
+                raise
+
+    def stream_lines(self, payload: dict):
+        """
+        גנרטור שמחזיר את שורות התשובה (NDJSON) אחת-אחת ברגע שהן מגיעות.
+        המנעול מוחזק רק בזמן שליחת הבקשה: החיבור יוצא מהלקוח לכל זמן הקריאה, כך שצרכן איטי (או כזה שנטש את הגנרטור
+        בלי לסגור אותו) לא חוסם בקשות אחרות - הן פשוט פותחות חיבור חדש. החיבור חוזר ללקוח רק אם התשובה נקראה עד הסוף.
+        """
+        with self._lock:
+            response = self._send(payload)
+            conn, self._conn = self._conn, None
+        reusable = False
+        try:
+            self._check_status(response)
+            while True:
+                line = response.readline()
+                if not line:
+                    break
+                yield line
+            # readline לא מסמן תשובה עם Content-Length כגמורה גם כשנקראה עד הסוף; read מסיים אותה (בלי לסגור את החיבור)
+            response.read()
+            reusable = response.isclosed()
+        finally:
+            # אם הצרכן הפסיק באמצע או שהייתה שגיאה, אי אפשר לדעת איפה עומד החיבור, ולכן הוא נסגר
+            self._release(conn, reusable)
+
+    def _release(self, conn: http.client.HTTPConnection, reusable: bool):
+        """מחזירה ללקוח חיבור שיצא ל- stream_lines, או סוגרת אותו (גם אם בינתיים נפתח ללקוח חיבור אחר)."""
+        with self._lock:
+            if reusable and self._conn is None:
+                self._conn = conn
+                return
+        conn.close()
+
+
+class DealerCache:
+    """
+    מטמון תשובות הדילר לפי (מודל, שאלה מנורמלת), עם גבול גודל (LRU) ותפוגה (TTL).
+    אפשר לשמור אותו גם בטבלה dealer_cache בקובץ של המשחק (למשל casino.db) כך שהוא שורד בין הפעלות.
+    הטבלה היא חלק מהסכמה של DatabaseManager (הגירה 6), שמביא את הקובץ לגרסה העדכנית לפני שהמטמון נטען ממנו.
+    """
+    def __init__(self, max_size: int = 256, ttl: float = 3600, db_file: str = None):
+        self.max_size = max_size
+        self.ttl = ttl  # בשניות
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # (model, prompt) -> (created_at, response)
+        self._lock = threading.Lock()
+        self._db = None
+        if db_file:
+            from database import DatabaseManager  # נטען רק כשהמטמון נשמר בקובץ
+            DatabaseManager(db_file).close()  # יצירת הקובץ / הגירת הסכמה (כולל dealer_cache)
+            self._db = sqlite3.connect(db_file, check_same_thread=False)
+            self._load()
+
+    @staticmethod
+    def normalize(prompt: str) -> str:
+        """נרמול השאלה: אותיות קטנות, רווחים מצומצמים ובלי סימני פיסוק בסוף."""
+        return re.sub(r"\s+", " ", prompt.strip().lower()).rstrip("?!. ")
+
+    def get(self, model: str, prompt: str) -> str:
+        """מחזירה את התשובה השמורה, או None אם אין כזו או שפג תוקפה."""
+        key = (model, self.normalize(prompt))
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and time.time() - item[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, model: str, prompt: str, response: str):
+        key = (model, self.normalize(prompt))
+        created_at = time.time()
+        with self._lock:
+            self._entries[key] = (created_at, response)
+            self._entries.move_to_end(key)
+            evicted = []
+            while len(self._entries) > self.max_size:
+                evicted.append(self._entries.popitem(last=False)[0])
+            if self._db is not None:
+                with self._db:
+                    self._db.execute("INSERT OR REPLACE INTO dealer_cache VALUES (?, ?, ?, ?)", (key[0], key[1], response, created_at))
+                    self._db.executemany("DELETE FROM dealer_cache WHERE model = ? AND prompt = ?", evicted)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries),
+                "hit_rate": self.hits / total if total else 0.0}
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _load(self):
+        """טוענת מהקובץ את התשובות שעדיין בתוקף (החדשות ביותר, עד max_size)."""
+        with self._db:
+            self._db.execute("DELETE FROM dealer_cache WHERE created_at < ?", (time.time() - self.ttl,))
+        rows = self._db.execute(
+            "SELECT model, prompt, response, created_at FROM dealer_cache ORDER BY created_at DESC LIMIT ?", (self.max_size,)
+        ).fetchall()
+        for model, prompt, response, created_at in reversed(rows):
+            self._entries[(model, prompt)] = (created_at, response)
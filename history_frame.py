@@ -0,0 +1,151 @@
+# history_frame.py
+# מאגר היסטוריה עמודתי (Columnar) בזיכרון: במקום אובייקט GameHistoryRecord לכל שורה, כל עמודה היא מערך NumPy אחד רציף.
+# שורה תופסת כ- 25 בתים (id, מספר זוכה, סכום, סטטוס וקוד תיאור) במקום מאות בתים של אובייקט ומחרוזות,
+# וכל החישובים על ההיסטוריה המלאה של שחקן (רווח/הפסד, התפלגות תוצאות, פילוח לפי סוג הימור) נעשים בפעולות וקטוריות.
+import numpy as np
+
+from bet_engine import DEFAULT_TABLE, WHEEL_SIZE
+
+STATUS_LOSS = 0
+STATUS_WIN = 1
+
+
+class HistoryFrame:
+    """
+    היסטוריית הימורים בעמודות: record_ids (int64), outcomes (int32), amounts (float64), statuses (uint8)
+    ו- desc_codes (int32) - קוד של תיאור ההימור ברשימת descriptions, כך שכל תיאור נשמר פעם אחת בלבד (Interning).
+    חותמת הזמן לא נשמרת; לשורות מלאות משתמשים ב- DatabaseManager.iter_player_history.
+    """
+    def __init__(self, capacity: int = 1024):
+        self.descriptions = []
+        self._codes = {}  # bet_desc -> קוד
+        self._size = 0
+        self._ids = np.empty(capacity, dtype=np.int64)
+        self._outcomes = np.empty(capacity, dtype=np.int32)
+        self._amounts = np.empty(capacity, dtype=np.float64)
+        self._statuses = np.empty(capacity, dtype=np.uint8)
+        self._desc_codes = np.empty(capacity, dtype=np.int32)
+
+    @classmethod
+    def from_db(cls, db, player_id: int, chunk_size: int = 50000):
+        """בונה את המאגר מכל ההיסטוריה של השחקן, מנה אחרי מנה, בלי ליצור אובייקט לכל שורה."""
+        frame = cls()
+        for rows in db.iter_history_chunks(player_id, chunk_size):
+            frame.extend(rows)
+        return frame
+
+    @classmethod
+    def from_columns(cls, record_ids, outcomes, amounts, statuses, desc_codes, descriptions):
+        """
+        עוטפת עמודות קיימות בלי להעתיק אותן - למשל np.memmap מייצוא עמודתי (transfer.py).
+        המערכים צריכים להיות באורך שווה ובסוגים של המאגר; הוספת שורות אחר כך מעתיקה אותם למערכים חדשים.
+        """
+        frame = cls(capacity=0)
+        frame._ids, frame._outcomes, frame._amounts = record_ids, outcomes, amounts
+        frame._statuses, frame._desc_codes = statuses, desc_codes
+        frame.descriptions = list(descriptions)
+        frame._codes = {desc: code for code, desc in enumerate(frame.descriptions)}
+        frame._size = len(record_ids)
+        return frame
+
+    def extend(self, rows):
+        """
+        מוסיפה שורות במבנה של get_player_history:
+        (id, player_id, bet_desc, amount, status, outcome_number, timestamp).
+        """
+        if not rows:
+            return
+        ids, _, descs, amounts, statuses, outcomes, _ = zip(*rows)
+        n = len(ids)
+        self._reserve(self._size + n)
+        end = self._size + n
+        codes = self._codes
+        self._ids[self._size:end] = ids
+        self._outcomes[self._size:end] = outcomes
+        self._amounts[self._size:end] = amounts
+        self._statuses[self._size:end] = [STATUS_WIN if status == "WIN" else STATUS_LOSS for status in statuses]
+        # setdefault מחשב את len(codes) לפני ההכנסה, כך שתיאור חדש מקבל את הקוד הפנוי הבא
+        self._desc_codes[self._size:end] = [codes.setdefault(desc, len(codes)) for desc in descs]
+        if len(codes) > len(self.descriptions):
+            self.descriptions = list(codes)
+        self._size = end
+
+    def _reserve(self, size: int):
+        """מגדילה את המערכים פי 2 כשצריך, כך שהוספה של הרבה מנות עולה O(n) בסך הכל."""
+        capacity = len(self._ids)
+        if size <= capacity:
+            return
+        capacity = max(capacity, 1)
+        while capacity < size:
+            capacity *= 2
+        for name in ("_ids", "_outcomes", "_amounts", "_statuses", "_desc_codes"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def __len__(self):
+        return self._size
+
+    # העמודות עצמן - Views על החלק המלא של המערכים, בלי העתקה
+    @property
+    def record_ids(self) -> np.ndarray:
+        return self._ids[:self._size]
+
+    @property
+    def outcomes(self) -> np.ndarray:
+        return self._outcomes[:self._size]
+
+    @property
+    def amounts(self) -> np.ndarray:
+        return self._amounts[:self._size]
+
+    @property
+    def statuses(self) -> np.ndarray:
+        return self._statuses[:self._size]
+
+    @property
+    def desc_codes(self) -> np.ndarray:
+        return self._desc_codes[:self._size]
+
+    @property
+    def nbytes(self) -> int:
+        """הזיכרון שהעמודות המלאות תופסות בפועל (בלי הרזרבה של המערכים)."""
+        return sum(column.nbytes for column in (self.record_ids, self.outcomes, self.amounts, self.statuses, self.desc_codes))
+
+    def multipliers(self) -> np.ndarray:
+        """מכפיל התשלום לכל קוד תיאור, מתוך טבלת התשלומים (תיאור לא מוכר נחשב 1:1, כמו ב- stats.row_net)."""
+        entries = [DEFAULT_TABLE.get_by_description(desc) for desc in self.descriptions]
+        return np.array([entry.multiplier if entry else 2 for entry in entries], dtype=np.float64)
+
+    def net(self) -> np.ndarray:
+        """הרווח/ההפסד הנקי של כל שורה."""
+        wins = self.statuses == STATUS_WIN
+        return np.where(wins, self.amounts * (self.multipliers()[self.desc_codes] - 1), -self.amounts)
+
+    def outcome_counts(self) -> np.ndarray:
+        """כמה שורות היסטוריה נסגרו על כל אחד מ- 37 המספרים (טופס עם כמה הימורים נספר פעם לכל הימור)."""
+        return np.bincount(self.outcomes, minlength=WHEEL_SIZE)
+
+    def summary(self) -> dict:
+        net = self.net()
+        wins = self.statuses == STATUS_WIN
+        return {
+            "total_bets": len(self),
+            "total_wagered": float(self.amounts.sum()),
+            "net_pl": float(net.sum()),
+            "win_count": int(wins.sum()),
+            "biggest_win": float(net.max(initial=0.0)),
+            "biggest_loss": float(-net.min(initial=0.0)),
+        }
+
+    def by_description(self) -> dict:
+        """פילוח לפי סוג הימור: תיאור -> (כמות, סך שהומר, רווח/הפסד נקי), בשלוש פעולות bincount."""
+        size = len(self.descriptions)
+        counts = np.bincount(self.desc_codes, minlength=size)
+        wagered = np.bincount(self.desc_codes, weights=self.amounts, minlength=size)
+        net = np.bincount(self.desc_codes, weights=self.net(), minlength=size)
+        return {
+            desc: (int(counts[code]), float(wagered[code]), float(net[code]))
+            for code, desc in enumerate(self.descriptions) if counts[code]
+        }
@@ -0,0 +1,245 @@
+# loadtest.py
+# מחולל עומס: הרבה שחקנים (Bots) שמסובבים במקביל מול אותו casino.db, כדי לראות איך המערכת מתנהגת לפני שמגדילים אותה.
+# כל בוט הוא Thread או תהליך נפרד עם MainController וחיבור משלו למסד (כמו כמה תוכניות משחק שרצות יחד), נכנס דרך
+# login_or_register ומניח תמהיל של NumberBet, ColorBet ו- ParityBet בקצב יעד. בסוף מודפסים התפוקה בפועל, אחוזוני זמן
+# התגובה של resolve_spin, שגיאות נעילה (database is locked), ובדיקת עקביות: היתרה של כל בוט במסד שווה ליתרה שלו בזיכרון,
+# ושורות ההיסטוריה שנוספו לו מסתכמות בדיוק לשינוי ביתרה.
+#
+# דוגמאות:
+#   python loadtest.py --bots 8 --rate 20 --duration 30
+#   python loadtest.py --bots 16 --mode process --rate 0 --duration 10 --write-behind --output load.json
+import argparse
+import json
+import math
+import multiprocessing
+import random
+import sqlite3
+import threading
+import time
+
+from database import DatabaseManager
+from MainController import MainController
+from models import ColorBet, NumberBet, ParityBet
+from rng import SeededRNG
+from stats import row_net
+
+DEFAULT_MIX = "number=0.4,color=0.35,parity=0.25"
+
+
+def parse_mix(text: str) -> dict:
+    """'number=0.4,color=0.35,parity=0.25' -> משקל לכל סוג הימור."""
+    mix = {}
+    for item in text.split(","):
+        kind, _, weight = item.partition("=")
+        kind = kind.strip().lower()
+        if kind not in ("number", "color", "parity"):
+            raise ValueError(f"Unknown bet type '{kind}' in mix")
+        mix[kind] = float(weight)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("The bet mix needs at least one positive weight")
+    return mix
+
+
+def _open_db(opts: dict):
+    if opts["shards"] > 1:
+        from sharding import ShardedDatabase
+        return ShardedDatabase(opts["db"], opts["shards"], write_behind=opts["write_behind"])
+    return DatabaseManager(opts["db"], write_behind=opts["write_behind"])
+
+
+def _make_bet(choose: random.Random, kind: str, amount: float):
+    if kind == "number":
+        return NumberBet(amount, choose.randrange(37))
+    if kind == "color":
+        return ColorBet(amount, choose.choice(("red", "black")))
+    return ParityBet(amount, choose.choice(("even", "odd")))
+
+
+def run_bot(index: int, opts: dict, start_at: float) -> dict:
+    """
+    בוט אחד: כניסה, ואז סיבובים עד stop עם קצב של opts['rate'] סיבובים לשנייה (0 = כמה שיותר מהר).
+    הקצב הוא לפי לוח זמנים קבוע (Open Loop): סיבוב שהתעכב לא מזיז את הבאים, והאיחור מול הלוח נמדד בנפרד (lag).
+    מחזירה את המדידות ואת מה שצריך לבדיקת העקביות (יתרה בתחילה ובסוף, ה- id האחרון בהיסטוריה לפני הריצה).
+    """
+    seed = None if opts["seed"] is None else opts["seed"] + index
+    choose = random.Random(seed)
+    kinds, weights = zip(*opts["mix"].items())
+    db = _open_db(opts)
+    result = {
+        "bot": index, "spins": 0, "bets": 0, "locked": 0, "errors": 0, "broke": False,
+        "latencies_ns": [], "lag_ns": [],
+    }
+    try:
+        controller = MainController(db, rng=SeededRNG(seed) if seed is not None else None)
+        player = controller.login_or_register(f"{opts['prefix']}{index}", opts["balance"])
+        result.update(player_id=player.player_id, start_balance=player.get_balance(),
+                      after_id=db.last_history_id(player.player_id))
+        interval = 1.0 / opts["rate"] if opts["rate"] > 0 else 0.0
+        time.sleep(max(0.0, start_at - time.time()))
+        started = time.perf_counter()
+        stop = started + opts["duration"]
+        due = started
+        while True:
+            now = time.perf_counter()
+            if interval:
+                if due > now:
+                    time.sleep(due - now)
+                    now = time.perf_counter()
+                result["lag_ns"].append(int((now - due) * 1e9))
+                due += interval
+            if now >= stop:
+                break
+            bet = _make_bet(choose, choose.choices(kinds, weights)[0], opts["amount"])
+            begin = time.perf_counter_ns()
+            try:
+                controller.resolve_spin(bet)
+            except sqlite3.OperationalError as e:
+                result["locked" if "locked" in str(e) else "errors"] += 1
+                continue
+            except ValueError:
+                result["broke"] = True  # אין מספיק יתרה להימור הבא
+                break
+            finally:
+                result["latencies_ns"].append(time.perf_counter_ns() - begin)
+            result["spins"] += 1
+            result["bets"] += 1
+        result["elapsed_s"] = time.perf_counter() - started
+        result["end_balance"] = player.get_balance()
+    finally:
+        db.close()  # כולל ריקון תור ה- Write-Behind
+        result["deferred_flushes"] = db.flush_errors
+    return result
+
+
+def _run_process_bot(args):
+    return run_bot(*args)
+
+
+def _percentiles_ms(samples_ns: list) -> dict:
+    if not samples_ns:
+        return {}
+    ordered = sorted(samples_ns)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] / 1e6, 3)
+
+    return {"p50_ms": pick(0.50), "p90_ms": pick(0.90), "p99_ms": pick(0.99), "p999_ms": pick(0.999),
+            "max_ms": round(ordered[-1] / 1e6, 3)}
+
+
+def check_consistency(db, results: list) -> dict:
+    """לכל בוט: היתרה במסד מול היתרה בזיכרון, ומספר שורות ההיסטוריה החדשות וסכום הרווח/הפסד שלהן מול מה שהבוט ספר."""
+    report = {"players": 0, "balance_mismatches": 0, "history_mismatches": 0, "problems": []}
+    for result in results:
+        if "player_id" not in result:
+            continue
+        report["players"] += 1
+        pid = result["player_id"]
+        stored = db.load_player_by_id(pid)["balance"]
+        if not math.isclose(stored, result["end_balance"], rel_tol=1e-9, abs_tol=1e-6):
+            report["balance_mismatches"] += 1
+            report["problems"].append(f"bot {result['bot']}: balance {stored:.2f} in the database, {result['end_balance']:.2f} in memory")
+        rows = 0
+        net = 0.0
+        for chunk in db.iter_history_chunks(pid, after_id=result["after_id"]):
+            rows += len(chunk)
+            net += sum(row_net(row[2], row[3], row[4]) for row in chunk)
+        if rows != result["bets"] or not math.isclose(result["start_balance"] + net, stored, rel_tol=1e-9, abs_tol=1e-6):
+            report["history_mismatches"] += 1
+            report["problems"].append(f"bot {result['bot']}: {rows} new history rows (net {net:+.2f}) for {result['bets']} "
+                                      f"bets, balance moved {stored - result['start_balance']:+.2f}")
+    report["ok"] = not report["balance_mismatches"] and not report["history_mismatches"]
+    return report
+
+
+def run(opts: dict) -> dict:
+    """מריצה את כל הבוטים (Threads או תהליכים), מאחדת את המדידות ומריצה את בדיקת העקביות."""
+    _open_db(opts).close()  # יצירת הקובץ והסכמה פעם אחת, לפני שכולם מתחברים במקביל
+    start_at = time.time() + opts["warmup"]
+    jobs = [(index, opts, start_at) for index in range(opts["bots"])]
+    if opts["mode"] == "process":
+        with multiprocessing.Pool(opts["bots"]) as pool:
+            results = pool.map(_run_process_bot, jobs)
+    else:
+        results = [None] * opts["bots"]
+
+        def target(job):
+            results[job[0]] = run_bot(*job)
+
+        threads = [threading.Thread(target=target, args=(job,), name=f"bot-{job[0]}") for job in jobs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if None in results:
+            raise RuntimeError("A bot thread failed; see the traceback above.")
+
+    latencies = [ns for result in results for ns in result.pop("latencies_ns")]
+    lags = [ns for result in results for ns in result.pop("lag_ns")]
+    elapsed = max(result.get("elapsed_s", 0.0) for result in results) or opts["duration"]
+    spins = sum(result["spins"] for result in results)
+    with _open_db(dict(opts, write_behind=False)) as db:
+        consistency = check_consistency(db, results)
+    return {
+        "config": {key: value for key, value in opts.items()},
+        "spins": spins,
+        "bets": sum(result["bets"] for result in results),
+        "throughput_spins_per_s": round(spins / elapsed, 1),
+        "target_spins_per_s": opts["rate"] * opts["bots"] if opts["rate"] else None,
+        "latency": _percentiles_ms(latencies),
+        "schedule_lag": _percentiles_ms(lags),
+        "locked_errors": sum(result["locked"] for result in results),
+        "other_errors": sum(result["errors"] for result in results),
+        "deferred_flushes": sum(result.get("deferred_flushes", 0) for result in results),
+        "broke_bots": sum(1 for result in results if result["broke"]),
+        "consistency": consistency,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Roulette load generator with bot players")
+    parser.add_argument("--db", default="casino.db")
+    parser.add_argument("--bots", type=int, default=8)
+    parser.add_argument("--mode", choices=("thread", "process"), default="thread")
+    parser.add_argument("--rate", type=float, default=10.0, help="spins per second per bot (0 = as fast as possible)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load after the warm-up")
+    parser.add_argument("--warmup", type=float, default=1.0, help="seconds for every bot to log in before the start")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="bet type weights, e.g. number=1,color=1")
+    parser.add_argument("--amount", type=float, default=1.0, help="wager per bet")
+    parser.add_argument("--balance", type=float, default=1_000_000.0, help="starting balance for new bots")
+    parser.add_argument("--prefix", default="bot", help="bot player names are PREFIX0, PREFIX1, ...")
+    parser.add_argument("--write-behind", action="store_true", help="bots group-commit their spins")
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None, help="deterministic wheel and bet choices")
+    parser.add_argument("--output", default=None, help="also write the report as JSON")
+    args = parser.parse_args()
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    opts = dict(vars(args), mix=mix)
+    output = opts.pop("output")
+
+    report = run(opts)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    target = f" (target {report['target_spins_per_s']:.0f})" if report["target_spins_per_s"] else ""
+    print(f"{args.bots} {args.mode} bots, {report['spins']} spins: {report['throughput_spins_per_s']:.1f} spins/s{target}")
+    for name in ("latency", "schedule_lag"):
+        values = report[name]
+        if values:
+            print(f"{name}: " + " ".join(f"{key[:-3]}={value:.3f}ms" for key, value in values.items()))
+    print(f"database is locked: {report['locked_errors']} | other errors: {report['other_errors']} | "
+          f"write-behind flushes retried: {report['deferred_flushes']} | bots out of money: {report['broke_bots']}")
+    consistency = report["consistency"]
+    print(f"consistency: {'OK' if consistency['ok'] else 'FAILED'} ({consistency['players']} players, "
+          f"{consistency['balance_mismatches']} balance / {consistency['history_mismatches']} history mismatches)")
+    for problem in consistency["problems"][:20]:
+        print(f"  {problem}")
+    raise SystemExit(0 if consistency["ok"] else 1)
+
+
+if __name__ == "__main__":
+    main()
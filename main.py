@@ -1,7 +1,26 @@
+import os
 import sys
 from database import DatabaseManager
 from MainController import MainController
-from views import ConsoleView
+from player_cache import PlayerCache
+from metrics import METRICS
+from rng import make_rng
+from views import BatchView, ConsoleView
+
+def parse_args(argv: list):
+    """
+    ארגומנטים של שורת הפקודה (רק למצב Batch). בהפעלה רגילה בלי ארגומנטים argparse לא נטען בכלל, כדי לא להאט את העלייה.
+    דוגמה: python main.py --batch script.txt --player Bot --quiet   (או --batch - לקריאה מ- stdin)
+    """
+    if not argv:
+        return None
+    import argparse
+    parser = argparse.ArgumentParser(description="AI Roulette - console edition")
+    parser.add_argument("--batch", metavar="SCRIPT", required=True, help="run a command script ('-' reads stdin)")
+    parser.add_argument("--player", default="PlayerOne", help="player to log in before the first command")
+    parser.add_argument("--quiet", action="store_true", help="skip the per-spin lines (errors, queries and the summary are still printed)")
+    parser.add_argument("--strict", action="store_true", help="stop at the first failing command (exit code 1)")
+    return parser.parse_args(argv)
 
 def main():
     """
@@ -9,26 +28,75 @@ def main():
     כאן בעצם התוכנית שלנו מתחילה לרוץ בפועל. אנחנו בונים פה את כל חלקי ה-MVC
     ומחברים אותם יחד לפני שאנחנו מדליקים את הלולאה.
     """
+    opts = parse_args(sys.argv[1:])
     
+    # מדידת ביצועים (כבויה כברירת מחדל): ROULETTE_METRICS=1 מדליק, ROULETTE_METRICS_DUMP=קובץ כותב JSON כל 10 שניות,
+    # ו- ROULETTE_PROFILE_RATE (למשל 0.01) מריץ חלק מהסיבובים תחת cProfile
+    if os.environ.get("ROULETTE_METRICS") == "1":
+        METRICS.enable(slowest=10, profile_rate=float(os.environ.get("ROULETTE_PROFILE_RATE", "0")))
+        if os.environ.get("ROULETTE_METRICS_DUMP"):
+            METRICS.start_dump(os.environ["ROULETTE_METRICS_DUMP"])
+
+    # מנוע ההגרלה: ROULETTE_RNG בוחר מנוע (secure/buffered/seeded, ברירת מחדל secure) ו- ROULETTE_SEED קובע seed.
+    # ROULETTE_REPLAY_LOG=קובץ רושם כל סיבוב ליומן שחזור שאפשר לאמת אחר כך מול ההיסטוריה (python replay.py --log ...);
+    # כל הפעלה נוספת לסוף היומן הקיים
+    seed = os.environ.get("ROULETTE_SEED")
+    rng = make_rng(os.environ.get("ROULETTE_RNG", "seeded" if seed else "secure"), int(seed) if seed else None)
+    replay_log = None
+    if os.environ.get("ROULETTE_REPLAY_LOG"):
+        from replay import ReplayLog
+        try:
+            replay_log = ReplayLog(os.environ["ROULETTE_REPLAY_LOG"], rng)
+        except ValueError as e:
+            sys.exit(str(e))  # יומן בגרסה אחרת - לא מוסיפים אליו
+
     # שלב מס' 1: הפעלת מסד הנתונים SQLite
     # נוצר חיבור לקובץ 'casino.db'. אם הוא לא קיים, הוא נוצר מאחורי הקלעים בעזרת DatabaseManager
-    db = DatabaseManager("casino.db")
+    # ROULETTE_SHARDS=N מחלק את השחקנים ל- N קבצים (sharding.py); קובץ קיים מחולק קודם עם python sharding.py --to N
+    shards = int(os.environ.get("ROULETTE_SHARDS", "1"))
+    if shards > 1:
+        from sharding import ShardedDatabase  # נטען רק במצב מחולק, כדי לא להאט את העלייה הרגילה
+        db = ShardedDatabase("casino.db", shards, write_behind=opts is not None)
+        dealer_cache_file = db.shards[0].db_file  # המטמון נשמר ב- Shard הראשון, בלי ליצור casino.db לא מחולק לצידו
+    else:
+        # במצב Batch הסיבובים נכתבים במנות (Write-Behind) - אלפי סיבובים ב- commit אחד
+        db = DatabaseManager("casino.db", write_behind=opts is not None)
+        dealer_cache_file = db.db_file
     
     # שלב מס' 2: הקמת ה- Controller (מנהל הלוגיקה המרכזי)
     # אנחנו מעבירים לו כפרמטר את מסד הנתונים כדי שהוא תמיד יוכל לגשת למידע ולשמור שינויים בחשבון השחקן
-    controller = MainController(db)
-    
-    # שלב מס' 3: הפעלת תצוגת הקונסול (ה-View)
-    # התצוגה פה מקבלת אליה את מנהל הלוגיקה, כך שהיא תוכל להעביר פקודות של השחקן מהמקלדת ישירות למוח של התוכנית
-    view = ConsoleView(controller)
+    # מטמון תשובות הדילר נשמר בטבלה נפרדת באותו קובץ, כך שהוא שורד בין הפעלות (ונטען רק בשאלה הראשונה לדילר)
+    # מטמון השחקנים מחזיק את השחקנים המחוברים בזיכרון, כך שכניסה חוזרת לא פונה למסד
+    player_cache = PlayerCache(db)
+    controller = MainController(db, player_cache=player_cache, dealer_cache_file=dealer_cache_file,
+                                rng=rng, replay_log=replay_log)
     
     try:
+        if opts is not None:
+            # מצב Batch: התסריט נקרא בזרימה (שורה אחרי שורה) מהקובץ או מ- stdin, בלי תפריט ובלי input()
+            script = sys.stdin if opts.batch == "-" else open(opts.batch, encoding="utf-8")
+            with script:
+                summary = BatchView(controller, echo=not opts.quiet, strict=opts.strict).run(script, opts.player)
+            if opts.strict and summary["errors"]:
+                sys.exit(1)
+            return
+
+        # שלב מס' 3: הפעלת תצוגת הקונסול (ה-View)
+        # התצוגה פה מקבלת אליה את מנהל הלוגיקה, כך שהיא תוכל להעביר פקודות של השחקן מהמקלדת ישירות למוח של התוכנית
+        view = ConsoleView(controller)
         # התחלת המשחק ולולאת ה-REPL
         view.start()
     except KeyboardInterrupt:
         # תפיסת מצב שבו המשתמש לוחץ על CTRL+C כדי לסגור את התוכנית בפתאומיות והדפסת הודעה יפה במקום שגיאה
         print("\nForce quitting... Goodbye!")
         sys.exit(0)
+    finally:
+        # סגירה מסודרת של החיבור הקבוע למסד הנתונים (כולל checkpoint של קובץ ה-WAL)
+        db.close()
+        controller.close()
+        if replay_log is not None:
+            replay_log.close()
+        METRICS.stop_dump()
 
 if __name__ == "__main__":
     # חלק זה מבטיח שהקוד ירוץ רק אם מריצים את הקובץ הזה ספציפית דרך המסוף, ולא כשמייבאים אותו ממקום אחר
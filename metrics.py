@@ -0,0 +1,252 @@
+# metrics.py
+# מדידה מובנית של הנתיבים החמים (Hot Paths): מונה והיסטוגרמת זמנים לכל פעולה (resolve_spin, כל מתודה של DatabaseManager,
+# ask_ai_dealer), כדי לדעת אם סיבוב איטי נובע מההגרלה, מה- commit ל- SQLite או מהדילר.
+# כשהמדידה כבויה (ברירת המחדל) כל פעולה מסומנת עולה בדיקה אחת של דגל בוליאני.
+#
+# שימוש:
+#   from metrics import METRICS
+#   METRICS.enable(slowest=10, profile_rate=0.01)   # כולל שמירת 10 הסיבובים האיטיים ביותר ודגימת cProfile של 1% מהם
+#   METRICS.snapshot()                               # מצב נוכחי כ- dict
+#   METRICS.start_dump("metrics.json", interval=10)  # כתיבה תקופתית לקובץ JSON
+import functools
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+
+
+class Histogram:
+    """
+    היסטוגרמת זמנים לוגריתמית (בננו-שניות): 4 תאים לכל חזקה של 2, כלומר דיוק של כ- 25% בכל טווח,
+    בזיכרון קבוע ובלי לשמור את הדגימות עצמן.
+    """
+    __slots__ = ("count", "errors", "total", "min", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self.buckets = {}  # אינדקס תא -> כמות
+
+    @staticmethod
+    def bucket_of(value: int) -> int:
+        shift = max(value.bit_length() - 3, 0)
+        return (shift << 2) + (value >> shift)
+
+    @staticmethod
+    def lower_bound(bucket: int) -> int:
+        if bucket < 8:
+            return bucket
+        shift = bucket // 4 - 1
+        return (bucket - 4 * shift) << shift
+
+    def record(self, value: int):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.min = value if self.min is None else min(self.min, value)
+        bucket = self.bucket_of(value)
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    def percentile(self, q: float) -> int:
+        """הערכת האחוזון q (בין 0 ל- 1): הגבול התחתון של התא שבו הוא נופל."""
+        if not self.count:
+            return 0
+        rank = q * (self.count - 1)
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen > rank:
+                return min(max(self.lower_bound(bucket), self.min), self.max)
+        return self.max
+
+    def as_dict(self) -> dict:
+        ms = 1e6
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_ms": self.total / ms,
+            "mean_ms": self.total / self.count / ms if self.count else 0.0,
+            "min_ms": (self.min or 0) / ms,
+            "p50_ms": self.percentile(0.50) / ms,
+            "p90_ms": self.percentile(0.90) / ms,
+            "p99_ms": self.percentile(0.99) / ms,
+            "max_ms": self.max / ms,
+        }
+
+
+class Metrics:
+    """
+    אוסף המדדים של התהליך. כל פעולה מסומנת (timed) נמדדת, ופעולות שנקראות מתוכה נרשמות גם כפירוק (Breakdown)
+    של פעולת האב - למשל resolve_spin -> rng + db.settle_spin. הפעולות שב- PROFILED_OPS נשמרות גם ברשימת האיטיות ביותר.
+    """
+    PROFILED_OPS = ("resolve_spin", "resolve_slip")
+
+    def __init__(self):
+        self.enabled = False
+        self.slowest_size = 0
+        self.profile_rate = 0.0
+        self._histograms = {}
+        self._slowest = []  # ערימת מינימום (משך, מספר סידורי, פרטים) בגודל slowest_size
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._profiler_lock = threading.Lock()  # רק Profiler אחד יכול לפעול בתהליך בכל רגע
+        self._local = threading.local()
+        self._started_at = time.time()
+        self._dump_thread = None
+        self._dump_stop = threading.Event()
+
+    def enable(self, slowest: int = 0, profile_rate: float = 0.0):
+        """
+        מדליקה את המדידה. slowest - כמה מהסיבובים האיטיים ביותר לשמור עם הפירוק שלהם;
+        profile_rate - איזה חלק מהסיבובים להריץ תחת cProfile (דגימה), כדי לקבל גם את הפונקציות שצרכו את הזמן.
+        """
+        self.slowest_size = slowest
+        self.profile_rate = profile_rate
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+            self._slowest = []
+            self._started_at = time.time()
+
+    def call(self, name: str, func, args, kwargs):
+        """מריצה את func ומודדת אותה (נקראת מ- timed רק כשהמדידה דולקת)."""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        children = {}
+        stack.append(children)
+        profiler = None
+        if not stack[:-1] and name in self.PROFILED_OPS and self.profile_rate and random.random() < self.profile_rate:
+            if self._profiler_lock.acquire(blocking=False):
+                import cProfile  # נטען רק כשבאמת דוגמים, כדי לא להאט את העלייה של המשחק
+                profiler = cProfile.Profile()
+        failed = False
+        start = time.perf_counter_ns()
+        try:
+            if profiler is not None:
+                profiler.enable()
+            return func(*args, **kwargs)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self._profiler_lock.release()
+            elapsed = time.perf_counter_ns() - start
+            stack.pop()
+            if stack:
+                # הפירוק עובר לאב כולל הנכדים, למשל "db.settle_spin > db.commit"
+                parent = stack[-1]
+                parent[name] = parent.get(name, 0) + elapsed
+                for child, child_elapsed in children.items():
+                    key = f"{name} > {child}"
+                    parent[key] = parent.get(key, 0) + child_elapsed
+            self._record(name, elapsed, failed, None if stack else children, profiler)
+
+    def _record(self, name: str, elapsed: int, failed: bool, children, profiler):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.record(elapsed)
+            if failed:
+                histogram.errors += 1
+            if children is None or name not in self.PROFILED_OPS or not self.slowest_size:
+                return
+            if len(self._slowest) >= self.slowest_size and elapsed <= self._slowest[0][0]:
+                return
+        # הפירוק והפרופיל נבנים מחוץ למנעול - רק עבור סיבובים שבאמת נכנסים לרשימה
+        entry = {
+            "op": name,
+            "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "total_ms": elapsed / 1e6,
+            "breakdown_ms": {child: ns / 1e6 for child, ns in children.items()},
+        }
+        direct = sum(ns for child, ns in children.items() if " > " not in child)
+        entry["breakdown_ms"]["self"] = (elapsed - direct) / 1e6
+        if profiler is not None:
+            entry["profile"] = self._top_functions(profiler)
+        with self._lock:
+            item = (elapsed, next(self._sequence), entry)
+            if len(self._slowest) < self.slowest_size:
+                heapq.heappush(self._slowest, item)
+            elif elapsed > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+
+    @staticmethod
+    def _top_functions(profiler, limit: int = 15) -> list:
+        import pstats
+        stats = pstats.Stats(profiler).stats
+        rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+        return [
+            {"function": f"{os.path.basename(path)}:{line}({func})", "calls": calls, "cumulative_ms": cumulative * 1e3}
+            for (path, line, func), (_, calls, _, cumulative, _) in rows
+        ]
+
+    def snapshot(self) -> dict:
+        """מצב המדדים עכשיו: לכל פעולה מונה, שגיאות ואחוזוני זמן; וגם רשימת הסיבובים האיטיים ביותר (אם נשמרים)."""
+        with self._lock:
+            operations = {name: histogram.as_dict() for name, histogram in sorted(self._histograms.items())}
+            slowest = [entry for _, _, entry in sorted(self._slowest, reverse=True)]
+        return {
+            "enabled": self.enabled,
+            "since": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self._started_at)),
+            "operations": operations,
+            "slowest": slowest,
+        }
+
+    def dump(self, path: str):
+        """כותבת את ה- snapshot לקובץ JSON. הכתיבה לקובץ זמני והחלפה (os.replace) כך שקורא אף פעם לא רואה קובץ חצי כתוב."""
+        import json
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
+
+    def start_dump(self, path: str, interval: float = 10.0):
+        """מפעילה Thread רקע שכותב את המדדים לקובץ כל interval שניות (וגם פעם אחרונה ב- stop_dump)."""
+        self.stop_dump()
+        self._dump_stop.clear()
+
+        def loop():
+            while not self._dump_stop.wait(interval):
+                self.dump(path)
+            self.dump(path)
+
+        self._dump_thread = threading.Thread(target=loop, name="metrics-dump", daemon=True)
+        self._dump_thread.start()
+
+    def stop_dump(self):
+        if self._dump_thread is not None:
+            self._dump_stop.set()
+            self._dump_thread.join()
+            self._dump_thread = None
+
+
+# מופע אחד משותף לכל התהליך, כמו DEFAULT_TABLE ב- bet_engine
+METRICS = Metrics()
+
+
+def timed(name: str):
+    """
+    דקורטור שמסמן פעולה למדידה בשם name. כשהמדידה כבויה העטיפה רק בודקת METRICS.enabled וקוראת לפונקציה.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not METRICS.enabled:
+                return func(*args, **kwargs)
+            return METRICS.call(name, func, args, kwargs)
+        return wrapper
+    return decorator
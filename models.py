@@ -1,6 +1,9 @@
 # models.py
 # קובץ זה מכיל את מבני הנתונים העיקריים של המשחק (מודלים).
 # כאן אנחנו מיישמים את עקרונות תכנות מונחה עצמים (OOP) כמו קימוס (Encapsulation), ירושה (Inheritance) ופולימורפיזם (Polymorphism).
+# בדיקות הזכייה עצמן מקומפלות למסכות ביטים בטבלת התשלומים של bet_engine.py.
+# כל המודלים מוגדרים עם __slots__: בלי מילון (__dict__) לכל מופע, כך שמיליוני הימורים או רשומות היסטוריה תופסים הרבה פחות זיכרון.
+from bet_engine import DEFAULT_TABLE, RED_NUMBERS
 
 class Player:
     """
@@ -8,6 +11,8 @@ class Player:
     [עיקרון OOP: קימוס (Encapsulation)] - משתנה היתרה של השחקן מוגן ומוסתר מהחוץ, 
     וניתן לגישה או לשינוי רק דרך מתודות מבוקרות.
     """
+    __slots__ = ("player_id", "name", "__balance")  # גם כאן השם __balance עובר Name Mangling ל- _Player__balance
+
     def __init__(self, player_id: int, name: str, starting_balance: float):
         self.player_id = player_id
         self.name = name
@@ -38,7 +43,10 @@ class BaseBet:
     """
     מחלקת בסיס אבסטרקטית (כללית) לכל ההימורים.
     [עיקרון OOP: ירושה פולימורפיזם] - כל סוגי ההימורים יירשו (Inheritance) מהמחלקה הזו ויממשו מחדש (Override) את בפונקציות שלה בסגנון פולימורפיזם.
+    מחלקה יורשת שלא מגדירה __slots__ משלה פשוט מקבלת __dict__ רגיל, כך שהימורים מותאמים אישית ממשיכים לעבוד.
     """
+    __slots__ = ("amount",)
+
     def __init__(self, amount: float):
         self.amount = amount  # סכום ההימור
 
@@ -59,19 +67,34 @@ class BaseBet:
         """התיאור הטקסטואלי של ההימור שיישמר במסד הנתונים."""
         return "Generic Bet"
 
+    def get_table_key(self) -> str:
+        """
+        המפתח של ההימור בטבלת התשלומים (bet_engine). מחלקות שמחזירות None מקומפלות אוטומטית
+        לפי is_winning_bet, כך שגם הימורים מותאמים אישית עובדים עם המנוע.
+        """
+        return None
+
+    def _win_mask(self) -> int:
+        """מסכת הזכייה של ההימור מתוך הטבלה (0 אם המפתח לא קיים בה, כלומר ההימור לעולם לא זוכה)."""
+        entry = DEFAULT_TABLE.get(self.get_table_key())
+        return entry.mask if entry else 0
+
 
 class NumberBet(BaseBet):
     """
     הימור על מספר ספציפי (Straight Up).
     מחלקה זו יורשת (Inheritance) מ- BaseBet.
     """
+    __slots__ = ("target_number", "win_mask")
+
     def __init__(self, amount: float, target_number: int):
         super().__init__(amount) # קריאה לבנאי של מחלקת האב בשביל לשמור את סכום הכסף (amount)
         self.target_number = target_number
+        self.win_mask = self._win_mask()
 
     def is_winning_bet(self, winning_number: int) -> bool:
-        # הזכייה מתרחשת רק אם המספר ברולטה זהה לחלוטין למספר שהשחקן בחר
-        return self.target_number == winning_number
+        # הזכייה מתרחשת רק אם המספר ברולטה זהה לחלוטין למספר שהשחקן בחר (ביט אחד דולק במסכה)
+        return (self.win_mask >> winning_number) & 1 == 1
 
     def get_payout_multiplier(self) -> int:
         return 36  # תשלום יחסית גבוה, השחקן מרוויח פי 36 מההשקעה שלו
@@ -79,6 +102,9 @@ class NumberBet(BaseBet):
     def get_description(self) -> str:
         return f"Number {self.target_number}"
 
+    def get_table_key(self) -> str:
+        return f"number:{self.target_number}"
+
 
 class ColorBet(BaseBet):
     """
@@ -86,23 +112,17 @@ class ColorBet(BaseBet):
     מחלקה יורשת (Inheritance).
     """
     # קבוצה של כל המספרים האדומים ברולטה אירופאית קלאסית
-    REDS = {1, 3, 5, 7, 9, 12, 14, 16, 18, 19, 21, 23, 25, 27, 30, 32, 34, 36}
+    REDS = RED_NUMBERS
+    __slots__ = ("color", "win_mask")
 
     def __init__(self, amount: float, color: str):
         super().__init__(amount)
         self.color = color.lower()  # המרת הצבע לאותיות קטנות (למשל 'red' או 'black')
+        self.win_mask = self._win_mask()  # ההשוואה של המחרוזת נעשית פעם אחת כאן ולא בכל סיבוב
 
     def is_winning_bet(self, winning_number: int) -> bool:
-        if winning_number == 0:
-            return False  # 0 הוא צבע ירוק, ולכן לא אדום ולא שחור
-            
-        is_red = winning_number in self.REDS
-        if self.color == "red" and is_red:
-            return True
-        if self.color == "black" and not is_red:
-            return True
-            
-        return False
+        # 0 הוא צבע ירוק, ולכן הביט שלו כבוי גם במסכה של אדום וגם בזו של שחור
+        return (self.win_mask >> winning_number) & 1 == 1
 
     def get_payout_multiplier(self) -> int:
         return 2  # הימור צבע נותן תשלום של 1:1, כלומר פי שניים עשוי להיות מרוויח מהקרן
@@ -110,6 +130,9 @@ class ColorBet(BaseBet):
     def get_description(self) -> str:
         return f"Color {self.color.capitalize()}"
 
+    def get_table_key(self) -> str:
+        return f"color:{self.color}"
+
 
 class ParityBet(BaseBet):
     """
@@ -117,21 +140,16 @@ class ParityBet(BaseBet):
     ירושה נוספת מאותה המחלקה. פה ניתן לראות שיש לנו ממשק אחיד פולימורפי,
     כך השולט בקוד (MainController) יודע לעבוד עם פונקציית is_winning_bet בלי לדעת איזה הימור נבחר.
     """
+    __slots__ = ("parity", "win_mask")
+
     def __init__(self, amount: float, parity: str):
         super().__init__(amount)
         self.parity = parity.lower()  # 'even' או 'odd'
+        self.win_mask = self._win_mask()
 
     def is_winning_bet(self, winning_number: int) -> bool:
-        if winning_number == 0:
-            return False  # גם אי זוגי וגם זוגי מפסידים על 0 ברולטה
-            
-        is_even = (winning_number % 2 == 0)
-        if self.parity == "even" and is_even:
-            return True
-        if self.parity == "odd" and not is_even:
-            return True
-            
-        return False
+        # גם אי זוגי וגם זוגי מפסידים על 0 ברולטה - הביט של 0 כבוי בשתי המסכות
+        return (self.win_mask >> winning_number) & 1 == 1
 
     def get_payout_multiplier(self) -> int:
         return 2
@@ -139,10 +157,41 @@ class ParityBet(BaseBet):
     def get_description(self) -> str:
         return f"Parity {self.parity.capitalize()}"
 
+    def get_table_key(self) -> str:
+        return f"parity:{self.parity}"
+
+
+class TableBet(BaseBet):
+    """
+    הימור כללי על כל רשומה בטבלת התשלומים - Split, Street, Corner, Dozen, Column, Low/High וכו'.
+    המפתח הוא למשל 'split:17-20', 'street:13', 'corner:1-2-4-5', 'dozen:2', 'column:3' או 'range:high'.
+    """
+    __slots__ = ("entry",)
+
+    def __init__(self, amount: float, table_key: str):
+        super().__init__(amount)
+        self.entry = DEFAULT_TABLE.get(table_key)
+        if self.entry is None:
+            raise ValueError(f"Unknown bet '{table_key}'.")
+
+    def is_winning_bet(self, winning_number: int) -> bool:
+        return self.entry.wins(winning_number)
+
+    def get_payout_multiplier(self) -> int:
+        return self.entry.multiplier
+
+    def get_description(self) -> str:
+        return self.entry.description
+
+    def get_table_key(self) -> str:
+        return self.entry.key
+
 class GameHistoryRecord:
     """
     DTO (Data Transfer Object) המופקד לשמש כנשא המידע של ההיסטוריה, שחוזר ממסד הנתונים.
     """
+    __slots__ = ("record_id", "player_id", "bet_desc", "amount", "status", "outcome_number", "timestamp")
+
     def __init__(self, record_id: int, player_id: int, bet_desc: str, amount: float, status: str, outcome_number: int, timestamp: str):
         self.record_id = record_id
         self.player_id = player_id
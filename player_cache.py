@@ -0,0 +1,60 @@
+# player_cache.py
+# מטמון (Cache) של שחקנים חיים בזיכרון, לפי שם ולפי מזהה, עם פינוי LRU.
+# שחקן שחוזר למשחק מקבל את אותו אובייקט Player מהזיכרון בלי לפנות ל- SQLite. המטמון לא כותב יתרות בעצמו:
+# כל סגירת סיבוב כבר כותבת את היתרה יחד עם ההיסטוריה באותה טרנזקציה (settle_spin / settle_slip), כך ששחקן
+# שמפונה מהמטמון פשוט נזרק - מה שבמסד (או בתור ה- Write-Behind) הוא כבר היתרה העדכנית שלו.
+import threading
+from collections import OrderedDict
+
+from models import Player
+
+
+class PlayerCache:
+    """מטמון השחקנים. בטוח לשימוש מכמה Threads (מנעול אחד לכל הפעולות)."""
+    def __init__(self, db, max_size: int = 1024):
+        self.db = db
+        self.max_size = max_size
+        self._by_id = OrderedDict()  # player_id -> Player, לפי סדר השימוש האחרון
+        self._id_by_name = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def login(self, name: str, default_balance: float) -> Player:
+        """
+        מחזירה את השחקן מהזיכרון אם הוא כבר טעון; אחרת טוענת אותו מהמסד עם login_player
+        (יצירה אם לא קיים, או החזרת השורה הקיימת) - בלי חלון מרוץ על השם הייחודי.
+        """
+        with self._lock:
+            player_id = self._id_by_name.get(name)
+            if player_id is not None:
+                self.hits += 1
+                self._by_id.move_to_end(player_id)
+                return self._by_id[player_id]
+            self.misses += 1
+            row = self.db.login_player(name, default_balance)
+            player = Player(row["id"], row["name"], row["balance"])
+            self._by_id[player.player_id] = player
+            self._id_by_name[player.name] = player.player_id
+            while len(self._by_id) > self.max_size:
+                self._evict()
+            return player
+
+    def get(self, player_id: int) -> Player:
+        """מחזירה שחקן טעון לפי מזהה, או None."""
+        with self._lock:
+            player = self._by_id.get(player_id)
+            if player is not None:
+                self._by_id.move_to_end(player_id)
+            return player
+
+    def forget(self, player_id: int):
+        """מוציאה שחקן מהמטמון (למשל אחרי delete_player)."""
+        with self._lock:
+            player = self._by_id.pop(player_id, None)
+            if player is not None:
+                self._id_by_name.pop(player.name, None)
+
+    def _evict(self):
+        _, player = self._by_id.popitem(last=False)
+        self._id_by_name.pop(player.name, None)
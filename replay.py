@@ -0,0 +1,231 @@
+# replay.py
+# יומן שחזור (Replay Log) קומפקטי של סיבובים, ואימות מהיר שלו מול טבלת ההיסטוריה.
+# כל הפעלה של המשחק מוסיפה לסוף הקובץ הפעלה (Run) משלה: שורת JSON אחת (גרסה, מנוע ההגרלה וה- seed שלו),
+# ואחריה רשומות בינאריות בגודל קבוע:
+#   b'S' + <Qqd  - תחילת סשן של שחקן ביומן: player_id, ה- id האחרון שלו בהיסטוריה לפני הסשן, היתרה בתחילתו (25 בתים)
+#   b'P' + <QBHd - סיבוב: player_id, המספר הזוכה, כמות ההימורים בסיבוב, היתרה אחריו (20 בתים)
+# שורת JSON מתחילה תמיד ב- '{', כך שהקורא מזהה את תחילת ההפעלה הבאה במקום שבו הייתה מגיעה רשומה.
+# player_id הוא 64 ביט כי במסד מחולק (sharding.py) המזהים של כל Shard מתחילים ב- index * 2**40. בגרסה 1 הוא היה 32 ביט.
+# גרסה 2 הייתה של הפעלה אחת בלבד (כל הפעלה דרסה את הקובץ); הקורא של גרסה 3 קורא גם אותה.
+# האימות עובר על היומן ועל שורות ההיסטוריה של כל שחקן במקביל (בזרימה), ובודק שהמספר הזוכה, תוצאת כל הימור
+# והיתרה אחרי כל סיבוב תואמים. אם המנוע דטרמיניסטי, גם רצף המספרים נבדק מול המנוע עצמו.
+#
+# דוגמה:
+#   python replay.py --db casino.db --log replay.bin
+#   python replay.py --db casino.db --shards 4 --log replay.bin
+import argparse
+import json
+import os
+import struct
+import time
+
+from bet_engine import DEFAULT_TABLE
+from database import DatabaseManager
+from rng import make_rng
+from stats import row_net
+
+SESSION = struct.Struct("<Qqd")
+SPIN = struct.Struct("<QBHd")
+LOG_VERSION = 3
+READABLE_VERSIONS = (2, 3)
+
+
+class ReplayLog:
+    """
+    כותב את היומן. נפתח פעם אחת ומוסיף רשומות לסוף הקובץ דרך חוצץ (Buffered) - עלות זניחה לכל סיבוב.
+    יומן קיים לא נדרס: ההפעלה נוספת בסופו עם כותרת משלה. רשומה חלקית בסוף (הפעלה קודמת שנקטעה) נחתכת קודם,
+    ויומן בגרסה שלא ניתן לקרוא נדחה (ValueError) במקום לערבב בו פורמטים.
+    """
+    def __init__(self, path: str, rng):
+        self.path = path
+        if os.path.exists(path) and os.path.getsize(path):
+            end = _complete_length(path)
+            if end < os.path.getsize(path):
+                os.truncate(path, end)
+        self._file = open(path, "ab")
+        header = {"version": LOG_VERSION, "created": time.strftime("%Y-%m-%dT%H:%M:%S"), "rng": rng.describe()}
+        self._file.write((json.dumps(header) + "\n").encode("utf-8"))
+        self._sessions = set()
+
+    def begin(self, db: DatabaseManager, player_id: int, balance: float):
+        """רושמת תחילת סשן לשחקן (פעם אחת לכל שחקן ביומן), לפני שהסיבוב הראשון שלו נשמר."""
+        if player_id in self._sessions:
+            return
+        self._sessions.add(player_id)
+        self._file.write(b"S" + SESSION.pack(player_id, db.last_history_id(player_id), balance))
+
+    def record(self, player_id: int, outcome: int, bet_count: int, balance: float):
+        self._file.write(b"P" + SPIN.pack(player_id, outcome, bet_count, balance))
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+
+
+def _scan(f, path: str):
+    """
+    גנרטור על קובץ יומן פתוח: מחזיר (רשומה, ההיסט בקובץ אחריה). רשומה היא ('H', header) לכל כותרת של הפעלה,
+    ('S', player_id, after_id, balance) או ('P', player_id, outcome, bets, balance). נעצר לפני רשומה אחרונה חלקית.
+    """
+    while True:
+        kind = f.read(1)
+        if not kind:
+            return
+        if kind == b"{":
+            line = f.readline()
+            if not line.endswith(b"\n"):
+                return  # כותרת חלקית (התהליך נקטע באמצע כתיבה)
+            header = json.loads((kind + line).decode("utf-8"))
+            if header.get("version") not in READABLE_VERSIONS:
+                raise ValueError(f"{path} is a version {header.get('version')} replay log; "
+                                 f"this version reads versions {READABLE_VERSIONS[0]}-{READABLE_VERSIONS[-1]} only.")
+            yield ("H", header), f.tell()
+            continue
+        if kind not in (b"S", b"P"):
+            raise ValueError(f"{path} is corrupt: unexpected record type {kind!r} at offset {f.tell() - 1}.")
+        layout = SESSION if kind == b"S" else SPIN
+        data = f.read(layout.size)
+        if len(data) < layout.size:
+            return  # רשומה אחרונה חלקית (התהליך נקטע באמצע כתיבה)
+        yield (kind.decode(),) + layout.unpack(data), f.tell()
+
+
+def _complete_length(path: str) -> int:
+    """עד איזה היסט היומן הקיים שלם (סוף הרשומה השלמה האחרונה). זורקת ValueError על יומן שלא ניתן לקרוא."""
+    end = 0
+    with open(path, "rb") as f:
+        for _, end in _scan(f, path):
+            pass
+    return end
+
+
+def read_log(path: str):
+    """
+    מחזירה (header, גנרטור של רשומות): header היא הכותרת של ההפעלה הראשונה, וכל הפעלה נוספת מופיעה בגנרטור
+    כרשומה ('H', header) לפני הרשומות שלה. שאר הרשומות הן ('S', player_id, after_id, balance) או ('P', player_id, outcome, bets, balance).
+    """
+    f = open(path, "rb")
+    scan = _scan(f, path)
+    try:
+        first = next(scan, None)
+    except ValueError:
+        f.close()
+        raise
+    if first is None or first[0][0] != "H":
+        f.close()
+        raise ValueError(f"{path} is not a replay log.")
+
+    def records():
+        with f:
+            for record, _ in scan:
+                yield record
+
+    return first[0][1], records()
+
+
+class _PlayerCursor:
+    """מעבר סדרתי על שורות ההיסטוריה של שחקן אחד החל מ- after_id."""
+    def __init__(self, db: DatabaseManager, player_id: int, after_id: int, balance: float):
+        self.balance = balance
+        self._rows = (row for chunk in db.iter_history_chunks(player_id, after_id=after_id) for row in chunk)
+
+    def take(self, count: int) -> list:
+        return [row for _, row in zip(range(count), self._rows)]
+
+
+def verify(db: DatabaseManager, log_path: str, tolerance: float = 1e-6, max_problems: int = 20) -> dict:
+    """
+    מאמתת יומן מול מסד הנתונים ומחזירה דוח: כמה סיבובים נבדקו, כמה אי-התאמות נמצאו (והראשונות שבהן),
+    והאם היתרה הסופית של כל שחקן ביומן שווה ליתרה שלו בטבלת players (נכון רק אם לא שיחק מאז).
+    """
+    header, records = read_log(log_path)
+    rng_info = header.get("rng", {})
+    expected = make_rng(**rng_info) if rng_info.get("seed") is not None else None
+    cursors = {}
+    report = {"rng": rng_info, "runs": 1, "spins": 0, "bets": 0, "mismatches": 0, "problems": [], "final_balances": {}}
+
+    def problem(message):
+        report["mismatches"] += 1
+        if len(report["problems"]) < max_problems:
+            report["problems"].append(message)
+
+    for record in records:
+        if record[0] == "H":
+            # הפעלה נוספת שהמשיכה את אותו יומן: מנוע ההגרלה שלה מתחיל מחדש, וכל שחקן מקבל רשומת S חדשה
+            rng_info = record[1].get("rng", {})
+            expected = make_rng(**rng_info) if rng_info.get("seed") is not None else None
+            report["runs"] += 1
+            continue
+        if record[0] == "S":
+            _, player_id, after_id, balance = record
+            cursors[player_id] = _PlayerCursor(db, player_id, after_id, balance)
+            continue
+        _, player_id, outcome, bet_count, balance_after = record
+        report["spins"] += 1
+        spin_no = report["spins"]
+        if expected is not None and expected.spin() != outcome:
+            problem(f"spin {spin_no}: outcome {outcome} does not match the {rng_info['backend']} RNG sequence")
+        cursor = cursors.get(player_id)
+        if cursor is None:
+            problem(f"spin {spin_no}: player {player_id} has no session record")
+            continue
+        rows = cursor.take(bet_count)
+        report["bets"] += len(rows)
+        if len(rows) < bet_count:
+            problem(f"spin {spin_no}: player {player_id} is missing {bet_count - len(rows)} history rows")
+        for record_id, _, bet_desc, amount, status, row_outcome, _ in rows:
+            if row_outcome != outcome:
+                problem(f"history row {record_id}: outcome {row_outcome}, log says {outcome}")
+            entry = DEFAULT_TABLE.get_by_description(bet_desc)
+            if entry is not None and entry.wins(outcome) != (status == "WIN"):
+                problem(f"history row {record_id}: '{bet_desc}' recorded as {status} on {outcome}")
+            cursor.balance += row_net(bet_desc, amount, status)
+        if abs(cursor.balance - balance_after) > tolerance:
+            problem(f"spin {spin_no}: player {player_id} balance {cursor.balance:.2f} from history, log says {balance_after:.2f}")
+            cursor.balance = balance_after  # ממשיכים מהיתרה של היומן כדי לא לדווח על כל סיבוב שאחרי
+        report["final_balances"][player_id] = balance_after
+
+    for player_id, balance in report["final_balances"].items():
+        player = db.load_player_by_id(player_id)
+        report["final_balances"][player_id] = {
+            "log": balance,
+            "database": player["balance"] if player else None,
+            "matches": player is not None and abs(player["balance"] - balance) <= tolerance,
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify a roulette replay log against the history table")
+    parser.add_argument("--db", default="casino.db")
+    parser.add_argument("--shards", type=int, default=1, help="number of shard files the players are split across")
+    parser.add_argument("--log", required=True)
+    opts = parser.parse_args()
+
+    if opts.shards > 1:
+        from sharding import ShardedDatabase
+        db = ShardedDatabase(opts.db, opts.shards)
+    else:
+        db = DatabaseManager(opts.db)
+    with db:
+        started = time.perf_counter()
+        try:
+            report = verify(db, opts.log)
+        except ValueError as e:
+            parser.exit(2, f"{e}\n")
+        elapsed = time.perf_counter() - started
+    print(f"Verified {report['spins']} spins / {report['bets']} bets from {report['runs']} run(s) in {elapsed:.2f}s "
+          f"(RNG: {report['rng'].get('backend')}): {report['mismatches']} mismatches.")
+    for message in report["problems"]:
+        print(f"  {message}")
+    for player_id, result in report["final_balances"].items():
+        state = "matches" if result["matches"] else "differs (played since the log, or tampered)"
+        print(f"  player {player_id}: final balance {result['log']:.2f} {state}")
+    raise SystemExit(1 if report["mismatches"] else 0)
+
+
+if __name__ == "__main__":
+    main()
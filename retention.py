@@ -0,0 +1,72 @@
+# retention.py
+# מדיניות שמירת ההיסטוריה (Retention): שורות שישנות מ- max_age_days עוברות לקובץ ארכיון, ובמקומן נשארים סיכומים יומיים
+# לכל שחקן (history_daily). כך טבלת ההיסטוריה "החמה" נשארת קטנה - הכנסות ושאילתות על ההיסטוריה האחרונה נשארות מהירות -
+# והסטטיסטיקות לטווח ארוך נשארות מדויקות. העבודה עצמה נעשית ב- DatabaseManager.compact_history.
+#
+# דוגמה (למשל פעם ביום מ- cron):
+#   python retention.py --db casino.db --archive casino_archive.db --days 90
+import argparse
+import sqlite3
+from datetime import datetime, timedelta
+
+from database import DatabaseManager
+from sharding import ShardedDatabase, shard_path
+
+
+def cutoff_for(max_age_days: float, now: datetime = None) -> str:
+    """חותמת הזמן (בפורמט של טבלת ההיסטוריה) שכל שורה לפניה נחשבת ישנה."""
+    return ((now or datetime.now()) - timedelta(days=max_age_days)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def run_retention(db: DatabaseManager | ShardedDatabase, archive_file: str, max_age_days: float = 90, chunk_size: int = 5000,
+                  max_chunks: int = None, now: datetime = None) -> dict:
+    """
+    מריצה מעבר אחד של המדיניות ומחזירה דוח (כמה שורות עברו, בכמה מנות, כמה סיכומים יומיים נכתבו וכמה דפים הוחזרו לדיסק).
+    max_chunks מגביל את העבודה של הרצה אחת; את השאר ישלים המעבר הבא.
+    """
+    return db.compact_history(cutoff_for(max_age_days, now), archive_file, chunk_size, max_chunks)
+
+
+def convert_to_incremental_vacuum(db_file: str) -> bool:
+    """
+    המרה חד-פעמית של קובץ שנוצר לפני שהמשחק הגדיר auto_vacuum = INCREMENTAL (בלי זה המקום שמתפנה לא חוזר לדיסק).
+    דורשת VACUUM מלא שכותב את כל הקובץ מחדש, ולכן מריצים אותה כשהמשחק כבוי. מחזירה True אם הייתה המרה.
+    """
+    conn = sqlite3.connect(db_file)
+    try:
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+            return False
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+        return True
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive old roulette history into daily rollups")
+    parser.add_argument("--db", default="casino.db")
+    parser.add_argument("--archive", default="casino_archive.db")
+    parser.add_argument("--days", type=float, default=90, help="keep raw rows newer than this many days")
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--max-chunks", type=int, default=None, help="stop after this many chunks (default: all)")
+    parser.add_argument("--convert-vacuum", action="store_true",
+                        help="one-time full VACUUM that switches an older file to incremental vacuum")
+    parser.add_argument("--shards", type=int, default=1, help="number of shard files the players are split across")
+    opts = parser.parse_args()
+
+    if opts.convert_vacuum:
+        for path in (shard_path(opts.db, index, opts.shards) for index in range(opts.shards)):
+            if convert_to_incremental_vacuum(path):
+                print(f"{path} converted to incremental vacuum.")
+    db = ShardedDatabase(opts.db, opts.shards) if opts.shards > 1 else DatabaseManager(opts.db)
+    try:
+        report = run_retention(db, opts.archive, opts.days, opts.chunk_size, opts.max_chunks)
+    finally:
+        db.close()
+    print(f"Archived {report['moved']} rows in {report['chunks']} chunks "
+          f"({report['rollups']} daily rollups written, {report['freed_pages']} pages freed).")
+
+
+if __name__ == "__main__":
+    main()
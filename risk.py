@@ -0,0 +1,129 @@
+# risk.py
+# מחשבון אנליטי לסיכון פשיטת רגל (Risk of Ruin) ולהתפלגות היתרה.
+# בניגוד לסימולציה (simulation.py) אין כאן דגימה: התפלגות התוצאה של סיבוב בודד מקונבלצת (Convolution) שוב ושוב עם
+# התפלגות היתרה, כאשר מצבים שבהם אי אפשר לממן את הטופס הבא "נבלעים" (Absorbing State) כפשיטת רגל.
+# כדי שהחישוב יישאר מהיר גם לאלפי סיבובים, היתרות מקובצות לדליים (Buckets) וזנבות זניחים נגזמים (Pruning).
+import math
+
+import numpy as np
+
+from simulation import slip_payout_vector
+from bet_engine import WHEEL_SIZE
+
+
+class BankrollDistribution:
+    """
+    ההתפלגות של היתרה אחרי N סיבובים: values[i] היא יתרה אפשרית ו- probs[i] ההסתברות שלה.
+    יתרות שפשטו רגל נשמרות עם הערך שבו נעצרו, כך שהאחוזונים מתייחסים לכל השחקנים.
+    """
+    def __init__(self, values, probs, risk_of_ruin: float, pruned_mass: float, exact: bool):
+        self.values = values
+        self.probs = probs
+        self.risk_of_ruin = risk_of_ruin
+        self.pruned_mass = pruned_mass  # מסת הסתברות שנגזמה בזנבות (גבול עליון לשגיאה)
+        self.exact = exact  # False אם היתרות קובצו לדליים רחבים יותר מהתשלום הקטן ביותר
+
+    def mean(self) -> float:
+        return float(np.dot(self.values, self.probs) / self.probs.sum())
+
+    def percentile(self, p: float) -> float:
+        """היתרה שמתחתיה נמצאים p אחוזים מהמקרים."""
+        cdf = np.cumsum(self.probs)
+        cdf /= cdf[-1]
+        return float(self.values[min(np.searchsorted(cdf, p / 100.0), len(self.values) - 1)])
+
+    def summary(self, percentiles=(1, 5, 25, 50, 75, 95, 99)) -> dict:
+        return {
+            "risk_of_ruin": self.risk_of_ruin,
+            "mean_final_balance": self.mean(),
+            "percentiles": {p: self.percentile(p) for p in percentiles},
+            "exact": self.exact,
+            "pruned_mass": self.pruned_mass,
+        }
+
+
+def bankroll_distribution(bets, starting_balance: float, n_spins: int, max_buckets: int = 4096, epsilon: float = 1e-12) -> BankrollDistribution:
+    """
+    מחשבת את ההתפלגות המדויקת של היתרה אחרי n_spins סיבובים שבהם משחקים את אותו טופס הימורים (Flat).
+    שחקן שהיתרה שלו קטנה מסכום הטופס לא יכול להמשיך ונספר כפושט רגל.
+    """
+    if not bets:
+        raise ValueError("Betting slip is empty.")
+
+    # עובדים באגורות (Cents) שלמות כדי שהקונבולוציה תהיה על רשת שלמה ולא תצבור שגיאות עיגול
+    payouts = np.rint(slip_payout_vector(bets) * 100).astype(np.int64)
+    wager = int(round(sum(bet.amount for bet in bets) * 100))
+    start = int(round(starting_balance * 100))
+    nets, counts = np.unique(payouts - wager, return_counts=True)
+    outcome_probs = counts / WHEEL_SIZE
+
+    # צעד הרשת: המחלק המשותף הגדול ביותר של כל התוצאות האפשריות
+    step = 0
+    for net in nets:
+        step = math.gcd(step, int(abs(net)))
+    step = step or 1
+    exact = True
+    # רוחב התמיכה האמיתית אחרי גיזום: בערך ממוצע ± 10 סטיות תקן, ולא כל הטווח התיאורטי
+    mean = float(np.dot(nets, outcome_probs))
+    std = math.sqrt(float(np.dot((nets - mean) ** 2, outcome_probs)))
+    width = (20 * std * math.sqrt(n_spins) + abs(mean) * n_spins + int(nets.max() - nets.min())) / step
+    if width > max_buckets:
+        # קיבוץ לדליים: מגדילים את הצעד, ותוצאה שנופלת בין שני דליים מתחלקת ביניהם באופן יחסי
+        # (כך נשמרת התוחלת של כל סיבוב)
+        step *= math.ceil(width / max_buckets)
+        exact = False
+    kernel = {}  # היסט בתאים -> הסתברות
+    for net, p in zip(nets, outcome_probs):
+        lower, frac = divmod(int(net), step)
+        frac /= step
+        kernel[lower] = kernel.get(lower, 0.0) + p * (1 - frac)
+        if frac:
+            kernel[lower + 1] = kernel.get(lower + 1, 0.0) + p * frac
+    offsets, outcome_probs = list(kernel), list(kernel.values())
+    min_off, max_off = min(offsets), max(offsets)
+
+    # יתרה בתא k שווה start + k * step; ruin_k הוא התא הראשון שבו עדיין אפשר לממן את הטופס
+    ruin_k = math.ceil((wager - start) / step)
+    low_k = 0  # האינדקס (k) של התא הראשון במערך probs
+    probs = np.ones(1) if ruin_k <= 0 else np.zeros(0)
+    absorbed = {} if ruin_k <= 0 else {0: 1.0}  # k -> הסתברות שנבלעה (פשיטת רגל) בתא הזה
+    pruned = 0.0
+
+    for _ in range(n_spins):
+        if probs.size == 0:
+            break
+        new = np.zeros(probs.size + max_off - min_off)
+        for offset, p in zip(offsets, outcome_probs):
+            start_idx = offset - min_off
+            new[start_idx:start_idx + probs.size] += probs * p
+        low_k += min_off
+
+        # מצבים שכבר לא יכולים לממן את הטופס הבא נבלעים ולא ממשיכים להשתתף בקונבולוציה
+        cut = min(max(ruin_k - low_k, 0), new.size)
+        for i in np.nonzero(new[:cut])[0]:
+            absorbed[low_k + int(i)] = absorbed.get(low_k + int(i), 0.0) + float(new[i])
+        new = new[cut:]
+        low_k += cut
+
+        # גיזום זנבות זניחים מימין ומשמאל כדי שהמערך לא יגדל בלי צורך
+        nz = np.nonzero(new > epsilon)[0]
+        if nz.size == 0:
+            pruned += float(new.sum())
+            probs = new[:0]
+            break
+        first, last = int(nz[0]), int(nz[-1])
+        pruned += float(new[:first].sum() + new[last + 1:].sum())
+        probs = new[first:last + 1]
+        low_k += first
+
+    ruin = sum(absorbed.values())
+    ks = np.concatenate([np.array(sorted(absorbed), dtype=np.int64), np.arange(low_k, low_k + probs.size, dtype=np.int64)])
+    mass = np.concatenate([np.array([absorbed[k] for k in sorted(absorbed)]), probs])
+    order = np.argsort(ks, kind="stable")
+    values = (start + ks[order] * step) / 100.0
+    return BankrollDistribution(values, mass[order], float(ruin), pruned, exact)
+
+
+def risk_of_ruin(bets, starting_balance: float, n_spins: int) -> float:
+    """קיצור דרך: ההסתברות לפשוט רגל תוך n_spins סיבובים של אותו טופס."""
+    return bankroll_distribution(bets, starting_balance, n_spins).risk_of_ruin
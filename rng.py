@@ -0,0 +1,99 @@
+# rng.py
+# מנועי ההגרלה של הרולטה, שמוזרקים ל- MainController (ולשרת) במקום random.randint הגלובלי:
+#   SecureRNG   - מבוסס os.urandom (CSPRNG), למשחק אמיתי. ברירת המחדל.
+#   BufferedRNG - מחולל מהיר (PCG64 של NumPy) שמייצר את התוצאות מראש בבלוקים גדולים, לסימולציות ולעומסים.
+#   SeededRNG   - דטרמיניסטי לפי seed (Mersenne Twister של random.Random), לבדיקות ולשחזור (Replay) של סשן.
+# כל מנוע מחזיר מספר זוכה אחד (0-36) ב- spin(), ו- describe() מחזיר את מה שצריך כדי לבנות אותו מחדש (make_rng).
+import os
+import random
+
+from bet_engine import WHEEL_SIZE
+
+
+class WheelRNG:
+    """ממשק בסיס למנוע הגרלה."""
+    BACKEND = None
+
+    def spin(self) -> int:
+        raise NotImplementedError("Subclasses must implement spin()")
+
+    def describe(self) -> dict:
+        """שם המנוע וה- seed שלו (None אם הוא לא ניתן לשחזור)."""
+        return {"backend": self.BACKEND, "seed": None}
+
+
+class SecureRNG(WheelRNG):
+    """
+    הגרלה קריפטוגרפית מ- os.urandom (אותו מקור כמו secrets), עם חוצץ של בתים כדי לא לקרוא למערכת ההפעלה בכל סיבוב.
+    כל בית מתחת ל- 222 (6 * 37) ממופה למספר ב- % 37, ובתים מעליו נזרקים (Rejection Sampling) - אחרת חלק מהמספרים היו יוצאים יותר.
+    """
+    BACKEND = "secure"
+    LIMIT = 256 - 256 % WHEEL_SIZE
+
+    def __init__(self, block_size: int = 4096):
+        self.block_size = block_size
+        self._bytes = b""
+        self._pos = 0
+
+    def spin(self) -> int:
+        while True:
+            if self._pos >= len(self._bytes):
+                self._bytes = os.urandom(self.block_size)
+                self._pos = 0
+            value = self._bytes[self._pos]
+            self._pos += 1
+            if value < self.LIMIT:
+                return value % WHEEL_SIZE
+
+
+class BufferedRNG(WheelRNG):
+    """מייצר block_size תוצאות בבת אחת בפעולה וקטורית אחת, וכל spin() רק מחזיר את הבאה בתור."""
+    BACKEND = "buffered"
+    BLOCK_SIZE = 65536
+
+    def __init__(self, seed: int = None, block_size: int = BLOCK_SIZE):
+        import numpy as np  # נטען רק למי שבוחר במנוע הזה
+        self.seed = seed
+        self.block_size = block_size
+        self._generator = np.random.default_rng(seed)
+        self._buffer = []
+        self._pos = 0
+
+    def spin(self) -> int:
+        if self._pos >= len(self._buffer):
+            self._buffer = self._generator.integers(0, WHEEL_SIZE, size=self.block_size).tolist()
+            self._pos = 0
+        value = self._buffer[self._pos]
+        self._pos += 1
+        return value
+
+    def describe(self) -> dict:
+        return {"backend": self.BACKEND, "seed": self.seed, "block_size": self.block_size}
+
+
+class SeededRNG(WheelRNG):
+    """אותו seed נותן תמיד את אותו רצף תוצאות, בכל מחשב ובכל גרסה של פייתון."""
+    BACKEND = "seeded"
+
+    def __init__(self, seed: int):
+        self.seed = seed
+        self._random = random.Random(seed)
+
+    def spin(self) -> int:
+        return self._random.randrange(WHEEL_SIZE)
+
+    def describe(self) -> dict:
+        return {"backend": self.BACKEND, "seed": self.seed}
+
+
+def make_rng(backend: str = "secure", seed: int = None, **options) -> WheelRNG:
+    """בונה מנוע לפי השם (למשל מתוך describe() שנשמר ביומן השחזור)."""
+    if backend == SecureRNG.BACKEND:
+        return SecureRNG()
+    if backend == BufferedRNG.BACKEND:
+        return BufferedRNG(seed, **options)
+    if backend == SeededRNG.BACKEND:
+        if seed is None:
+            raise ValueError("The seeded backend needs a seed.")
+        return SeededRNG(seed)
+    raise ValueError(f"Unknown RNG backend '{backend}'.")
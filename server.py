@@ -0,0 +1,332 @@
+# server.py
+# מצב שרת (Headless) של הרולטה: שרת asyncio שמחזיק הרבה שחקנים והרבה שולחנות בו-זמנית בתהליך אחד.
+# הפרוטוקול הוא שורת JSON לכל הודעה (JSON Lines) מעל TCP מקומי, כך שאפשר לבדוק אותו עם כל לקוח פשוט.
+#
+# פקודות (שדה "cmd"):
+#   login  {"name": ...}                              - כניסה/הרשמה דרך MainController.login_or_register
+#   join   {"table": ...}                             - ישיבה בשולחן
+#   bet    {"bets": [{"key": "color:red", "amount": 10}, ...]} - הנחת טופס הימורים לסיבוב הבא של השולחן
+#   spin   {}                                         - סיבוב מיידי של השולחן (אחרת השולחן מסתובב לבד כל spin_interval)
+#   balance / leave / quit
+# אחרי כל סיבוב כל שחקן שהימר מקבל הודעת {"event": "spin", ...} עם התוצאה שלו.
+import argparse
+import asyncio
+import json
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from bet_engine import DEFAULT_TABLE
+from database import DatabaseManager
+from MainController import MainController
+from models import TableBet
+from rng import SecureRNG, WheelRNG, make_rng
+from sharding import ShardedDatabase
+
+
+class PlayerAccount:
+    """
+    החשבון של שחקן מחובר בשרת. כל החיבורים (Sessions) של אותו שחקן חולקים אותו אובייקט,
+    והמנעול (Lock) יחד עם הסכום השמור (reserved) מונעים הוצאה כפולה של אותו כסף על שני טפסים.
+    """
+    def __init__(self, player):
+        self.player = player
+        self.lock = asyncio.Lock()
+        self.reserved = 0.0  # כסף שכבר הונח על שולחנות ועוד לא נסגר בסיבוב
+        self.open_bets = 0  # כמה הימורים שלו עדיין על שולחנות (מונה שלם, כדי לא לסמוך על reserved == 0.0 בשברים)
+        self.sessions = 0  # כמה חיבורים מחוברים לחשבון; בלי חיבורים ובלי הימורים פתוחים החשבון יוצא מהזיכרון
+
+    def available(self) -> float:
+        return self.player.get_balance() - self.reserved
+
+
+class Table:
+    """שולחן רולטה: כל השחקנים שיושבים בו מהמרים על אותו מספר זוכה, והסיבוב נסגר כאצווה אחת."""
+    def __init__(self, server, name: str):
+        self.server = server
+        self.name = name
+        self.seated = set()  # Sessions שיושבים בשולחן
+        self.bets = {}  # player_id -> (PlayerAccount, [(bet, session)])
+        self._spin_lock = asyncio.Lock()
+
+    def place(self, account: PlayerAccount, session, bets: list):
+        _, placed = self.bets.setdefault(account.player.player_id, (account, []))
+        placed.extend((bet, session) for bet in bets)
+
+    async def spin(self):
+        """
+        מגריל מספר אחד, סוגר את ההימורים של כל השחקנים בשולחן ושומר את כולם בטרנזקציה אחת ב- Thread של ה- DB.
+        אם הכתיבה נכשלת (למשל database is locked) שום דבר לא נשמר: היתרות והכסף השמור חוזרים למצבם,
+        ההימורים חוזרים לשולחן לסיבוב הבא, והשגיאה נזרקת הלאה.
+        """
+        async with self._spin_lock:
+            if not self.bets:
+                return None
+            round_bets, self.bets = self.bets, {}
+            winning_number = self.server.rng.spin()
+
+            settlements = []
+            notices = []
+            applied = []  # (חשבון, סכום, רווח נקי, כמות הימורים) - מה שצריך כדי לבטל את הסיבוב בזיכרון
+            for account, placed in round_bets.values():
+                bets = [bet for bet, _ in placed]
+                payouts = DEFAULT_TABLE.settle(DEFAULT_TABLE.compile_slip(bets), winning_number)
+                wagered = sum(bet.amount for bet in bets)
+                net = sum(payouts) - wagered
+                async with account.lock:
+                    account.reserved -= wagered
+                    account.open_bets -= len(bets)
+                    account.player.update_balance(net)
+                    balance = account.player.get_balance()
+                applied.append((account, wagered, net, len(bets)))
+                settlements.append((
+                    account.player.player_id, balance,
+                    [(bet.get_description(), bet.amount, "WIN" if payout > 0 else "LOSS") for bet, payout in zip(bets, payouts)]
+                ))
+                for session in {session for _, session in placed}:
+                    notices.append((session, {
+                        "event": "spin", "table": self.name, "winning_number": winning_number,
+                        "wagered": wagered, "payout": sum(payouts), "balance": balance
+                    }))
+
+            # הכתיבה למסד נעשית מחוץ ל- Event Loop כדי שלא תעצור את שאר השחקנים.
+            # shield מבטיח שגם אם לולאת השולחן מבוטלת (כיבוי השרת) הכתיבה לא תוסר מהתור אחרי שהיתרות כבר עודכנו
+            try:
+                await asyncio.shield(self.server.run_db(self.server.db.settle_table, winning_number, settlements))
+            except Exception:
+                # כמו ב- resolve_spin: מבטלים את השינוי בזיכרון לפי ההפרש, כי בינתיים שולחן אחר יכול היה לעדכן את אותו חשבון
+                for account, wagered, net, count in applied:
+                    async with account.lock:
+                        account.reserved += wagered
+                        account.open_bets += count
+                        account.player.update_balance(-net)
+                for player_id, (account, placed) in round_bets.items():
+                    _, waiting = self.bets.setdefault(player_id, (account, []))
+                    waiting[:0] = placed  # לפני הימורים שהונחו בזמן הכתיבה שנכשלה
+                raise
+            for session, message in notices:
+                await session.send(message)
+            for account, _, _, _ in applied:
+                self.server.evict_if_idle(account)
+            return winning_number
+
+    async def run(self, interval: float):
+        """לולאת השולחן: מסובב כל interval שניות אם יש הימורים על השולחן. סיבוב שנכשל לא עוצר את השולחן."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.spin()
+            except Exception as e:
+                print(f"Table '{self.name}': spin failed ({e}); the bets stay on the table.", file=sys.stderr)
+
+
+class Session:
+    """חיבור של לקוח אחד. לכל Session יש MainController משלו, אבל החשבון (PlayerAccount) משותף בשרת."""
+    def __init__(self, server, reader, writer):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.controller = MainController(server.db)
+        self.account = None
+        self.table = None
+
+    async def send(self, message: dict):
+        try:
+            self.writer.write((json.dumps(message) + "\n").encode('utf-8'))
+            await self.writer.drain()
+        except ConnectionError:
+            pass  # הלקוח התנתק; ה- Session ייסגר בלולאת הקריאה
+
+    async def handle(self, request: dict) -> dict:
+        cmd = request.get("cmd")
+        if cmd == "login":
+            if self.account is not None:
+                self.server.release(self.account)
+                self.account = None
+            self.account = await self.server.login(self.controller, str(request.get("name") or "PlayerOne"))
+            player = self.account.player
+            return {"ok": True, "player_id": player.player_id, "name": player.name, "balance": player.get_balance()}
+        if self.account is None:
+            return {"ok": False, "error": "Login first."}
+        if cmd == "join":
+            self._leave_table()
+            self.table = self.server.get_table(str(request.get("table") or "main"))
+            self.table.seated.add(self)
+            return {"ok": True, "table": self.table.name, "players": len(self.table.seated)}
+        if cmd == "bet":
+            return await self._place_bets(request.get("bets") or [])
+        if cmd == "spin":
+            if self.table is None:
+                return {"ok": False, "error": "Join a table first."}
+            return {"ok": True, "winning_number": await self.table.spin()}
+        if cmd == "balance":
+            return {"ok": True, "balance": self.account.player.get_balance(), "available": self.account.available()}
+        if cmd == "leave":
+            self._leave_table()
+            return {"ok": True}
+        return {"ok": False, "error": f"Unknown command '{cmd}'."}
+
+    async def _place_bets(self, raw_bets: list) -> dict:
+        if self.table is None:
+            return {"ok": False, "error": "Join a table first."}
+        try:
+            bets = [TableBet(float(b["amount"]), str(b["key"])) for b in raw_bets]
+        except (KeyError, TypeError, ValueError) as e:
+            return {"ok": False, "error": f"Invalid bet: {e}"}
+        if not bets or any(bet.amount <= 0 for bet in bets):
+            return {"ok": False, "error": "Bets must have positive amounts."}
+        total = sum(bet.amount for bet in bets)
+        async with self.account.lock:
+            # בדיקת התקציב והשמירה של הכסף הן פעולה אטומית אחת תחת המנעול של השחקן
+            if total > self.account.available():
+                return {"ok": False, "error": "Insufficient funds for this betting slip."}
+            self.account.reserved += total
+            self.account.open_bets += len(bets)
+            self.table.place(self.account, self, bets)
+        return {"ok": True, "placed": len(bets), "available": self.account.available()}
+
+    def _leave_table(self):
+        # הימורים שכבר הונחו נשארים על השולחן ונסגרים בסיבוב הבא
+        if self.table is not None:
+            self.table.seated.discard(self)
+            self.table = None
+
+    async def run(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    await self.send({"ok": False, "error": "Invalid JSON."})
+                    continue
+                if request.get("cmd") == "quit":
+                    break
+                try:
+                    response = await self.handle(request)
+                except (ValueError, sqlite3.Error) as e:
+                    response = {"ok": False, "error": str(e)}
+                await self.send(response)
+        finally:
+            self._leave_table()
+            if self.account is not None:
+                self.server.release(self.account)
+            self.writer.close()
+
+
+class GameServer:
+    """השרת עצמו: מחזיק את השולחנות, את החשבונות של השחקנים המחוברים ואת ה- Thread שכותב למסד."""
+    def __init__(self, db: DatabaseManager, host: str = "127.0.0.1", port: int = 8765, spin_interval: float = 5.0,
+                 rng: WheelRNG = None):
+        self.db = db
+        self.rng = rng or SecureRNG()  # מנוע הגרלה אחד לכל השולחנות (rng.py)
+        self.host = host
+        self.port = port
+        self.spin_interval = spin_interval
+        self.tables = {}
+        self.accounts = {}  # player_id -> PlayerAccount, רק של שחקנים מחוברים או עם הימורים פתוחים
+        self._login_lock = asyncio.Lock()
+        # Thread יחיד ל- DB: SQLite מאפשר כותב אחד בכל רגע, ולכן אין טעם ביותר
+        self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db")
+        self._server = None
+        self._table_tasks = []
+
+    async def run_db(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._db_executor, func, *args)
+
+    async def login(self, controller: MainController, name: str) -> PlayerAccount:
+        async with self._login_lock:
+            player = await self.run_db(controller.login_or_register, name)
+            account = self.accounts.get(player.player_id)
+            if account is None:
+                account = self.accounts[player.player_id] = PlayerAccount(player)
+            account.sessions += 1
+            controller.current_player = account.player
+            return account
+
+    def release(self, account: PlayerAccount):
+        """חיבור שהתנתק (או התחבר לשחקן אחר) משחרר את החשבון."""
+        account.sessions -= 1
+        self.evict_if_idle(account)
+
+    def evict_if_idle(self, account: PlayerAccount):
+        """
+        מוציא מהזיכרון חשבון שאין לו חיבורים ואין לו הימורים על אף שולחן; היתרה שלו כבר במסד,
+        והכניסה הבאה תיצור חשבון חדש ממנו.
+        """
+        if not account.sessions and not account.open_bets and self.accounts.get(account.player.player_id) is account:
+            del self.accounts[account.player.player_id]
+
+    def get_table(self, name: str) -> Table:
+        table = self.tables.get(name)
+        if table is None:
+            table = self.tables[name] = Table(self, name)
+            if self.spin_interval:
+                self._table_tasks.append(asyncio.get_running_loop().create_task(table.run(self.spin_interval)))
+        return table
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            lambda r, w: Session(self, r, w).run(), self.host, self.port, limit=2 ** 20
+        )
+        self.port = self._server.sockets[0].getsockname()[1]  # חשוב כשמבקשים port=0 (פורט פנוי אקראי)
+        return self
+
+    async def serve_forever(self):
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        for task in self._table_tasks:
+            task.cancel()
+        # סיבוב אחרון לכל שולחן כדי שכסף שמור לא ייתקע בלי תוצאה
+        for table in self.tables.values():
+            try:
+                await table.spin()
+            except Exception as e:
+                # שום דבר מהסיבוב לא נשמר, כך שהמסד נשאר עקבי גם בלי הסיבוב האחרון
+                print(f"Table '{table.name}': final spin failed ({e}).", file=sys.stderr)
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        await self.run_db(self.db.flush)
+        self._db_executor.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless multi-table roulette server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--db", default="casino.db")
+    parser.add_argument("--spin-interval", type=float, default=5.0)
+    parser.add_argument("--rng", default="secure", choices=("secure", "buffered", "seeded"))
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--shards", type=int, default=1, help="split players across this many database files")
+    opts = parser.parse_args()
+
+    if opts.shards > 1:
+        db = ShardedDatabase(opts.db, opts.shards, write_behind=True)
+    else:
+        db = DatabaseManager(opts.db, write_behind=True)
+
+    async def run():
+        server = await GameServer(db, opts.host, opts.port, opts.spin_interval,
+                                  make_rng(opts.rng, opts.seed)).start()
+        print(f"Roulette server listening on {opts.host}:{server.port}")
+        try:
+            await server.serve_forever()
+        finally:
+            await server.close()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("\nShutting down...")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
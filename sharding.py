@@ -0,0 +1,337 @@
+# sharding.py
+# חלוקת השחקנים בין כמה קבצי SQLite (Shards), מאחורי אותו ממשק של DatabaseManager.
+# SQLite מאפשר כותב אחד בלבד לכל קובץ, ולכן כשכמה תהליכים או שולחנות כותבים במקביל הם מחכים אחד לשני על אותה נעילה.
+# כאן כל שחקן שייך לקובץ אחד לפי Hash יציב של השם (crc32 - אותו ערך בכל תהליך ובכל הפעלה), לכל קובץ יש DatabaseManager משלו
+# (חיבור, מנעול ותור Write-Behind נפרדים), וכתיבות של שחקנים מקבצים שונים לא חוסמות אחת את השנייה.
+# לכל קובץ יש טווח מזהים משלו (ID_SPAN מזהים לכל Shard), כך שמזהה של שחקן או של שורת היסטוריה מספיק כדי לדעת איפה הוא.
+# Shard מספר 0 מתחיל מ- 1 כמו קובץ רגיל, ולכן casino.db קיים הוא בדיוק חלוקה ל- Shard אחד.
+#
+# החלוקה מחדש (Re-shard) נעשית כשהמשחק כבוי, וכותבת סט קבצים חדש לפי המספר החדש (הקבצים הישנים לא נמחקים):
+#   python sharding.py --db casino.db --from 1 --to 4
+# חזרה לקובץ אחד (--to 1) כותבת את casino.db עצמו, ולכן העותק הלא מחולק שנשאר מהחלוקה הקודמת צריך לזוז משם קודם.
+# שימו לב: בחלוקה מחדש השחקנים מקבלים מזהים חדשים, ולכן יומני שחזור (replay.py) מלפניה כבר לא מתאימים.
+import argparse
+import heapq
+import os
+import sqlite3
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from database import DatabaseManager
+
+ID_SPAN = 2 ** 40  # כמות המזהים לכל Shard (מספיק לכמה מיליוני Shards בתוך מספר שלם של 64 ביט)
+
+
+def shard_path(db_file: str, index: int, count: int) -> str:
+    """שם הקובץ של Shard מספר index מתוך count. בחלוקה ל- Shard אחד זה הקובץ עצמו."""
+    if count == 1:
+        return db_file
+    root, ext = os.path.splitext(db_file)
+    return f"{root}.shard-{index}-of-{count}{ext}"
+
+
+def shard_for_name(name: str, count: int) -> int:
+    return zlib.crc32(name.encode("utf-8")) % count
+
+
+def shard_for_id(player_id: int) -> int:
+    return (player_id - 1) // ID_SPAN
+
+
+def _has_players(db_file: str) -> bool:
+    """האם בקובץ יש כבר שחקנים (בלי ליצור אותו ובלי להריץ הגירות)."""
+    if not os.path.exists(db_file):
+        return False
+    conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True)
+    try:
+        return conn.execute("SELECT 1 FROM players LIMIT 1").fetchone() is not None
+    except sqlite3.OperationalError:
+        return False  # אין טבלת שחקנים (קובץ שלא נוצר על ידי המשחק)
+    finally:
+        conn.close()
+
+
+class ShardedDatabase:
+    """
+    מחליף את DatabaseManager כשהשחקנים מחולקים ל- shard_count קבצים. פעולות על שחקן אחד עוברות ל- Shard שלו (לפי השם או המזהה),
+    ופעולות על כולם (דוחות, Backfill, Flush) רצות על כל ה- Shards במקביל ב- Thread לכל Shard. sqlite3 משחרר את ה- GIL בזמן
+    הכתיבה לדיסק, כך ש- Commits לקבצים שונים באמת חופפים.
+    השחקן, היתרה שלו וכל ההיסטוריה שלו תמיד באותו קובץ, ולכן כל סיבוב נשאר אטומי; סיבוב של שולחן עם שחקנים מכמה Shards
+    נכתב בטרנזקציה אחת לכל Shard.
+    """
+    def __init__(self, db_file="casino.db", shard_count: int = 4, **options):
+        self.db_file = db_file
+        self.shard_count = shard_count
+        self.shard_files = [shard_path(db_file, index, shard_count) for index in range(shard_count)]
+        self._check_layout()
+        self.shards = []
+        try:
+            for index, path in enumerate(self.shard_files):
+                shard = DatabaseManager(path, **options)
+                self.shards.append(shard)
+                shard.reserve_id_range(index * ID_SPAN + 1, (index + 1) * ID_SPAN)
+        except Exception:
+            self.close()
+            raise
+        self._pool = ThreadPoolExecutor(max_workers=shard_count, thread_name_prefix="db-shard") if shard_count > 1 else None
+
+    def _check_layout(self):
+        """לא פותחים חלוקה חלקית, ולא יוצרים Shards ריקים ליד קובץ שהשחקנים שלו עוד לא חולקו (הם פשוט היו נעלמים)."""
+        existing = [path for path in self.shard_files if os.path.exists(path)]
+        if existing and len(existing) < self.shard_count:
+            missing = sorted(set(self.shard_files) - set(existing))
+            raise sqlite3.DatabaseError(f"Shard files missing for a {self.shard_count}-way layout: {', '.join(missing)}")
+        if not existing and self.shard_count > 1 and _has_players(self.db_file):
+            raise sqlite3.DatabaseError(
+                f"{self.db_file} holds unsharded players; run 'python sharding.py --db {self.db_file} "
+                f"--from 1 --to {self.shard_count}' first."
+            )
+
+    def close(self):
+        if getattr(self, "_pool", None) is not None:
+            self.fan_out("close")
+            self._pool.shutdown()
+            self._pool = None
+        else:
+            for shard in self.shards:
+                shard.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # --- ניתוב ---
+    def shard_by_name(self, name: str) -> DatabaseManager:
+        return self.shards[shard_for_name(name, self.shard_count)]
+
+    def shard_by_id(self, player_id: int) -> DatabaseManager:
+        return self.shards[shard_for_id(player_id)]
+
+    def fan_out(self, method: str, *args) -> list:
+        """מריצה את אותה מתודה על כל ה- Shards במקביל ומחזירה את התוצאות לפי סדר ה- Shards."""
+        if self._pool is None:
+            return [getattr(shard, method)(*args) for shard in self.shards]
+        futures = [self._pool.submit(getattr(shard, method), *args) for shard in self.shards]
+        return [future.result() for future in futures]
+
+    def _run_grouped(self, groups: dict, call):
+        """call(shard, items) לכל Shard שיש לו עבודה - במקביל כשיש יותר מאחד."""
+        if len(groups) == 1 or self._pool is None:
+            for index, items in groups.items():
+                call(self.shards[index], items)
+            return
+        futures = [self._pool.submit(call, self.shards[index], items) for index, items in groups.items()]
+        for future in futures:
+            future.result()
+
+    @property
+    def flush_errors(self) -> int:
+        return sum(shard.flush_errors for shard in self.shards)
+
+    @property
+    def schema_version(self) -> int:
+        return min(shard.schema_version for shard in self.shards)
+
+    # --- שחקנים ---
+    def load_player(self, name: str) -> dict:
+        return self.shard_by_name(name).load_player(name)
+
+    def load_player_by_id(self, player_id: int) -> dict:
+        return self.shard_by_id(player_id).load_player_by_id(player_id)
+
+    def create_player(self, name: str, starting_balance: float) -> int:
+        return self.shard_by_name(name).create_player(name, starting_balance)
+
+    def login_player(self, name: str, starting_balance: float) -> dict:
+        return self.shard_by_name(name).login_player(name, starting_balance)
+
+    def update_player_balance(self, player_id: int, new_balance: float):
+        self.shard_by_id(player_id).update_player_balance(player_id, new_balance)
+
+    def delete_player(self, player_id: int):
+        self.shard_by_id(player_id).delete_player(player_id)
+
+    # --- היסטוריה וסגירת סיבובים ---
+    def record_bet_history(self, player_id: int, bet_desc: str, amount: float, status: str, outcome_number: int):
+        self.shard_by_id(player_id).record_bet_history(player_id, bet_desc, amount, status, outcome_number)
+
+    def settle_spin(self, player_id: int, new_balance: float, bet_desc: str, amount: float, status: str, outcome_number: int):
+        self.shard_by_id(player_id).settle_spin(player_id, new_balance, bet_desc, amount, status, outcome_number)
+
+    def settle_slip(self, player_id: int, new_balance: float, outcome_number: int, bet_rows: list):
+        self.shard_by_id(player_id).settle_slip(player_id, new_balance, outcome_number, bet_rows)
+
+    def settle_table(self, outcome_number: int, settlements: list):
+        groups = {}
+        for settlement in settlements:
+            groups.setdefault(shard_for_id(settlement[0]), []).append(settlement)
+        self._run_grouped(groups, lambda shard, items: shard.settle_table(outcome_number, items))
+
+    def flush(self):
+        self.fan_out("flush")
+
+    def get_player_stats(self, player_id: int):
+        return self.shard_by_id(player_id).get_player_stats(player_id)
+
+    def backfill_stats(self, player_id: int = None):
+        if player_id is None:
+            self.fan_out("backfill_stats")
+        else:
+            self.shard_by_id(player_id).backfill_stats(player_id)
+
+    def get_player_history(self, player_id: int, limit: int = 20):
+        return self.shard_by_id(player_id).get_player_history(player_id, limit)
+
+    def iter_player_history(self, player_id: int, page_size: int = 500, before_id: int = None):
+        return self.shard_by_id(player_id).iter_player_history(player_id, page_size, before_id)
+
+    def iter_history_chunks(self, player_id: int, chunk_size: int = 50000, after_id: int = 0):
+        return self.shard_by_id(player_id).iter_history_chunks(player_id, chunk_size, after_id)
+
+    def last_history_id(self, player_id: int) -> int:
+        return self.shard_by_id(player_id).last_history_id(player_id)
+
+    def clear_player_history(self, player_id: int):
+        self.shard_by_id(player_id).clear_player_history(player_id)
+
+    # --- דוחות על כל השחקנים (Fan-out) ---
+    def get_leaderboard(self, limit: int = 10) -> list:
+        """ה- limit הגבוהים מכל Shard, ומהם ה- limit הגבוהים בסך הכל."""
+        rows = [row for shard_rows in self.fan_out("get_leaderboard", limit) for row in shard_rows]
+        return heapq.nsmallest(limit, rows, key=lambda row: (-row[2], row[0]))
+
+    def get_casino_totals(self) -> dict:
+        totals = {}
+        for shard_totals in self.fan_out("get_casino_totals"):
+            for key, value in shard_totals.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def compact_history(self, cutoff: str, archive_file: str, chunk_size: int = 5000, max_chunks: int = None) -> dict:
+        """
+        Retention לכל ה- Shards, אחד אחרי השני (כולם כותבים לאותו קובץ ארכיון; המזהים לא מתנגשים כי לכל Shard טווח משלו).
+        max_chunks חל על כל Shard בנפרד.
+        """
+        report = {}
+        for shard in self.shards:
+            for key, value in shard.compact_history(cutoff, archive_file, chunk_size, max_chunks).items():
+                report[key] = report.get(key, 0) + value
+        return report
+
+
+def reshard(db_file: str, old_count: int, new_count: int) -> dict:
+    """
+    מחלקת מחדש את כל השחקנים מ- old_count קבצים ל- new_count קבצים חדשים (כשהמשחק כבוי). כל שחקן עובר ל- Shard לפי השם שלו
+    ומקבל מזהה חדש בטווח של ה- Shard, ושורות ההיסטוריה, הסטטיסטיקה והסיכומים היומיים שלו מועתקים איתו באותו סדר.
+    ההעתקה עצמה היא INSERT ... SELECT מתוך הקובץ הישן (ATTACH) דרך טבלת מיפוי זמנית, בטרנזקציה אחת לכל זוג קבצים.
+    """
+    sources = [shard_path(db_file, index, old_count) for index in range(old_count)]
+    targets = [shard_path(db_file, index, new_count) for index in range(new_count)]
+    missing = [path for path in sources if not os.path.exists(path)]
+    if missing:
+        raise FileNotFoundError(f"Missing source shards: {', '.join(missing)}")
+    if new_count == 1 and os.path.exists(db_file):
+        # חלוקה ל- Shard אחד כותבת לקובץ עצמו, ושם בדרך כלל עדיין יושב העותק הלא מחולק שנשאר מהחלוקה הקודמת
+        raise FileExistsError(
+            f"Merging into 1 shard writes {db_file} itself, which already exists (probably the unsharded copy left by an "
+            f"earlier re-shard). Move {db_file} and its -wal/-shm files away, then run again."
+        )
+    clashing = [path for path in targets if os.path.exists(path)]
+    if clashing:
+        raise FileExistsError(f"Target files already exist: {', '.join(clashing)}")
+
+    for path in sources:  # הגירת הסכמה של הקבצים הישנים (למשל spin_id), כדי שיהיו להם אותן עמודות כמו ליעד
+        DatabaseManager(path).close()
+    for index, path in enumerate(targets):  # יצירת הקבצים, הסכמה וטווחי המזהים
+        with DatabaseManager(path) as shard:
+            shard.reserve_id_range(index * ID_SPAN + 1, (index + 1) * ID_SPAN)
+    conns = [sqlite3.connect(path, isolation_level=None) for path in targets]
+    report = {"players": 0, "history": 0, "per_shard": [0] * new_count}
+    try:
+        next_ids = []
+        for conn in conns:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TEMP TABLE id_map (old_id INTEGER PRIMARY KEY, new_id INTEGER NOT NULL)")
+            next_ids.append(conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'players'").fetchone()[0])
+
+        for source in sources:
+            moves = [[] for _ in targets]
+            src = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+            try:
+                for old_id, name, balance in src.execute("SELECT id, name, balance FROM players ORDER BY id"):
+                    index = shard_for_name(name, new_count)
+                    next_ids[index] += 1
+                    moves[index].append((old_id, next_ids[index], name, balance))
+            finally:
+                src.close()
+
+            for index, conn in enumerate(conns):
+                if not moves[index]:
+                    continue
+                conn.execute("ATTACH DATABASE ? AS src", (source,))
+                try:
+                    conn.execute("BEGIN")
+                    try:
+                        conn.execute("DELETE FROM temp.id_map")
+                        conn.executemany("INSERT INTO temp.id_map VALUES (?, ?)", [(old, new) for old, new, _, _ in moves[index]])
+                        conn.executemany("INSERT INTO players (id, name, balance) VALUES (?, ?, ?)",
+                                         [(new, name, balance) for _, new, name, balance in moves[index]])
+                        # המזהים החדשים ממשיכים מהרצף של היעד לפי סדר h.id, כך שסדר ההיסטוריה של כל שחקן נשמר.
+                        # spin_id הוא id של השורה הראשונה בסיבוב, ולכן הוא מתורגם ל- id החדש של אותה שורה
+                        last_id = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'history'").fetchone()[0]
+                        report["history"] += conn.execute('''
+                            INSERT INTO history (id, player_id, bet_desc, amount, status, outcome_number, timestamp, spin_id)
+                            SELECT new_row_id, new_id, bet_desc, amount, status, outcome_number, timestamp,
+                                   CASE WHEN spin_id IS NOT NULL
+                                        THEN FIRST_VALUE(new_row_id) OVER (PARTITION BY player_id, spin_id ORDER BY id) END
+                            FROM (
+                                SELECT h.*, m.new_id, ? + ROW_NUMBER() OVER (ORDER BY h.id) AS new_row_id
+                                FROM src.history h JOIN temp.id_map m ON m.old_id = h.player_id
+                            )
+                            ORDER BY id
+                        ''', (last_id,)).rowcount
+                        conn.execute('''
+                            INSERT INTO player_stats
+                            SELECT m.new_id, s.spins, s.total_bets, s.total_wagered, s.net_pl, s.max_win, s.max_loss,
+                                   s.win_count, s.outcome_counts, s.recent
+                            FROM src.player_stats s JOIN temp.id_map m ON m.old_id = s.player_id
+                        ''')
+                        conn.execute('''
+                            INSERT INTO history_daily
+                            SELECT m.new_id, d.day, d.spins, d.total_bets, d.total_wagered, d.net_pl, d.max_win, d.max_loss,
+                                   d.win_count, d.outcome_counts
+                            FROM src.history_daily d JOIN temp.id_map m ON m.old_id = d.player_id
+                        ''')
+                        conn.execute("COMMIT")
+                    except BaseException:
+                        conn.execute("ROLLBACK")
+                        raise
+                finally:
+                    conn.execute("DETACH DATABASE src")
+                report["players"] += len(moves[index])
+                report["per_shard"][index] += len(moves[index])
+    finally:
+        for conn in conns:
+            conn.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Redistribute roulette players across a new number of database shards")
+    parser.add_argument("--db", default="casino.db", help="base database file name")
+    parser.add_argument("--from", dest="old_count", type=int, default=1, help="current shard count (1 = the plain file)")
+    parser.add_argument("--to", dest="new_count", type=int, required=True, help="new shard count")
+    opts = parser.parse_args()
+    if opts.old_count == opts.new_count:
+        parser.error("--from and --to must differ")
+
+    report = reshard(opts.db, opts.old_count, opts.new_count)
+    print(f"Moved {report['players']} players and {report['history']} history rows into {opts.new_count} shards "
+          f"({', '.join(map(str, report['per_shard']))} players each).")
+    print(f"The old files ({opts.old_count}-way layout) were left in place; remove them once the new layout is verified.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# simulation.py
+# סימולטור Monte Carlo לאסטרטגיות הימור (Flat, Martingale, D'Alembert, Fibonacci).
+# במקום לשחק סיבוב-סיבוב דרך MainController.resolve_spin (עם כתיבה למסד בכל סיבוב), מגרילים תוצאות במנות גדולות של NumPy
+# ומחשבים את כל הניסויים (Trials) במקביל בפעולות מערכים. התשלומים נלקחים מאותה טבלת תשלומים שבה משתמשים המודלים (bet_engine).
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from bet_engine import DEFAULT_TABLE, WHEEL_SIZE
+
+STRATEGIES = ("flat", "martingale", "dalembert", "fibonacci")
+
+
+def slip_payout_vector(bets) -> np.ndarray:
+    """
+    מחשבת עבור טופס הימורים את סך התשלום לכל אחת מ- 37 התוצאות האפשריות:
+    שורות מטריצת התשלומים כפול הסכומים (מכפלה סקלרית לכל מספר על הגלגל).
+    """
+    compiled = DEFAULT_TABLE.compile_slip(bets)
+    return np.array([sum(DEFAULT_TABLE.settle(compiled, n)) for n in range(WHEEL_SIZE)], dtype=np.float64)
+
+
+def _fibonacci(length: int) -> np.ndarray:
+    fib = [1, 1]
+    while len(fib) < length:
+        fib.append(fib[-1] + fib[-2])
+    return np.array(fib[:length], dtype=np.float64)
+
+
+def _run_trials(payouts, wager, strategy, starting_balance, n_spins, n_trials, seed_seq, batch_size, max_units):
+    """
+    מריצה n_trials ניסויים בלתי תלויים עם זרם אקראיות (RNG) משלה. כל ניסוי הוא עמודה במערכים,
+    והלולאה היחידה בפייתון היא על הסיבובים - כל סיבוב מעדכן את כל הניסויים בבת אחת.
+    מחזירה (יתרות סופיות, סיבוב הפשיטה או -1, כמות סיבובים ששוחקו, סך הסכומים שהומרו).
+    """
+    rng = np.random.Generator(np.random.PCG64(seed_seq))
+    net_per_unit = payouts - wager  # רווח/הפסד נקי של יחידת טופס אחת לכל תוצאה
+    fib = _fibonacci(max_units + 2)
+
+    balance = np.full(n_trials, starting_balance, dtype=np.float64)
+    units = np.ones(n_trials, dtype=np.float64)  # מכפיל הטופס הנוכחי שקובעת האסטרטגיה
+    fib_index = np.zeros(n_trials, dtype=np.int64)
+    bust_spin = np.full(n_trials, -1, dtype=np.int64)
+    spins_played = np.zeros(n_trials, dtype=np.int64)
+    total_wagered = np.zeros(n_trials, dtype=np.float64)
+    active = np.ones(n_trials, dtype=bool)
+
+    spin = 0
+    while spin < n_spins and active.any():
+        block = min(batch_size, n_spins - spin)
+        outcomes = rng.integers(0, WHEEL_SIZE, size=(block, n_trials), dtype=np.int8)
+        for row in outcomes:
+            stake = units * wager
+            # שחקן שלא יכול לממן את הטופס הבא פשט רגל ומפסיק לשחק
+            busted = active & (stake > balance)
+            bust_spin[busted] = spin
+            active &= ~busted
+            if not active.any():
+                break
+
+            net = np.where(active, units * net_per_unit[row], 0.0)
+            balance += net
+            total_wagered += np.where(active, stake, 0.0)
+            spins_played += active
+            won = net > 0
+
+            # עדכון גודל ההימור הבא לפי האסטרטגיה
+            if strategy == "martingale":
+                units = np.where(won, 1.0, np.minimum(units * 2, max_units))
+            elif strategy == "dalembert":
+                units = np.where(won, np.maximum(units - 1, 1.0), np.minimum(units + 1, max_units))
+            elif strategy == "fibonacci":
+                fib_index = np.where(won, np.maximum(fib_index - 2, 0), np.minimum(fib_index + 1, len(fib) - 1))
+                units = np.minimum(fib[fib_index], max_units)
+            spin += 1
+
+    # ניסויים שבסוף הריצה כבר לא יכולים לממן את הטופס הבא נחשבים גם הם כפושטי רגל
+    broke = (bust_spin < 0) & (units * wager > balance)
+    bust_spin[broke] = spins_played[broke]
+    return balance, bust_spin, spins_played, total_wagered
+
+
+class SimulationResult:
+    """תוצאות הסימולציה: התפלגות היתרה הסופית, זמן עד פשיטת רגל ותוחלת (EV)."""
+    def __init__(self, strategy: str, starting_balance: float, n_spins: int, final_balances, bust_spins, spins_played, total_wagered, theoretical_ev: float):
+        self.strategy = strategy
+        self.starting_balance = starting_balance
+        self.n_spins = n_spins
+        self.final_balances = final_balances
+        self.bust_spins = bust_spins
+        self.spins_played = spins_played
+        self.total_wagered = total_wagered
+        self.theoretical_ev = theoretical_ev  # תוחלת רווח לכל 1$ שהומר, לפי טבלת התשלומים
+
+    @property
+    def n_trials(self) -> int:
+        return len(self.final_balances)
+
+    def risk_of_ruin(self) -> float:
+        return float(np.mean(self.bust_spins >= 0))
+
+    def summary(self, percentiles=(1, 5, 25, 50, 75, 95, 99)) -> dict:
+        busted = self.bust_spins[self.bust_spins >= 0]
+        net = self.final_balances - self.starting_balance
+        wagered = self.total_wagered.sum()
+        return {
+            "strategy": self.strategy,
+            "trials": self.n_trials,
+            "spins": self.n_spins,
+            "mean_final_balance": float(self.final_balances.mean()),
+            "std_final_balance": float(self.final_balances.std()),
+            "percentiles": {p: float(v) for p, v in zip(percentiles, np.percentile(self.final_balances, percentiles))},
+            "risk_of_ruin": self.risk_of_ruin(),
+            "mean_time_to_bust": float(busted.mean()) if len(busted) else None,
+            "median_time_to_bust": float(np.median(busted)) if len(busted) else None,
+            "ev_per_trial": float(net.mean()),
+            "ev_per_spin": float(net.sum() / max(self.spins_played.sum(), 1)),
+            "observed_edge": float(net.sum() / wagered) if wagered else 0.0,
+            "theoretical_edge": self.theoretical_ev,
+        }
+
+
+def simulate(bets, strategy: str = "flat", starting_balance: float = 5000.0, n_spins: int = 1000,
+             n_trials: int = 10000, seed=None, workers: int = None, batch_size: int = 256, max_units: int = 1024) -> SimulationResult:
+    """
+    מריצה סימולציה של אסטרטגיה על טופס הימורים (רשימת BaseBet שמייצגת יחידת הימור אחת).
+    הניסויים מחולקים בין תהליכים (Process Pool), ולכל תהליך זרם RNG עצמאי שנגזר מאותו seed,
+    כך שאותו seed (עם אותה כמות תהליכים) תמיד נותן את אותן התוצאות.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy '{strategy}'. Choose from: {', '.join(STRATEGIES)}")
+    if not bets:
+        raise ValueError("Betting slip is empty.")
+
+    payouts = slip_payout_vector(bets)
+    wager = float(sum(bet.amount for bet in bets))
+    theoretical_ev = float(payouts.mean() - wager) / wager
+
+    workers = workers or os.cpu_count() or 1
+    workers = max(1, min(workers, n_trials))
+    chunk_sizes = [n_trials // workers + (1 if i < n_trials % workers else 0) for i in range(workers)]
+    seeds = np.random.SeedSequence(seed).spawn(workers)
+    args = [(payouts, wager, strategy, starting_balance, n_spins, size, seed_seq, batch_size, max_units)
+            for size, seed_seq in zip(chunk_sizes, seeds)]
+
+    if workers == 1:
+        parts = [_run_trials(*args[0])]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_run_trials, *zip(*args)))
+
+    balances, bust_spins, spins_played, wagered = (np.concatenate(column) for column in zip(*parts))
+    return SimulationResult(strategy, starting_balance, n_spins, balances, bust_spins, spins_played, wagered, theoretical_ev)
+
+
+def main():
+    """הרצה מהמסוף, למשל: python simulation.py --bet color:red --amount 10 --strategy martingale"""
+    from models import TableBet
+
+    parser = argparse.ArgumentParser(description="Monte Carlo roulette strategy simulator")
+    parser.add_argument("--bet", action="append", default=None, help="table key, e.g. color:red, number:17, dozen:2 (repeatable)")
+    parser.add_argument("--amount", type=float, default=10.0, help="base unit wagered on each bet")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="flat")
+    parser.add_argument("--balance", type=float, default=5000.0)
+    parser.add_argument("--spins", type=int, default=1000)
+    parser.add_argument("--trials", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    opts = parser.parse_args()
+
+    bets = [TableBet(opts.amount, key) for key in (opts.bet or ["color:red"])]
+    result = simulate(bets, opts.strategy, opts.balance, opts.spins, opts.trials, opts.seed, opts.workers)
+    for key, value in result.summary().items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
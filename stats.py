@@ -0,0 +1,123 @@
+# stats.py
+# סטטיסטיקות שחקן שמתעדכנות באופן מצטבר (Incremental) בכל פעם שסיבוב נשמר, במקום לחשב מחדש את כל טבלת ההיסטוריה.
+# כל הנתונים שה- README מבטיח (הזכייה הגדולה, ההפסד הגדול, המספרים החמים, 10 התוצאות האחרונות) נקראים ב- O(1).
+from collections import deque
+
+from bet_engine import DEFAULT_TABLE, WHEEL_SIZE
+
+
+def row_net(bet_desc: str, amount: float, status: str) -> float:
+    """
+    הרווח/ההפסד הנקי של שורת היסטוריה. טבלת ההיסטוריה שומרת רק את התיאור, ולכן המכפיל נשלף מטבלת התשלומים לפי התיאור.
+    תיאור שלא מוכר לטבלה נחשב כהימור של 1:1.
+    """
+    if status != "WIN":
+        return -amount
+    entry = DEFAULT_TABLE.get_by_description(bet_desc)
+    multiplier = entry.multiplier if entry else 2
+    return amount * (multiplier - 1)
+
+
+def spin_key(player_id: int, timestamp: str, outcome_number: int, spin_id: int):
+    """המפתח שמזהה את הסיבוב של שורת היסטוריה: (player_id, spin_id), ולשורה בלי spin_id - (player_id, timestamp, outcome_number)."""
+    return (player_id, spin_id) if spin_id is not None else (player_id, timestamp, outcome_number)
+
+
+def iter_spins(rows):
+    """
+    מקבצת שורות היסטוריה (player_id, bet_desc, amount, status, outcome_number, timestamp, spin_id) לפי הסדר שלהן לסיבובים:
+    שורות רצופות של אותו שחקן עם אותו spin_id הן סיבוב אחד (טופס הימורים). לשורה בלי spin_id (שנכתבה ישירות למסד)
+    נשאר הקיבוץ הישן - אותו שחקן, אותו זמן ואותו מספר זוכה.
+    מחזירה (player_id, timestamp, outcome_number, [(bet_desc, amount, status), ...]) לכל סיבוב.
+    """
+    current, spin, spin_rows = None, None, []
+    for pid, desc, amount, status, outcome, timestamp, spin_id in rows:
+        key = spin_key(pid, timestamp, outcome, spin_id)
+        if key != current:
+            if spin_rows:
+                yield spin + (spin_rows,)
+                spin_rows = []
+            current, spin = key, (pid, timestamp, outcome)
+        spin_rows.append((desc, amount, status))
+    if spin_rows:
+        yield spin + (spin_rows,)
+
+
+class PlayerStats:
+    """הצבירה של שחקן אחד: סכומים מצטברים, מקסימום זכייה/הפסד, מונה תוצאות של 37 תאים וחוצץ טבעתי (Ring Buffer) של התוצאות האחרונות."""
+    def __init__(self, player_id: int, recent_size: int = 10):
+        self.player_id = player_id
+        self.spins = 0
+        self.total_bets = 0
+        self.total_wagered = 0.0
+        self.net_pl = 0.0
+        self.max_win = 0.0
+        self.max_loss = 0.0
+        self.win_count = 0
+        self.outcome_counts = [0] * WHEEL_SIZE
+        self.recent = deque(maxlen=recent_size)
+
+    def apply_spin(self, outcome_number: int, bet_rows):
+        """מעדכנת את הצבירה עם סיבוב אחד. bet_rows היא רשימה של (bet_desc, amount, status)."""
+        self.spins += 1
+        self.outcome_counts[outcome_number] += 1
+        self.recent.append(outcome_number)
+        for bet_desc, amount, status in bet_rows:
+            net = row_net(bet_desc, amount, status)
+            self.total_bets += 1
+            self.total_wagered += amount
+            self.net_pl += net
+            if status == "WIN":
+                self.win_count += 1
+                self.max_win = max(self.max_win, net)
+            else:
+                self.max_loss = max(self.max_loss, -net)
+
+    def merge(self, other: "PlayerStats"):
+        """
+        מוסיפה לצבירה הזו צבירה אחרת של אותו שחקן (למשל סיכום יומי מתוך history_daily).
+        הסכומים, המונים וזכייה/הפסד מקסימליים מתחברים בדיוק; התוצאות האחרונות (recent) לא עוברות.
+        """
+        self.spins += other.spins
+        self.total_bets += other.total_bets
+        self.total_wagered += other.total_wagered
+        self.net_pl += other.net_pl
+        self.win_count += other.win_count
+        self.max_win = max(self.max_win, other.max_win)
+        self.max_loss = max(self.max_loss, other.max_loss)
+        self.outcome_counts = [a + b for a, b in zip(self.outcome_counts, other.outcome_counts)]
+
+    def hot_numbers(self, count: int = 3) -> list:
+        """המספרים שיצאו הכי הרבה פעמים (רק מספרים שיצאו לפחות פעם אחת)."""
+        ranked = sorted(range(WHEEL_SIZE), key=lambda n: self.outcome_counts[n], reverse=True)
+        return [n for n in ranked[:count] if self.outcome_counts[n] > 0]
+
+    def to_row(self) -> tuple:
+        """שורה לטבלת player_stats במסד הנתונים."""
+        return (
+            self.player_id, self.spins, self.total_bets, self.total_wagered, self.net_pl,
+            self.max_win, self.max_loss, self.win_count,
+            ",".join(map(str, self.outcome_counts)), ",".join(map(str, self.recent))
+        )
+
+    @classmethod
+    def from_row(cls, row, recent_size: int = 10):
+        stats = cls(row[0], recent_size)
+        stats.spins, stats.total_bets, stats.total_wagered, stats.net_pl = row[1], row[2], row[3], row[4]
+        stats.max_win, stats.max_loss, stats.win_count = row[5], row[6], row[7]
+        stats.outcome_counts = [int(x) for x in row[8].split(",")]
+        stats.recent.extend(int(x) for x in row[9].split(",") if x)
+        return stats
+
+    def as_dict(self) -> dict:
+        return {
+            "spins": self.spins,
+            "total_bets": self.total_bets,
+            "total_wagered": self.total_wagered,
+            "net_pl": self.net_pl,
+            "biggest_win": self.max_win,
+            "biggest_loss": self.max_loss,
+            "win_count": self.win_count,
+            "hot_numbers": self.hot_numbers(),
+            "recent_outcomes": list(self.recent),
+        }
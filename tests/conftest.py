@@ -0,0 +1,22 @@
+# conftest.py
+# המודולים של המשחק יושבים בשורש המאגר (בלי חבילה), ולכן מוסיפים אותו ל- sys.path של הבדיקות.
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager  # noqa: E402
+
+
+@pytest.fixture
+def db_file(tmp_path):
+    return str(tmp_path / "casino.db")
+
+
+@pytest.fixture
+def db(db_file):
+    manager = DatabaseManager(db_file)
+    yield manager
+    manager.close()
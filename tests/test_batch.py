@@ -0,0 +1,43 @@
+# בדיקות למצב Batch (views.BatchView): פירוק התסריט, חזרות וסיכום הריצה.
+import io
+
+import pytest
+
+from MainController import MainController
+from rng import SeededRNG
+from views import BatchView
+
+
+def _run(db, script, balance=None, **options):
+    controller = MainController(db, rng=SeededRNG(21))
+    if balance is not None:
+        controller.login_or_register("PlayerOne", balance)
+    out = io.StringIO()
+    summary = BatchView(controller, out=out, **options).run(script.splitlines())
+    return summary, out.getvalue().splitlines()
+
+
+def test_script_summary(db):
+    summary, output = _run(db, "bet color 5 red\nslip number 1 7; parity 2 odd\n# comment\n\nbalance\n")
+    assert (summary["commands"], summary["spins"], summary["bets"]) == (3, 2, 3)
+    assert summary["wagered"] == 8.0
+    assert output[-2].startswith("Balance: $")
+
+
+def test_nested_repeat_multiplies(db):
+    summary, _ = _run(db, "repeat 2 repeat 3 bet color 1 red\n", echo=False)
+    assert (summary["commands"], summary["spins"]) == (6, 6)
+
+
+def test_interrupted_repeat_counts_completed_commands(db):
+    # עם ה- seed הזה שלושת ההימורים הראשונים מפסידים, והרביעי נכשל על יתרה לא מספיקה
+    summary, _ = _run(db, "repeat 10 bet number 10 36\n", balance=30.0, echo=False)
+    assert (summary["commands"], summary["spins"], summary["errors"]) == (3, 3, 1)
+    assert summary["error_samples"][0]["error"] == "Insufficient funds for this bet."
+
+
+@pytest.mark.parametrize("line", ["repeat x bet color 1 red", "repeat 2", "bet color 0 red", "bet number 1 37", "dance"])
+def test_bad_lines_are_errors(db, line):
+    summary, output = _run(db, line + "\n")
+    assert summary["errors"] == 1 and summary["commands"] == 0
+    assert output[0].startswith("line 1: error:")
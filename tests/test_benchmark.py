@@ -0,0 +1,42 @@
+# בדיקות לחבילת המדידות (benchmark.py): לוגיקת הסף של compare על תוצאות סינתטיות, והרצה קצרה של מדידה אחת.
+import pytest
+
+from benchmark import bench_settlement, compare
+
+
+def _results(**values):
+    # מדדים שנגמרים ב- ops_s הם תפוקה (גבוה יותר עדיף); כל השאר זמנים (נמוך יותר עדיף)
+    return {"results": {
+        name: {"value": value, "unit": "ops/s" if name.endswith("ops_s") else "ms",
+               "better": "higher" if name.endswith("ops_s") else "lower"}
+        for name, value in values.items()
+    }}
+
+
+def test_regressions_respect_direction_and_threshold():
+    baseline = _results(spin_p99_ms=10.0, settle_ops_s=1000.0, history_p99_ms=2.0)
+    current = _results(spin_p99_ms=10.9, settle_ops_s=850.0, history_p99_ms=1.0)
+    # זמן שעלה ב- 9% בתוך הסף; תפוקה שירדה ב- 15% היא נסיגה; זמן שירד הוא שיפור
+    assert compare(current, baseline, threshold=0.10) == [("settle_ops_s", 1000.0, 850.0, pytest.approx(0.15))]
+    assert [name for name, *_ in compare(current, baseline, threshold=0.05)] == ["spin_p99_ms", "settle_ops_s"]
+
+
+def test_per_metric_overrides():
+    baseline = _results(spin_p99_ms=10.0, settle_ops_s=1000.0)
+    current = _results(spin_p99_ms=14.0, settle_ops_s=1000.0)
+    assert [name for name, *_ in compare(current, baseline)] == ["spin_p99_ms"]
+    assert compare(current, baseline, overrides={"spin_p99_ms": 0.5}) == []
+
+
+def test_metrics_missing_from_one_side_are_skipped():
+    baseline = _results(old_p99_ms=1.0, zero_p99_ms=0.0)
+    current = _results(new_p99_ms=50.0, zero_p99_ms=3.0)
+    assert compare(current, baseline) == []
+    assert compare(current, {}) == []
+
+
+def test_settlement_bench_reports_metric_tuples():
+    found = bench_settlement(n=500)
+    assert found
+    for value, unit, better in found.values():
+        assert value > 0 and unit in ("ms", "ops/s") and better in ("lower", "higher")
@@ -0,0 +1,50 @@
+# בדיקות לטבלת התשלומים (bet_engine): סגירת טופס, והימורים מותאמים אישית שלא נכנסים לטבלה המשותפת.
+import pytest
+
+from bet_engine import DEFAULT_TABLE, WHEEL_SIZE, build_standard_table
+from models import BaseBet, ColorBet, NumberBet, ParityBet, TableBet
+from stats import row_net
+
+
+class SixLineBet(BaseBet):
+    """הימור מותאם אישית (בלי get_table_key): שש שורות החל מ- first, משלם 6 כולל הקרן."""
+    def __init__(self, amount: float, first: int):
+        super().__init__(amount)
+        self.first = first
+
+    def is_winning_bet(self, winning_number: int) -> bool:
+        return self.first <= winning_number < self.first + 6
+
+    def get_payout_multiplier(self) -> int:
+        return 6
+
+    def get_description(self) -> str:
+        return f"Six Line {self.first}-{self.first + 5}"
+
+
+def test_settle_matches_the_bet_classes():
+    bets = [NumberBet(10, 17), ColorBet(5, "red"), ParityBet(2, "odd"), TableBet(3, "dozen:2"), SixLineBet(4, 13)]
+    compiled = DEFAULT_TABLE.compile_slip(bets)
+    for n in range(WHEEL_SIZE):
+        expected = [bet.amount * bet.get_payout_multiplier() if bet.is_winning_bet(n) else 0 for bet in bets]
+        assert DEFAULT_TABLE.settle(compiled, n) == pytest.approx(expected)
+
+
+def test_custom_bets_do_not_grow_the_shared_table():
+    size, matrix = len(DEFAULT_TABLE), DEFAULT_TABLE.matrix
+    for first in range(1, 32):
+        DEFAULT_TABLE.compile_bet(SixLineBet(1, first))
+    assert len(DEFAULT_TABLE) == size
+    assert DEFAULT_TABLE.matrix is matrix
+    # התיאור של הימור שקומפל מוכר גם לחישוב הרווח של שורת היסטוריה
+    assert row_net("Six Line 1-6", 10.0, "WIN") == 50.0
+
+
+def test_custom_cache_is_bounded():
+    table = build_standard_table()
+    table.CUSTOM_CACHE_SIZE = 8
+    first = table.compile_bet(SixLineBet(1, 1))
+    assert table.compile_bet(SixLineBet(2, 1)) is first
+    for start in range(1, 32):
+        table.compile_bet(SixLineBet(1, start))
+        assert len(table._custom) <= 8
@@ -0,0 +1,34 @@
+# בדיקות לחיבור הקבוע של DatabaseManager: מצב WAL, שימוש חוזר באותו חיבור וסגירה מסודרת.
+import os
+import sqlite3
+
+import pytest
+
+from database import DatabaseManager
+
+
+def test_one_connection_in_wal_mode(db):
+    with db._get_connection() as first:
+        assert first.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert first.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+    with db._get_connection() as second:
+        assert second is first
+
+
+def test_close_commits_and_releases_the_connection(db_file):
+    db = DatabaseManager(db_file)
+    player_id = db.create_player("ann", 10.0)
+    db.update_player_balance(player_id, 7.5)
+    assert os.path.exists(db_file + "-wal")
+    db.close()
+    db.close()  # בטוח לקריאה כפולה
+    with pytest.raises(sqlite3.ProgrammingError, match="closed"):
+        db.load_player("ann")
+    # כשהחיבור האחרון נסגר SQLite מעביר את ה- WAL לקובץ הראשי ומוחק אותו
+    assert not os.path.exists(db_file + "-wal")
+    conn = sqlite3.connect(db_file)
+    try:
+        conn.execute("BEGIN EXCLUSIVE")  # אף אחד לא מחזיק את הקובץ
+        assert conn.execute("SELECT balance FROM players WHERE name = 'ann'").fetchone() == (7.5,)
+    finally:
+        conn.close()
@@ -0,0 +1,145 @@
+# בדיקות לדילר מול שרת דמה מקומי במקום Ollama: Streaming, שימוש חוזר בחיבור, מטמון וטיפול בתשובה שנקטעה.
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from database import DatabaseManager
+from dealer import DealerCache, KeepAliveClient
+from MainController import MainController
+
+TOKENS = ["The ", "house ", "always ", "wins."]
+
+
+class _StubOllama(BaseHTTPRequestHandler):
+    """
+    מחזיר את TOKENS כ- NDJSON (או כ- JSON אחד כש- stream כבוי). שאלה עם 'broken' נקטעת בשורה שאינה JSON,
+    שאלה עם 'failing' נקטעת בשורת error (או מקבלת רק אותה כש- stream כבוי), ושאלה עם 'missing' מקבלת 404 כמו מודל שלא הותקן.
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        if not payload["stream"]:
+            lines = [{"response": "".join(TOKENS), "done": True}]
+        else:
+            lines = [{"response": token, "done": False} for token in TOKENS] + [{"response": "", "done": True}]
+        body = b"".join(json.dumps(line).encode("utf-8") + b"\n" for line in lines)
+        status = 200
+        if "broken" in payload["prompt"]:
+            body = json.dumps(lines[0]).encode("utf-8") + b"\n{not json\n"
+        elif "failing" in payload["prompt"]:
+            lines = [lines[0], {"error": "out of memory"}] if payload["stream"] else [{"error": "out of memory"}]
+            body = b"".join(json.dumps(line).encode("utf-8") + b"\n" for line in lines)
+        elif "missing" in payload["prompt"]:
+            status, body = 404, json.dumps({"error": "model 'llama3' not found"}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def dealer_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubOllama)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/api/generate"
+    server.shutdown()
+    server.server_close()
+
+
+def _controller(url):
+    controller = MainController(None, DealerCache())
+    controller.DEALER_URL = url
+    return controller
+
+
+def test_stream_is_cached_and_reuses_the_connection(dealer_url):
+    controller = _controller(dealer_url)
+    try:
+        assert list(controller.stream_ai_dealer("Will I win?")) == TOKENS
+        conn = controller._dealer_http._conn
+        assert conn is not None
+        assert list(controller.stream_ai_dealer("will i win")) == ["".join(TOKENS)]
+        assert controller.dealer_cache.hits == 1
+        assert controller.ask_ai_dealer("Another question") == "".join(TOKENS)
+        assert controller._dealer_http._conn is conn
+    finally:
+        controller.close()
+
+
+def test_abandoned_stream_does_not_block_the_client(dealer_url):
+    client = KeepAliveClient(dealer_url)
+    stream = client.stream_lines({"prompt": "slow reader", "stream": True})
+    assert json.loads(next(stream))["response"] == TOKENS[0]
+
+    # בקשה נוספת בזמן שהגנרטור עדיין פתוח (גם מאותו Thread) עוברת על חיבור חדש במקום לחכות למנעול
+    result = {}
+    worker = threading.Thread(target=lambda: result.update(client.post_json({"prompt": "meanwhile", "stream": False})))
+    worker.start()
+    worker.join(timeout=5)
+    assert not worker.is_alive()
+    assert result["response"] == "".join(TOKENS)
+
+    stream.close()
+    assert client._conn is not None  # החיבור של post_json נשאר; זה שנקרא באמצע נסגר
+    client.close()
+
+
+def test_fallback_only_without_tokens(dealer_url):
+    controller = _controller(dealer_url)
+    try:
+        # תשובה שנקטעה אחרי מילה אחת: בלי הודעת Offline אחרי הטקסט, ובלי לשמור במטמון
+        assert list(controller.stream_ai_dealer("broken answer")) == [TOKENS[0]]
+        assert controller.dealer_cache.stats()["size"] == 0
+    finally:
+        controller.close()
+
+    offline = _controller("http://127.0.0.1:9/api/generate")
+    try:
+        assert list(offline.stream_ai_dealer("anyone there?")) == [MainController.DEALER_OFFLINE_MESSAGE]
+    finally:
+        offline.close()
+
+
+def test_stream_errors_fall_back_to_offline(dealer_url):
+    controller = _controller(dealer_url)
+    try:
+        assert list(controller.stream_ai_dealer("missing model")) == [MainController.DEALER_OFFLINE_MESSAGE]
+        # שורת error אחרי מילה אחת: הטקסט שכבר נשלח נשאר, בלי הודעת Offline ובלי מטמון
+        assert list(controller.stream_ai_dealer("failing answer")) == [TOKENS[0]]
+        assert controller.dealer_cache.stats()["size"] == 0
+        assert list(controller.stream_ai_dealer("Will I win?")) == TOKENS
+    finally:
+        controller.close()
+
+
+def test_error_replies_are_not_cached(dealer_url):
+    controller = _controller(dealer_url)
+    try:
+        assert controller.ask_ai_dealer("missing model") == MainController.DEALER_OFFLINE_MESSAGE
+        assert controller.ask_ai_dealer("failing answer") == MainController.DEALER_OFFLINE_MESSAGE
+        assert controller.dealer_cache.stats()["size"] == 0
+        # החיבור נשאר שמיש אחרי תשובת שגיאה
+        assert controller.ask_ai_dealer("Will I win?") == "".join(TOKENS)
+    finally:
+        controller.close()
+
+
+def test_cache_table_comes_from_the_migrations(db_file):
+    cache = DealerCache(db_file=db_file)
+    cache.put("llama3", "Will I win?", "No.")
+    cache.close()
+    with DatabaseManager(db_file) as db:
+        assert db.schema_version == len(DatabaseManager.MIGRATIONS)
+    reloaded = DealerCache(db_file=db_file)
+    try:
+        assert reloaded.get("llama3", "will i win") == "No."
+    finally:
+        reloaded.close()
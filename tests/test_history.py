@@ -0,0 +1,58 @@
+# בדיקות ל- API של ההיסטוריה: דפדוף לפי מפתח (iter_player_history), מנות (iter_history_chunks) ו- HistoryFrame.
+import pytest
+
+from history_frame import HistoryFrame
+
+
+@pytest.fixture
+def player_id(db):
+    pid = db.create_player("history", 10_000.0)
+    neighbour = db.create_player("neighbour", 10_000.0)
+    for i in range(120):
+        db.settle_slip(pid, 10_000.0 - i, i % 37, [("Color Red", 2.0, "LOSS"), ("Number 17", 1.0, "LOSS")])
+        db.settle_spin(pid, 10_000.0 - i, "Parity Even", 3.0, "WIN", i % 37)
+        db.settle_spin(neighbour, 10_000.0, "Color Black", 1.0, "WIN", i % 37)
+    return pid
+
+
+def test_keyset_pages_cover_everything_once(db, player_id):
+    records = list(db.iter_player_history(player_id, page_size=50))
+    assert len(records) == 360
+    ids = [record.record_id for record in records]
+    assert ids == sorted(ids, reverse=True)
+    assert {record.player_id for record in records} == {player_id}
+    assert [row[0] for row in db.get_player_history(player_id, 20)] == ids[:20]
+    # המשך מנקודה מסוימת (before_id) מחזיר בדיוק את השאר
+    assert [record.record_id for record in db.iter_player_history(player_id, page_size=7, before_id=ids[99])] == ids[100:]
+
+
+def test_pages_are_served_from_the_index(db, player_id):
+    with db._get_connection() as conn:
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM history WHERE player_id = ? AND id < ? ORDER BY id DESC LIMIT 50",
+            (player_id, 1000)
+        ).fetchall()
+    details = " ".join(row[-1] for row in plan)
+    assert "idx_history_player_id" in details and "TEMP B-TREE" not in details
+
+
+def test_chunks_ascend_from_the_oldest(db, player_id):
+    chunks = list(db.iter_history_chunks(player_id, chunk_size=100))
+    assert [len(chunk) for chunk in chunks] == [100, 100, 100, 60]
+    rows = [row for chunk in chunks for row in chunk]
+    assert [row[0] for row in rows] == sorted(row[0] for row in rows)
+    assert {row[1] for row in rows} == {player_id}
+
+
+def test_frame_summary_matches_stats(db, player_id):
+    frame = HistoryFrame.from_db(db, player_id, chunk_size=64)
+    stats = db.get_player_stats(player_id)
+    summary = frame.summary()
+    assert summary["total_bets"] == len(frame) == stats.total_bets
+    assert summary["total_wagered"] == pytest.approx(stats.total_wagered)
+    assert summary["net_pl"] == pytest.approx(stats.net_pl)
+    assert summary["win_count"] == stats.win_count
+    breakdown = frame.by_description()
+    assert {desc: count for desc, (count, _, _) in breakdown.items()} == {
+        "Color Red": 120, "Number 17": 120, "Parity Even": 120
+    }
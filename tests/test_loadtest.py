@@ -0,0 +1,32 @@
+# בדיקת עשן למחולל העומס (loadtest.py): כמה בוטים וכמה סיבובים, ובדיקת העקביות שלו עוברת.
+import pytest
+
+from loadtest import DEFAULT_MIX, parse_mix, run
+
+
+def _opts(db_file, **overrides):
+    opts = {
+        "db": db_file, "bots": 2, "mode": "thread", "rate": 100.0, "duration": 0.3, "warmup": 0.0,
+        "mix": parse_mix(DEFAULT_MIX), "amount": 1.0, "balance": 1000.0, "prefix": "bot",
+        "write_behind": False, "shards": 1, "seed": 7,
+    }
+    opts.update(overrides)
+    return opts
+
+
+@pytest.mark.parametrize("overrides", [{}, {"write_behind": True}, {"shards": 2}], ids=["direct", "write-behind", "sharded"])
+def test_small_run_is_consistent(db_file, overrides):
+    report = run(_opts(db_file, **overrides))
+    assert report["spins"] > 0 and report["bets"] == report["spins"]
+    assert report["latency"]["p50_ms"] <= report["latency"]["max_ms"]
+    assert report["consistency"]["ok"], report["consistency"]["problems"]
+    assert report["consistency"]["players"] == 2
+    assert report["broke_bots"] == report["deferred_flushes"] == 0
+
+
+def test_parse_mix():
+    assert parse_mix("number=1, color=2") == {"number": 1.0, "color": 2.0}
+    with pytest.raises(ValueError, match="Unknown bet type"):
+        parse_mix("roulette=1")
+    with pytest.raises(ValueError, match="positive"):
+        parse_mix("number=0")
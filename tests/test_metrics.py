@@ -0,0 +1,77 @@
+# בדיקות למדידה המובנית (metrics.py): היסטוגרמה לוגריתמית, פירוק קריאות מקוננות ורשימת האיטיים ביותר.
+import json
+
+import pytest
+
+from database import DatabaseManager
+from MainController import MainController
+from metrics import METRICS, Histogram, timed
+from models import ColorBet
+
+
+@pytest.fixture
+def metrics():
+    METRICS.reset()
+    METRICS.enable(slowest=3)
+    yield METRICS
+    METRICS.disable()
+    METRICS.reset()
+
+
+def test_histogram_buckets_and_percentiles():
+    for value in (0, 1, 7, 8, 100, 1000, 123456789):
+        bucket = Histogram.bucket_of(value)
+        # הגבול התחתון של התא לא גדול מהערך ורחוק ממנו בפחות מ- 25%
+        assert 0 <= value - Histogram.lower_bound(bucket) <= value // 4
+    histogram = Histogram()
+    for value in range(1, 1001):
+        histogram.record(value * 1000)
+    assert (histogram.count, histogram.min, histogram.max) == (1000, 1000, 1_000_000)
+    assert 0.75 * 500_000 <= histogram.percentile(0.5) <= 500_000
+    assert histogram.percentile(1.0) <= histogram.max
+    assert Histogram().percentile(0.5) == 0
+
+
+def test_disabled_records_nothing():
+    METRICS.reset()
+    calls = []
+    timed("test.noop")(calls.append)(1)
+    assert calls == [1]
+    assert "test.noop" not in METRICS.snapshot()["operations"]
+
+
+def test_nested_calls_and_errors(metrics):
+    @timed("test.inner")
+    def inner(fail=False):
+        if fail:
+            raise RuntimeError("boom")
+
+    @timed("resolve_spin")
+    def outer():
+        inner()
+        inner()
+
+    outer()
+    with pytest.raises(RuntimeError):
+        inner(fail=True)
+    operations = metrics.snapshot()["operations"]
+    assert operations["resolve_spin"]["count"] == 1
+    assert (operations["test.inner"]["count"], operations["test.inner"]["errors"]) == (3, 1)
+    [slowest] = metrics.snapshot()["slowest"]
+    assert set(slowest["breakdown_ms"]) == {"test.inner", "self"}
+
+
+def test_real_spin_breakdown_and_dump(metrics, db_file, tmp_path):
+    with DatabaseManager(db_file) as db:
+        controller = MainController(db)
+        controller.login_or_register("measured", 100.0)
+        for _ in range(5):
+            controller.resolve_spin(ColorBet(1.0, "red"))
+    snapshot = metrics.snapshot()
+    assert snapshot["operations"]["resolve_spin"]["count"] == 5
+    assert len(snapshot["slowest"]) == 3
+    assert any(key.startswith("db.") for key in snapshot["slowest"][0]["breakdown_ms"])
+    path = str(tmp_path / "metrics.json")
+    metrics.dump(path)
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["operations"]["resolve_spin"]["count"] == 5
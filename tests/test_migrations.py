@@ -0,0 +1,78 @@
+# בדיקות לגרסאות הסכמה (PRAGMA user_version) ולהגירות.
+import sqlite3
+
+import pytest
+
+from database import DatabaseManager
+
+
+def _user_version(db_file):
+    conn = sqlite3.connect(db_file)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _tables(db_file):
+    conn = sqlite3.connect(db_file)
+    try:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    finally:
+        conn.close()
+
+
+def test_new_file_gets_latest_version(db_file):
+    with DatabaseManager(db_file) as db:
+        assert db.schema_version == len(DatabaseManager.MIGRATIONS)
+    assert {"players", "history", "player_stats", "history_daily"} <= _tables(db_file)
+
+
+def test_failed_migration_is_rolled_back(db_file):
+    DatabaseManager(db_file).close()
+
+    class Broken(DatabaseManager):
+        MIGRATIONS = DatabaseManager.MIGRATIONS + ((
+            "CREATE TABLE half_done (x INTEGER)",
+            "INSERT INTO no_such_table VALUES (1)",
+        ),)
+
+    with pytest.raises(sqlite3.OperationalError):
+        Broken(db_file)
+    # גם הטבלה מהפקודה הראשונה וגם מספר הגרסה לא נשמרו
+    assert "half_done" not in _tables(db_file)
+    assert _user_version(db_file) == len(DatabaseManager.MIGRATIONS)
+
+
+def test_pre_versioning_file_is_upgraded(db_file):
+    conn = sqlite3.connect(db_file)
+    conn.execute("CREATE TABLE players (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE NOT NULL, balance REAL NOT NULL)")
+    conn.execute("INSERT INTO players (name, balance) VALUES ('old', 42.0)")
+    conn.commit()
+    conn.close()
+    with DatabaseManager(db_file) as db:
+        assert db.schema_version == len(DatabaseManager.MIGRATIONS)
+        assert db.load_player("old")["balance"] == 42.0
+
+
+def test_newer_file_is_refused(db_file):
+    DatabaseManager(db_file).close()
+    conn = sqlite3.connect(db_file)
+    conn.execute(f"PRAGMA user_version = {len(DatabaseManager.MIGRATIONS) + 1}")
+    conn.close()
+    with pytest.raises(sqlite3.DatabaseError, match="newer"):
+        DatabaseManager(db_file)
+
+
+def test_file_with_old_dealer_cache_is_upgraded(db_file):
+    # לפני הגירה 6 המטמון של הדילר יצר את הטבלה שלו בעצמו, גם בקובץ בלי גרסה
+    conn = sqlite3.connect(db_file)
+    conn.execute("CREATE TABLE dealer_cache (model TEXT NOT NULL, prompt TEXT NOT NULL, response TEXT NOT NULL, "
+                 "created_at REAL NOT NULL, PRIMARY KEY (model, prompt))")
+    conn.execute("INSERT INTO dealer_cache VALUES ('llama3', 'hi', 'hello', 1e12)")
+    conn.commit()
+    conn.close()
+    with DatabaseManager(db_file) as db:
+        assert db.schema_version == len(DatabaseManager.MIGRATIONS)
+        with db._get_connection() as conn:
+            assert conn.execute("SELECT response FROM dealer_cache").fetchall() == [("hello",)]
@@ -0,0 +1,47 @@
+# בדיקות למודלים (models.py): מופעים בלי __dict__ בזכות __slots__, והימורים מותאמים אישית שעדיין עובדים.
+import pytest
+
+from models import BaseBet, ColorBet, GameHistoryRecord, NumberBet, ParityBet, Player, TableBet
+
+INSTANCES = [
+    Player(1, "ann", 10.0),
+    NumberBet(1.0, 17),
+    ColorBet(1.0, "red"),
+    ParityBet(1.0, "odd"),
+    TableBet(1.0, "dozen:2"),
+    GameHistoryRecord(1, 1, "Number 17", 1.0, "WIN", 17, "2024-01-01 00:00:00"),
+]
+
+
+@pytest.mark.parametrize("instance", INSTANCES, ids=lambda instance: type(instance).__name__)
+def test_undeclared_attribute_is_rejected(instance):
+    assert not hasattr(instance, "__dict__")
+    with pytest.raises(AttributeError):
+        instance.nickname = "typo"
+
+
+def test_player_balance_stays_private():
+    player = Player(1, "ann", 10.0)
+    player.update_balance(5.0)
+    assert player.get_balance() == 15.0
+    with pytest.raises(AttributeError):
+        player.__balance = 1_000_000
+
+
+def test_custom_bet_without_slots_still_works():
+    class LuckySeven(BaseBet):
+        def __init__(self, amount):
+            super().__init__(amount)
+            self.note = "gets a __dict__ back"
+
+        def is_winning_bet(self, winning_number):
+            return winning_number == 7
+
+        def get_payout_multiplier(self):
+            return 35
+
+        def get_description(self):
+            return "Lucky Seven"
+
+    bet = LuckySeven(2.0)
+    assert bet.note and bet.amount == 2.0 and bet.is_winning_bet(7)
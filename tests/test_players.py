@@ -0,0 +1,60 @@
+# בדיקות לכניסה/הרשמה (login_player), למטמון השחקנים ולמחיקת שחקן.
+from MainController import MainController
+from models import ColorBet
+from player_cache import PlayerCache
+from rng import SeededRNG
+
+
+def _sequence(db):
+    with db._get_connection() as conn:
+        return conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'players'").fetchone()[0]
+
+
+def test_login_existing_player_does_not_write(db):
+    first = db.login_player("alice", 100.0)
+    changes = db._conn.total_changes
+    for _ in range(5):
+        assert db.login_player("alice", 999.0) == first
+    # אין כתיבה למסד ולא נשרפים מזהים של AUTOINCREMENT
+    assert db._conn.total_changes == changes
+    assert db.login_player("bob", 50.0)["id"] == first["id"] + 1
+    assert _sequence(db) == first["id"] + 1
+
+
+def test_cache_hits_skip_the_database(db):
+    cache = PlayerCache(db)
+    player = cache.login("carol", 100.0)
+    assert cache.login("carol", 100.0) is player
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_deleted_player_leaves_the_cache(db):
+    cache = PlayerCache(db, max_size=1)
+    controller = MainController(db, player_cache=cache, rng=SeededRNG(12))
+    old = controller.login_or_register("dave", 100.0)
+    controller.resolve_spin(ColorBet(10.0, "red"))
+    controller.delete_player(old.player_id)
+    assert controller.current_player is None
+    assert cache.get(old.player_id) is None
+    assert db.load_player("dave") is None
+
+    # הרשמה מחדש באותו שם יוצרת שחקן חדש עם יתרת פתיחה, ופינוי מהמטמון לא מחזיר את הישן
+    new = controller.login_or_register("dave", 100.0)
+    assert new.player_id != old.player_id and new.get_balance() == 100.0
+    cache.login("erin", 100.0)
+    assert cache.get(new.player_id) is None
+    assert db.load_player_by_id(old.player_id) is None
+
+
+def test_cache_adds_no_writes(db):
+    cache = PlayerCache(db, max_size=1)
+    controller = MainController(db, player_cache=cache, rng=SeededRNG(13))
+    player = controller.login_or_register("frank", 100.0)
+    db.login_player("gina", 100.0)
+    changes = db._conn.total_changes
+    controller.resolve_spin(ColorBet(1.0, "red"))
+    # הסיבוב כותב יתרה ושורת היסטוריה (ועדכון סטטיסטיקה) - ושום UPDATE נוסף מהמטמון
+    spin_changes = db._conn.total_changes - changes
+    assert db.load_player("frank")["balance"] == player.get_balance()
+    cache.login("gina", 100.0)  # מפנה את frank
+    assert db._conn.total_changes - changes == spin_changes
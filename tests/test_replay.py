@@ -0,0 +1,92 @@
+# בדיקות ליומן השחזור (replay.py): כתיבה תוך כדי משחק ואימות מול ההיסטוריה, גם עם מזהים של מסד מחולק.
+import json
+import os
+
+import pytest
+
+from MainController import MainController
+from models import ColorBet, NumberBet
+from replay import ReplayLog, read_log, verify
+from rng import SeededRNG
+from sharding import ID_SPAN, ShardedDatabase, shard_for_name
+
+
+def _record(db, log_path, names, rounds=50, seed=19):
+    rng = SeededRNG(seed)
+    log = ReplayLog(log_path, rng)
+    try:
+        controller = MainController(db, rng=rng, replay_log=log)
+        for name in names:
+            controller.login_or_register(name, 1000.0)
+            for _ in range(rounds):
+                controller.resolve_spin(ColorBet(1.0, "red"))
+                controller.resolve_slip([NumberBet(1.0, 7), ColorBet(2.0, "black")])
+    finally:
+        log.close()
+
+
+def test_verify_single_file(db, tmp_path):
+    log_path = str(tmp_path / "replay.bin")
+    _record(db, log_path, ["alice"])
+    report = verify(db, log_path)
+    assert (report["spins"], report["bets"], report["mismatches"]) == (100, 150, 0)
+    assert all(result["matches"] for result in report["final_balances"].values())
+
+
+def test_verify_sharded_ids(db_file, tmp_path):
+    # שחקן ב- Shard שאינו הראשון מקבל מזהה מעל 2**40, שלא נכנס ב- 32 ביט
+    name = next(f"p{i}" for i in range(100) if shard_for_name(f"p{i}", 2) == 1)
+    log_path = str(tmp_path / "replay.bin")
+    with ShardedDatabase(db_file, 2) as db:
+        _record(db, log_path, [name, "other"])
+        assert db.load_player(name)["id"] > ID_SPAN
+        report = verify(db, log_path)
+    assert report["mismatches"] == 0
+    assert report["spins"] == 200
+
+
+def test_tampered_history_is_reported(db, tmp_path):
+    log_path = str(tmp_path / "replay.bin")
+    _record(db, log_path, ["bob"], rounds=5)
+    with db._get_connection() as conn:
+        conn.execute("UPDATE history SET outcome_number = (outcome_number + 1) % 37 WHERE id = 3")
+    assert verify(db, log_path)["mismatches"] > 0
+
+
+def test_other_log_versions_are_refused(tmp_path):
+    log_path = tmp_path / "replay.bin"
+    log_path.write_bytes((json.dumps({"version": 1, "rng": {}}) + "\n").encode("utf-8"))
+    with pytest.raises(ValueError, match="version 1"):
+        read_log(str(log_path))
+
+
+def test_each_run_is_appended(db, tmp_path):
+    log_path = str(tmp_path / "replay.bin")
+    _record(db, log_path, ["carol"], rounds=10)
+    size = os.path.getsize(log_path)
+    # הפעלה שנייה עם seed אחר ממשיכה את אותו קובץ, ושחקן חדש וגם שחקן קיים מאומתים בשתיהן
+    _record(db, log_path, ["carol", "dan"], rounds=10, seed=20)
+    assert os.path.getsize(log_path) > 2 * size
+    report = verify(db, log_path)
+    assert (report["runs"], report["spins"], report["mismatches"]) == (2, 60, 0), report["problems"]
+    header, records = read_log(log_path)
+    assert header["rng"]["seed"] == 19
+    assert [record[1]["rng"]["seed"] for record in records if record[0] == "H"] == [20]
+
+
+def test_partial_record_is_cut_before_appending(db, tmp_path):
+    log_path = str(tmp_path / "replay.bin")
+    _record(db, log_path, ["erin"], rounds=5)
+    with open(log_path, "ab") as f:
+        f.write(b"P\x01\x02")  # ההפעלה הקודמת נקטעה באמצע רשומה
+    _record(db, log_path, ["erin"], rounds=5, seed=21)
+    assert verify(db, log_path)["mismatches"] == 0
+
+
+def test_log_of_another_version_is_not_appended_to(db, tmp_path):
+    log_path = tmp_path / "replay.bin"
+    original = (json.dumps({"version": 1, "rng": {}}) + "\n").encode("utf-8") + b"P" * 17
+    log_path.write_bytes(original)
+    with pytest.raises(ValueError, match="version 1"):
+        ReplayLog(str(log_path), SeededRNG(1))
+    assert log_path.read_bytes() == original
@@ -0,0 +1,55 @@
+# בדיקות להעברת היסטוריה ישנה לארכיון (compact_history) ולסיכומים היומיים שנשארים במקומה.
+import sqlite3
+
+import pytest
+
+from MainController import MainController
+from models import ColorBet, NumberBet, ParityBet
+from retention import run_retention
+from rng import SeededRNG
+
+
+def _play(db, name, rounds):
+    controller = MainController(db, rng=SeededRNG(17))
+    player = controller.login_or_register(name, 100_000.0)
+    for _ in range(rounds):
+        controller.resolve_slip([ColorBet(1.0, "red"), ParityBet(1.0, "even"), NumberBet(1.0, 17)])
+        controller.resolve_spin(ColorBet(2.0, "black"))
+    return player.player_id
+
+
+def test_rollups_keep_stats_exact(db, tmp_path):
+    pid = _play(db, "old", 500)
+    expected = db.get_player_stats(pid).as_dict()
+
+    # מנות קטנות שלא מתחלקות ב- 3, כדי שסיבובים של טופס יגיעו לגבול של מנה
+    report = run_retention(db, str(tmp_path / "archive.db"), max_age_days=-1, chunk_size=7)
+    assert report["moved"] == 2000
+    assert db.get_player_history(pid) == []
+
+    db.backfill_stats()
+    rebuilt = db.get_player_stats(pid).as_dict()
+    # הסיכומים היומיים לא שומרים את התוצאות האחרונות
+    assert rebuilt.pop("recent_outcomes") == []
+    expected.pop("recent_outcomes")
+    assert rebuilt == pytest.approx(expected)
+
+
+def test_archive_without_spin_id_is_upgraded(db, tmp_path):
+    archive_file = str(tmp_path / "archive.db")
+    archive = sqlite3.connect(archive_file)
+    archive.execute(
+        "CREATE TABLE history (id INTEGER PRIMARY KEY, player_id INTEGER, bet_desc TEXT, amount REAL, status TEXT, "
+        "outcome_number INTEGER, timestamp TEXT)"
+    )
+    archive.close()
+
+    _play(db, "old", 10)
+    assert run_retention(db, archive_file, max_age_days=-1)["moved"] == 40
+
+    archive = sqlite3.connect(archive_file)
+    try:
+        spins = archive.execute("SELECT COUNT(DISTINCT spin_id), COUNT(*) FROM history").fetchone()
+    finally:
+        archive.close()
+    assert spins == (20, 40)
@@ -0,0 +1,29 @@
+# בדיקות לחישוב המדויק של התפלגות היתרה (risk.py), גם מול סימולציית מונטה קרלו.
+import pytest
+
+from models import ColorBet
+from risk import bankroll_distribution, risk_of_ruin
+from simulation import simulate
+
+
+def test_single_spin_is_exact():
+    distribution = bankroll_distribution([ColorBet(10.0, "red")], 10.0, 1)
+    assert distribution.exact and distribution.pruned_mass == 0.0
+    assert list(distribution.values) == [0.0, 20.0]
+    assert distribution.probs == pytest.approx([19 / 37, 18 / 37])
+    assert distribution.risk_of_ruin == pytest.approx(19 / 37)
+    assert distribution.mean() == pytest.approx(20.0 * 18 / 37)
+    assert distribution.percentile(50) == 0.0 and distribution.percentile(99) == 20.0
+
+
+def test_ruin_grows_with_spins_and_matches_simulation():
+    bets = [ColorBet(10.0, "black")]
+    risks = [risk_of_ruin(bets, 50.0, n) for n in (5, 20, 80)]
+    assert risks == sorted(risks) and 0.0 < risks[0] < risks[-1] < 1.0
+    result = simulate(bets, "flat", starting_balance=50.0, n_spins=20, n_trials=20000, seed=3, workers=1)
+    assert result.risk_of_ruin() == pytest.approx(risks[1], abs=0.02)
+
+
+def test_empty_slip():
+    with pytest.raises(ValueError, match="empty"):
+        bankroll_distribution([], 100.0, 10)
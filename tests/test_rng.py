@@ -0,0 +1,37 @@
+# בדיקות למנועי ההגרלה (rng.py): טווח, פיזור, דטרמיניזם ובנייה מחדש מ- describe().
+import pytest
+
+from bet_engine import WHEEL_SIZE
+from rng import BufferedRNG, SecureRNG, SeededRNG, make_rng
+
+
+@pytest.mark.parametrize("rng", [SecureRNG(block_size=64), BufferedRNG(5, block_size=100), SeededRNG(5)],
+                         ids=["secure", "buffered", "seeded"])
+def test_every_number_comes_up(rng):
+    counts = [0] * WHEEL_SIZE
+    for _ in range(37 * 200):
+        counts[rng.spin()] += 1
+    # בממוצע 200 לכל מספר; גבולות רחבים מספיק כדי שהבדיקה לא תיכשל במקרה
+    assert min(counts) > 100 and max(counts) < 320
+
+
+def test_secure_rejects_biased_bytes(monkeypatch):
+    # 222 ומעלה נזרקים: בלי זה המספרים 0-33 היו יוצאים יותר מ- 34-36
+    monkeypatch.setattr("rng.os.urandom", lambda size: bytes([255, 222, 221, 36, 37]))
+    rng = SecureRNG(block_size=5)
+    assert [rng.spin(), rng.spin(), rng.spin()] == [221 % 37, 36, 0]
+
+
+@pytest.mark.parametrize("rng", [BufferedRNG(42, block_size=16), SeededRNG(42)], ids=["buffered", "seeded"])
+def test_describe_rebuilds_the_same_sequence(rng):
+    first = [rng.spin() for _ in range(50)]
+    again = make_rng(**rng.describe())
+    assert [again.spin() for _ in range(50)] == first
+
+
+def test_make_rng_errors():
+    assert make_rng().describe() == {"backend": "secure", "seed": None}
+    with pytest.raises(ValueError, match="needs a seed"):
+        make_rng("seeded")
+    with pytest.raises(ValueError, match="Unknown"):
+        make_rng("dice")
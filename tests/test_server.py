@@ -0,0 +1,200 @@
+# בדיקות לשרת הרב-שולחני (server.py) מעל TCP מקומי: שולחן משותף, סגירה באצווה ומניעת הוצאה כפולה.
+import asyncio
+import json
+import sqlite3
+
+import pytest
+
+from server import GameServer
+
+
+class _Client:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, port):
+        return cls(*await asyncio.open_connection("127.0.0.1", port))
+
+    async def call(self, **request):
+        """שולחת פקודה ומחזירה את התשובה, ולפניה את כל האירועים (event) שהגיעו בינתיים."""
+        self.writer.write((json.dumps(request) + "\n").encode("utf-8"))
+        await self.writer.drain()
+        events = []
+        while True:
+            message = await self.recv()
+            if "event" not in message:
+                return message, events
+            events.append(message)
+
+    async def recv(self):
+        return json.loads(await asyncio.wait_for(self.reader.readline(), timeout=5))
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+def _serve(db, scenario, spin_interval=0):
+    async def run():
+        server = await GameServer(db, port=0, spin_interval=spin_interval).start()
+        try:
+            return await scenario(server)
+        finally:
+            await server.close()
+    return asyncio.run(run())
+
+
+def test_table_settles_every_player_in_one_spin(db):
+    async def scenario(server):
+        alice, bob = await _Client.connect(server.port), await _Client.connect(server.port)
+        for client, name in ((alice, "alice"), (bob, "bob")):
+            assert (await client.call(cmd="login", name=name))[0]["ok"]
+            assert (await client.call(cmd="join", table="t1"))[0]["ok"]
+        await alice.call(cmd="bet", bets=[{"key": "color:red", "amount": 10}, {"key": "number:0", "amount": 1}])
+        await bob.call(cmd="bet", bets=[{"key": "dozen:1", "amount": 20}])
+        response, events = await alice.call(cmd="spin")
+        bob_event = await bob.recv()
+        await alice.close()
+        await bob.close()
+        return response, events, bob_event
+
+    response, (alice_event,), bob_event = _serve(db, scenario)
+    assert alice_event["winning_number"] == bob_event["winning_number"] == response["winning_number"]
+    assert (alice_event["wagered"], bob_event["wagered"]) == (11, 20)
+    assert db.load_player("alice")["balance"] == alice_event["balance"]
+    assert db.load_player("bob")["balance"] == bob_event["balance"]
+    # שני השחקנים נסגרו באותו סיבוב: שורת היסטוריה לכל הימור, כולן עם אותו מספר זוכה
+    rows = db.get_player_history(db.load_player("alice")["id"]) + db.get_player_history(db.load_player("bob")["id"])
+    assert len(rows) == 3 and {row[5] for row in rows} == {response["winning_number"]}
+
+
+def test_two_sessions_cannot_spend_the_same_money(db):
+    db.create_player("carol", 100.0)
+
+    async def scenario(server):
+        first, second = await _Client.connect(server.port), await _Client.connect(server.port)
+        for client, table in ((first, "a"), (second, "b")):
+            await client.call(cmd="login", name="carol")
+            await client.call(cmd="join", table=table)
+        placed, _ = await first.call(cmd="bet", bets=[{"key": "color:red", "amount": 80}])
+        refused, _ = await second.call(cmd="bet", bets=[{"key": "color:black", "amount": 30}])
+        balance, _ = await second.call(cmd="balance")
+        await first.close()
+        await second.close()
+        return placed, refused, balance
+
+    placed, refused, balance = _serve(db, scenario)
+    assert placed["ok"] and placed["available"] == 20
+    assert not refused["ok"] and "Insufficient" in refused["error"]
+    assert (balance["balance"], balance["available"]) == (100, 20)
+    # בכיבוי השרת הטופס הפתוח נסגר בסיבוב אחרון, כך שהכסף השמור לא נתקע
+    assert db.load_player("carol")["balance"] in (20.0, 180.0)
+
+
+def test_bad_requests_get_errors(db):
+    async def scenario(server):
+        client = await _Client.connect(server.port)
+        before_login, _ = await client.call(cmd="bet", bets=[])
+        await client.call(cmd="login", name="dave")
+        no_table, _ = await client.call(cmd="bet", bets=[{"key": "color:red", "amount": 1}])
+        await client.call(cmd="join")
+        unknown, _ = await client.call(cmd="bet", bets=[{"key": "color:green", "amount": 1}])
+        await client.close()
+        return before_login, no_table, unknown
+
+    before_login, no_table, unknown = _serve(db, scenario)
+    assert before_login["error"] == "Login first."
+    assert no_table["error"] == "Join a table first."
+    assert "Unknown bet" in unknown["error"]
+
+
+def test_table_batch_is_one_transaction(db):
+    ids = [db.create_player(f"p{i}", 50.0) for i in range(5)]
+    with db._get_connection() as conn:
+        conn.execute(f"CREATE TEMP TRIGGER fail BEFORE INSERT ON history WHEN NEW.player_id = {ids[-1]} "
+                     "BEGIN SELECT RAISE(ABORT, 'disk full'); END")
+    rows = [(pid, 40.0, [("Color Red", 10.0, "LOSS")]) for pid in ids]
+    with pytest.raises(sqlite3.IntegrityError):
+        db.settle_table(0, rows)
+    # שורה אחת נכשלה, ולכן אף שחקן בשולחן לא חויב
+    assert {db.load_player(f"p{i}")["balance"] for i in range(5)} == {50.0}
+    with db._get_connection() as conn:
+        conn.execute("DROP TRIGGER temp.fail")
+    db.settle_table(0, rows)
+    assert {db.load_player(f"p{i}")["balance"] for i in range(5)} == {40.0}
+    # כל שחקן מקבל בסיבוב המשותף spin_id משלו, כך שהסטטיסטיקה סופרת סיבוב אחד לכל אחד
+    with db._get_connection() as conn:
+        assert conn.execute("SELECT COUNT(DISTINCT spin_id) FROM history").fetchone()[0] == 5
+    assert [db.get_player_stats(pid).spins for pid in ids] == [1] * 5
+
+
+def _fail_once(monkeypatch, db):
+    """הכתיבה הראשונה של סיבוב שולחן נכשלת כמו בנעילה של SQLite; השאר עוברות."""
+    settle_table = db.settle_table
+    failures = [sqlite3.OperationalError("database is locked")]
+
+    def flaky(*args):
+        if failures:
+            raise failures.pop()
+        return settle_table(*args)
+    monkeypatch.setattr(db, "settle_table", flaky)
+
+
+def test_failed_spin_is_rolled_back_and_retried(db, monkeypatch):
+    _fail_once(monkeypatch, db)
+
+    async def scenario(server):
+        client = await _Client.connect(server.port)
+        await client.call(cmd="login", name="erin")
+        await client.call(cmd="join", table="t")
+        await client.call(cmd="bet", bets=[{"key": "color:red", "amount": 10}])
+        failed, _ = await client.call(cmd="spin")
+        after_failure, _ = await client.call(cmd="balance")
+        retried, (event,) = await client.call(cmd="spin")
+        await client.close()
+        return failed, after_failure, retried, event
+
+    failed, after_failure, retried, event = _serve(db, scenario)
+    assert not failed["ok"] and "locked" in failed["error"]
+    # הסיבוב לא נשמר: היתרה כמו במסד, וההימור עדיין שמור על השולחן
+    assert (after_failure["balance"], after_failure["available"]) == (5000, 4990)
+    assert retried["ok"] and event["wagered"] == 10
+    assert db.load_player("erin")["balance"] == event["balance"]
+    assert len(db.get_player_history(db.load_player("erin")["id"])) == 1
+
+
+def test_table_loop_survives_a_failed_spin(db, monkeypatch):
+    _fail_once(monkeypatch, db)
+
+    async def scenario(server):
+        client = await _Client.connect(server.port)
+        await client.call(cmd="login", name="frank")
+        await client.call(cmd="join", table="auto")
+        await client.call(cmd="bet", bets=[{"key": "dozen:3", "amount": 5}])
+        event = await client.recv()  # הסיבוב האוטומטי הראשון נכשל, השני נסגר
+        alive = not any(task.done() for task in server._table_tasks)
+        await client.close()
+        return event, alive
+
+    event, alive = _serve(db, scenario, spin_interval=0.05)
+    assert alive
+    assert db.load_player("frank")["balance"] == event["balance"]
+
+
+def test_idle_accounts_leave_memory(db):
+    async def scenario(server):
+        client = await _Client.connect(server.port)
+        await client.call(cmd="login", name="gina")
+        await client.call(cmd="join", table="t")
+        await client.call(cmd="bet", bets=[{"key": "color:black", "amount": 1}])
+        await client.close()
+        while server.accounts[db.load_player("gina")["id"]].sessions:
+            await asyncio.sleep(0.01)
+        # ההימור עדיין על השולחן, ולכן החשבון נשאר עד שהוא נסגר
+        assert len(server.accounts) == 1
+        await server.tables["t"].spin()
+        return dict(server.accounts)
+
+    assert _serve(db, scenario) == {}
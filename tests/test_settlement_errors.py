@@ -0,0 +1,79 @@
+# בדיקות לטיפול בשגיאות כתיבה בזמן סגירת סיבוב: "database is locked" אמיתי מחיבור שני שמחזיק נעילה בלעדית.
+import sqlite3
+
+import pytest
+
+from database import DatabaseManager
+from MainController import MainController
+from models import ColorBet, NumberBet, ParityBet
+from rng import SeededRNG
+
+
+def _lock(db_file):
+    """חיבור שני שמחזיק נעילת כתיבה בלעדית על הקובץ עד שסוגרים אותו."""
+    conn = sqlite3.connect(db_file, isolation_level=None)
+    conn.execute("BEGIN EXCLUSIVE")
+    return conn
+
+
+def _no_wait(manager):
+    # בלי זה sqlite3 מחכה 5 שניות (ה- timeout של connect) לפני שהוא מוותר על הנעילה
+    manager._conn.execute("PRAGMA busy_timeout = 0")
+
+
+def test_locked_spin_rolls_back_balance(db_file):
+    with DatabaseManager(db_file) as db:
+        controller = MainController(db, rng=SeededRNG(1))
+        player = controller.login_or_register("alice", 100.0)
+        _no_wait(db)
+        lock = _lock(db_file)
+        try:
+            with pytest.raises(sqlite3.OperationalError, match="locked"):
+                controller.resolve_spin(NumberBet(10.0, 7))
+        finally:
+            lock.close()
+        assert player.get_balance() == 100.0
+        assert db.load_player("alice")["balance"] == 100.0
+        assert db.get_player_history(player.player_id) == []
+
+        # אחרי שהנעילה משתחררת הסיבוב הבא נשמר כרגיל
+        result = controller.resolve_spin(ColorBet(5.0, "red"))
+        assert db.load_player("alice")["balance"] == result["new_balance"] == player.get_balance()
+
+
+def test_locked_slip_rolls_back_balance(db_file):
+    with DatabaseManager(db_file) as db:
+        controller = MainController(db, rng=SeededRNG(2))
+        player = controller.login_or_register("bob", 50.0)
+        _no_wait(db)
+        lock = _lock(db_file)
+        try:
+            with pytest.raises(sqlite3.OperationalError):
+                controller.resolve_slip([ColorBet(5.0, "red"), ParityBet(5.0, "odd"), NumberBet(1.0, 0)])
+        finally:
+            lock.close()
+        assert player.get_balance() == 50.0
+        assert db.get_player_stats(player.player_id).spins == 0
+
+
+def test_write_behind_retries_locked_flush(db_file):
+    db = DatabaseManager(db_file, write_behind=True, flush_every=1, flush_interval=3600)
+    try:
+        controller = MainController(db, rng=SeededRNG(3))
+        player = controller.login_or_register("carol", 100.0)
+        # הסטטיסטיקה של שחקן נטענת (ונכתבת) בסיבוב הראשון שלו, עוד לפני שהסיבוב נכנס לתור - טוענים אותה מראש
+        db.get_player_stats(player.player_id)
+        _no_wait(db)
+        lock = _lock(db_file)
+        try:
+            # הסיבוב נכנס לתור ונחשב שמור; הכתיבה שנכשלה רק נספרת ולא זורקת
+            result = controller.resolve_spin(ColorBet(10.0, "black"))
+            assert db.flush_errors == 1
+            assert player.get_balance() == result["new_balance"] != 100.0
+        finally:
+            lock.close()
+        db.flush()
+        assert db.load_player("carol")["balance"] == player.get_balance()
+        assert len(db.get_player_history(player.player_id)) == 1
+    finally:
+        db.close()
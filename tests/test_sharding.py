@@ -0,0 +1,105 @@
+# בדיקות לחלוקת השחקנים בין כמה קבצים (sharding.py): ניתוב לפי שם ומזהה, דוחות על כל ה- Shards וחלוקה מחדש.
+import os
+import sqlite3
+
+import pytest
+
+from database import DatabaseManager
+from MainController import MainController
+from models import ColorBet, NumberBet
+from rng import SeededRNG
+from sharding import ID_SPAN, ShardedDatabase, reshard, shard_for_id, shard_for_name, shard_path
+
+NAMES = [f"player{i}" for i in range(12)]
+
+
+def _play(db, names=NAMES, rounds=5):
+    controller = MainController(db, rng=SeededRNG(20))
+    for name in names:
+        controller.login_or_register(name, 1000.0)
+        for _ in range(rounds):
+            controller.resolve_slip([ColorBet(5.0, "red"), NumberBet(1.0, 7)])
+
+
+def test_players_live_in_their_shard(db_file):
+    with ShardedDatabase(db_file, 3) as db:
+        _play(db)
+        for name in NAMES:
+            player = db.load_player(name)
+            index = shard_for_name(name, 3)
+            assert shard_for_id(player["id"]) == index
+            assert index * ID_SPAN < player["id"] <= (index + 1) * ID_SPAN
+            assert db.shards[index].load_player(name) == player
+            # כל ההיסטוריה של השחקן באותו קובץ, עם מזהים מהטווח שלו
+            assert all(shard_for_id(row[0]) == index for row in db.get_player_history(player["id"], 100))
+        totals = db.get_casino_totals()
+        assert (totals["players"], totals["spins"], totals["total_bets"]) == (12, 60, 120)
+        assert len(db.get_leaderboard(5)) == 5
+    assert all(os.path.exists(shard_path(db_file, index, 3)) for index in range(3))
+
+
+def test_table_spin_across_shards(db_file):
+    with ShardedDatabase(db_file, 2) as db:
+        ids = [db.login_player(name, 100.0)["id"] for name in NAMES[:6]]
+        assert {shard_for_id(pid) for pid in ids} == {0, 1}
+        db.settle_table(17, [(pid, 90.0, [("Color Black", 10.0, "LOSS")]) for pid in ids])
+        for pid in ids:
+            assert db.load_player_by_id(pid)["balance"] == 90.0
+            assert db.get_player_stats(pid).spins == 1
+
+
+def test_layout_guards(db_file):
+    with DatabaseManager(db_file) as db:
+        db.login_player("unsharded", 10.0)
+    with pytest.raises(sqlite3.DatabaseError, match="unsharded players"):
+        ShardedDatabase(db_file, 2)
+
+    other = db_file.replace("casino", "other")
+    ShardedDatabase(other, 3).close()
+    os.remove(shard_path(other, 1, 3))
+    with pytest.raises(sqlite3.DatabaseError, match="missing"):
+        ShardedDatabase(other, 3)
+
+
+def test_reshard_keeps_balances_history_and_stats(db_file):
+    with ShardedDatabase(db_file, 2) as db:
+        _play(db)
+        before = {name: (db.load_player(name)["balance"], db.get_player_stats(db.load_player(name)["id"]).as_dict())
+                  for name in NAMES}
+
+    report = reshard(db_file, 2, 3)
+    assert (report["players"], report["history"]) == (12, 120)
+    with pytest.raises(FileExistsError):
+        reshard(db_file, 2, 3)
+
+    with ShardedDatabase(db_file, 3) as db:
+        for name in NAMES:
+            player = db.load_player(name)
+            assert shard_for_id(player["id"]) == shard_for_name(name, 3)
+            assert player["balance"] == before[name][0]
+        db.backfill_stats()
+        for name in NAMES:
+            assert db.get_player_stats(db.load_player(name)["id"]).as_dict() == pytest.approx(before[name][1])
+        # שחקן חדש אחרי החלוקה מקבל מזהה פנוי בטווח של ה- Shard שלו
+        _play(db, ["newcomer"], rounds=1)
+        assert db.get_player_stats(db.load_player("newcomer")["id"]).spins == 1
+
+
+def test_reshard_back_to_one_file(db_file):
+    with DatabaseManager(db_file) as db:
+        _play(db, NAMES[:4])
+        before = {name: db.load_player(name)["balance"] for name in NAMES[:4]}
+    reshard(db_file, 1, 2)
+
+    # casino.db הישן עדיין במקום (החלוקה לא מוחקת אותו), והוא בדיוק היעד של חלוקה ל- Shard אחד
+    with pytest.raises(FileExistsError, match="unsharded copy"):
+        reshard(db_file, 2, 1)
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(db_file + suffix):
+            os.replace(db_file + suffix, db_file.replace("casino", "pre-shard") + suffix)
+
+    assert reshard(db_file, 2, 1)["players"] == 4
+    with DatabaseManager(db_file) as db:
+        for name in NAMES[:4]:
+            assert db.load_player(name)["balance"] == before[name]
+            assert db.get_player_stats(db.load_player(name)["id"]).spins == 5
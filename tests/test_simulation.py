@@ -0,0 +1,40 @@
+# בדיקות לסימולטור מונטה קרלו (simulation.py): וקטור התשלומים של טופס, דטרמיניזם לפי seed ותוצאות מול חישוב ידני.
+import numpy as np
+import pytest
+
+from bet_engine import WHEEL_SIZE
+from models import ColorBet, NumberBet
+from simulation import STRATEGIES, simulate, slip_payout_vector
+
+
+def test_payout_vector_of_a_slip():
+    payouts = slip_payout_vector([ColorBet(10.0, "red"), NumberBet(1.0, 0)])
+    assert payouts.shape == (WHEEL_SIZE,)
+    assert payouts[0] == 36.0
+    assert payouts[1] == 20.0 and payouts[2] == 0.0  # 1 אדום, 2 שחור
+    assert payouts.sum() == pytest.approx(36.0 + 18 * 20.0)
+
+
+def test_single_spin_matches_the_wheel():
+    result = simulate([ColorBet(10.0, "red")], "flat", starting_balance=10.0, n_spins=1, n_trials=20000, seed=3, workers=1)
+    assert result.n_trials == 20000
+    assert set(np.unique(result.final_balances)) == {0.0, 20.0}
+    # שגיאת תקן של כ- 0.0035 ב- 20,000 ניסויים
+    assert result.risk_of_ruin() == pytest.approx(19 / 37, abs=0.02)
+    assert result.summary()["theoretical_edge"] == pytest.approx(-1 / 37)
+
+
+@pytest.mark.parametrize("strategy", STRATEGIES)
+def test_same_seed_same_results(strategy):
+    bets = [NumberBet(1.0, 17)]
+    first = simulate(bets, strategy, starting_balance=100.0, n_spins=50, n_trials=200, seed=9, workers=1)
+    again = simulate(bets, strategy, starting_balance=100.0, n_spins=50, n_trials=200, seed=9, workers=1)
+    assert np.array_equal(first.final_balances, again.final_balances)
+    assert np.array_equal(first.bust_spins, again.bust_spins)
+
+
+def test_bad_arguments():
+    with pytest.raises(ValueError, match="Unknown strategy"):
+        simulate([NumberBet(1.0, 17)], "double-or-nothing")
+    with pytest.raises(ValueError, match="empty"):
+        simulate([])
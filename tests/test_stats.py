@@ -0,0 +1,63 @@
+# בדיקות לקיבוץ ההיסטוריה לסיבובים (spin_id) ולחישוב מחדש של הסטטיסטיקות (backfill_stats).
+import sqlite3
+
+import pytest
+
+from database import DatabaseManager
+from MainController import MainController
+from models import ColorBet, NumberBet, ParityBet
+from rng import SeededRNG
+
+
+def _incremental(db, player_id):
+    """הסטטיסטיקה שנצברה בזיכרון תוך כדי המשחק, לפני שמחשבים אותה מחדש."""
+    return db.get_player_stats(player_id).as_dict()
+
+
+def test_fast_spins_backfill_matches_incremental(db):
+    # אלפי סיבובים באותה שנייה עם אותו מספר זוכה נראים זהים לקיבוץ לפי זמן, אבל לכל אחד spin_id משלו
+    controller = MainController(db, rng=SeededRNG(8))
+    player = controller.login_or_register("fast", 1_000_000.0)
+    for _ in range(3000):
+        controller.resolve_spin(ColorBet(1.0, "red"))
+    expected = _incremental(db, player.player_id)
+    assert expected["spins"] == 3000
+
+    db.backfill_stats()
+    assert db.get_player_stats(player.player_id).as_dict() == pytest.approx(expected)
+
+
+def test_slips_are_grouped_by_spin(db):
+    controller = MainController(db, rng=SeededRNG(9))
+    player = controller.login_or_register("slips", 10_000.0)
+    for _ in range(200):
+        controller.resolve_slip([ColorBet(1.0, "red"), ParityBet(1.0, "odd"), NumberBet(1.0, 17)])
+        controller.resolve_spin(NumberBet(1.0, 0))
+    expected = _incremental(db, player.player_id)
+    assert (expected["spins"], expected["total_bets"]) == (400, 800)
+
+    db.backfill_stats(player.player_id)
+    assert db.get_player_stats(player.player_id).as_dict() == pytest.approx(expected)
+
+
+def test_legacy_rows_get_spin_ids(db_file):
+    class Version4(DatabaseManager):
+        MIGRATIONS = DatabaseManager.MIGRATIONS[:4]
+
+    Version4(db_file).close()
+    conn = sqlite3.connect(db_file)
+    with conn:
+        conn.executemany("INSERT INTO players (name, balance) VALUES (?, 0.0)", [("old",), ("other",)])
+        # השורה של other באמצע לא מפרידה בין שתי השורות של old באותו סיבוב
+        conn.executemany(
+            "INSERT INTO history (player_id, bet_desc, amount, status, outcome_number, timestamp) VALUES (?, 'x', 1.0, 'LOSS', ?, ?)",
+            [(1, 5, "2024-01-01 10:00:00"), (2, 5, "2024-01-01 10:00:00"), (1, 5, "2024-01-01 10:00:00"),
+             (1, 7, "2024-01-01 10:00:00"), (1, 7, "2024-01-01 10:00:01")]
+        )
+    conn.close()
+
+    with DatabaseManager(db_file) as db:
+        with db._get_connection() as conn:
+            spin_ids = [row[0] for row in conn.execute("SELECT spin_id FROM history ORDER BY id")]
+        assert spin_ids == [1, 2, 1, 4, 5]
+        assert db.get_player_stats(1).spins == 3
@@ -0,0 +1,101 @@
+# בדיקות לייצוא וייבוא בכמויות גדולות (transfer.py) בשני הפורמטים, ולקריאה עמודתית דרך Memory-Mapping.
+import csv
+import os
+import sqlite3
+
+import pytest
+
+from database import DatabaseManager
+from MainController import MainController
+from models import ColorBet, NumberBet
+from rng import SeededRNG
+from transfer import ColumnarTable, export_columnar, export_csv, history_frame, import_data
+
+
+def _dump(db_file, table):
+    conn = sqlite3.connect(db_file)
+    try:
+        return conn.execute(f"SELECT * FROM {table} ORDER BY 1, 2").fetchall()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def source(db_file):
+    with DatabaseManager(db_file) as db:
+        controller = MainController(db, rng=SeededRNG(40))
+        for name in ("ann", "ben", "שרה"):
+            controller.login_or_register(name, 500.0)
+            for _ in range(25):
+                controller.resolve_slip([ColorBet(2.0, "red"), NumberBet(1.0, 3)])
+    return db_file
+
+
+@pytest.mark.parametrize("fmt", ["csv", "columnar"])
+def test_round_trip(source, tmp_path, fmt):
+    directory = str(tmp_path / fmt)
+    export = export_csv if fmt == "csv" else export_columnar
+    assert export(source, directory, chunk_size=16) == {"players": 3, "history": 150, "history_daily": 0}
+
+    target = str(tmp_path / "restored.db")
+    assert import_data(target, directory, fmt, chunk_size=16) == {"players": 3, "history": 150, "history_daily": 0}
+    for table in ("players", "history"):
+        assert _dump(target, table) == _dump(source, table)
+    # הסטטיסטיקות נבנות מחדש מההיסטוריה המיובאת, כולל ספירת הסיבובים לפי spin_id
+    assert _dump(target, "player_stats") == _dump(source, "player_stats")
+
+    with pytest.raises(sqlite3.IntegrityError):
+        import_data(target, directory, fmt)
+
+
+def test_columnar_is_memory_mapped(source, tmp_path):
+    directory = str(tmp_path / "columnar")
+    export_columnar(source, directory)
+    history = ColumnarTable(directory, "history")
+    assert len(history) == 150
+    assert history["amount"].sum() == pytest.approx(225.0)
+    assert set(history.codes["bet_desc"]) == {"Color Red", "Number 3"}
+    names = ColumnarTable(directory, "players").decode("name", 0, 3)
+    assert sorted(names) == sorted(["ann", "ben", "שרה"])
+    assert history_frame(directory).summary()["total_bets"] == 150
+
+
+def test_import_of_export_without_spin_id(source, tmp_path):
+    # ייצוא מלפני עמודת spin_id: הייבוא לוקח את העמודות מהכותרת, והסיבובים מקובצים לפי הקיבוץ הישן
+    directory = str(tmp_path / "old")
+    export_csv(source, directory, tables=("players", "history"))
+    path = os.path.join(directory, "history.csv")
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = [row[:-1] for row in csv.reader(f)]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(rows)
+
+    target = str(tmp_path / "restored.db")
+    import_data(target, directory, "csv")
+    with DatabaseManager(target) as db:
+        spins = db.get_player_stats(db.load_player("ann")["id"]).spins
+    assert 0 < spins <= 25
+
+
+def test_columnar_round_trip_keeps_nulls(source, tmp_path):
+    # שורות מלפני spin_id, ושורה עם סכום ותוצאה חסרים: NULL חוזר כ- NULL ולא כ- 0 או NaN
+    conn = sqlite3.connect(source)
+    with conn:
+        conn.execute("UPDATE history SET spin_id = NULL WHERE id <= 40")
+        conn.execute("UPDATE history SET amount = NULL, outcome_number = NULL, bet_desc = NULL, timestamp = NULL WHERE id = 41")
+    conn.close()
+    directory = str(tmp_path / "columnar")
+    export_columnar(source, directory)
+    history = ColumnarTable(directory, "history")
+    assert sorted(history.nulls) == ["amount", "outcome_number", "spin_id"]
+    assert history.decode("spin_id", 39, 41) == [None, history["spin_id"][40]]
+    assert history.decode("amount", 40, 41) == [None]
+    assert not os.path.exists(os.path.join(directory, "history", "id.null.npy"))
+
+    target = str(tmp_path / "restored.db")
+    import_data(target, directory, "columnar", rebuild_stats=False)
+    assert _dump(target, "history") == _dump(source, "history")
+    # וגם ייצוא חוזר של מה שיובא (כולל ה- NULL) עובד
+    again = str(tmp_path / "again")
+    assert export_columnar(target, again)["history"] == 150
+    assert ColumnarTable(again, "history").decode("spin_id", 0, 1) == [None]
@@ -0,0 +1,93 @@
+# בדיקות לסגירת סיבוב אטומית ולמצב Write-Behind של DatabaseManager: תור בזיכרון, ריקון לפי גודל, לפי זמן, בקריאה ובסגירה.
+import sqlite3
+import time
+
+import pytest
+
+from database import DatabaseManager
+
+
+def _count_history(db_file):
+    conn = sqlite3.connect(db_file)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _settle(db, pid, balance):
+    db.settle_spin(pid, balance, "Number 7", 1.0, "LOSS", 12)
+
+
+def test_settlement_is_one_transaction(db):
+    pid = db.create_player("atomic", 100.0)
+    with db._get_connection() as conn:
+        conn.execute("CREATE TEMP TRIGGER fail BEFORE INSERT ON history BEGIN SELECT RAISE(ABORT, 'disk full'); END")
+    with pytest.raises(sqlite3.IntegrityError, match="disk full"):
+        _settle(db, pid, 99.0)
+    # שורת ההיסטוריה נכשלה, ולכן גם עדכון היתרה שבאותה טרנזקציה בוטל
+    assert db.load_player("atomic")["balance"] == 100.0
+
+
+def test_spins_wait_in_the_queue_until_a_batch_is_full(db_file):
+    db = DatabaseManager(db_file, write_behind=True, flush_every=5, flush_interval=3600)
+    try:
+        pid = db.create_player("queued", 100.0)
+        for i in range(4):
+            _settle(db, pid, 100.0 - i)
+        assert _count_history(db_file) == 0
+        _settle(db, pid, 95.0)
+        assert _count_history(db_file) == 5
+        assert db._pending_history == [] and db._pending_balances == {}
+    finally:
+        db.close()
+
+
+def test_reads_and_close_flush_the_queue(db_file):
+    db = DatabaseManager(db_file, write_behind=True, flush_interval=3600)
+    pid = db.create_player("reader", 100.0)
+    _settle(db, pid, 99.0)
+    # קריאה דרך המנהל רואה את מה שבתור
+    assert db.load_player("reader")["balance"] == 99.0
+    assert len(db.get_player_history(pid)) == 1
+    _settle(db, pid, 98.0)
+    db.close()
+    db.close()  # בטוח לקריאה כפולה
+    with DatabaseManager(db_file) as reopened:
+        assert reopened.load_player("reader")["balance"] == 98.0
+        assert len(reopened.get_player_history(pid)) == 2
+
+
+def test_background_thread_flushes_on_interval(db_file):
+    db = DatabaseManager(db_file, write_behind=True, flush_interval=0.05)
+    try:
+        pid = db.create_player("timer", 100.0)
+        _settle(db, pid, 99.0)
+        deadline = time.monotonic() + 5
+        while _count_history(db_file) < 1 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert _count_history(db_file) == 1
+    finally:
+        db.close()
+
+
+def test_loading_stats_never_flushes_half_a_table_spin(db_file):
+    db = DatabaseManager(db_file, write_behind=True, flush_interval=3600)
+    try:
+        known = db.create_player("known", 100.0)
+        fresh = db.create_player("fresh", 100.0)
+        db.get_player_stats(known)
+        # הסטטיסטיקה של fresh נטענת באמצע (backfill_stats מרוקן את התור) - השורות של known לא נכתבות בלי היתרה שלו
+        db.settle_table(7, [(known, 90.0, [("Red", 10.0, "LOSS")]), (fresh, 80.0, [("Black", 20.0, "LOSS")])])
+        conn = sqlite3.connect(db_file)
+        try:
+            assert conn.execute("SELECT COUNT(*) FROM history").fetchone()[0] == 0
+            assert conn.execute("SELECT balance FROM players WHERE id = ?", (known,)).fetchone()[0] == 100.0
+        finally:
+            conn.close()
+    finally:
+        db.close()
+    with DatabaseManager(db_file) as reopened:
+        assert reopened.load_player("known")["balance"] == 90.0
+        assert reopened.load_player("fresh")["balance"] == 80.0
+        assert reopened.get_player_stats(known).spins == 1
@@ -0,0 +1,326 @@
+# transfer.py
+# ייצוא וייבוא בכמויות גדולות (Bulk) של הטבלאות players, history ו- history_daily, בזרימה (Streaming) במנות ובזיכרון קבוע.
+# שני פורמטים:
+#   csv      - קובץ CSV לכל טבלה (עם שורת כותרת), לגיבוי ולהעברה לכלים אחרים.
+#   columnar - תיקייה לכל טבלה עם קובץ .npy לכל עמודה, שנקרא חזרה דרך Memory-Mapping (np.load(mmap_mode='r')) בלי להעתיק לזיכרון.
+#              מחרוזות חוזרות (תיאור הימור, סטטוס) נשמרות כקודים (Interning), חותמות זמן כ- datetime64[s], ושאר המחרוזות
+#              כבלוק UTF-8 אחד עם מערך היסטים (Offsets). NULL בעמודה מספרית או מחרוזתית נשמר במסכה (<column>.null.npy).
+# הייבוא משתמש ב- executemany במנות בתוך טרנזקציה אחת לכל טבלה, והאינדקסים של הטבלה נמחקים לפניו ונבנים מחדש בסופו.
+#
+# דוגמאות:
+#   python transfer.py export --db casino.db --format columnar --dir backup/
+#   python transfer.py import --db restored.db --format columnar --dir backup/
+import argparse
+import csv
+import json
+import os
+import sqlite3
+
+import numpy as np
+
+from database import DatabaseManager
+
+# העמודות של כל טבלה וסוג האחסון שלהן בפורמט העמודתי:
+# dtype של NumPy, 'code' (מחרוזת חוזרת -> קוד int32, None הוא -1), 'datetime' (None הוא NaT) או 'str' (בלוק UTF-8 + היסטים).
+# לעמודות מסוג dtype ו- 'str' אין ערך פנוי שמסמן NULL, ולכן הן מקבלות מסכת NULL (bool) בנפרד
+TABLES = {
+    "players": (("id", "int64"), ("name", "str"), ("balance", "float64")),
+    "history": (
+        ("id", "int64"), ("player_id", "int64"), ("bet_desc", "code"), ("amount", "float64"),
+        ("status", "code"), ("outcome_number", "int32"), ("timestamp", "datetime"), ("spin_id", "int64"),
+    ),
+    "history_daily": (
+        ("player_id", "int64"), ("day", "str"), ("spins", "int64"), ("total_bets", "int64"),
+        ("total_wagered", "float64"), ("net_pl", "float64"), ("max_win", "float64"), ("max_loss", "float64"),
+        ("win_count", "int64"), ("outcome_counts", "str"),
+    ),
+}
+FORMATS = ("csv", "columnar")
+META_FILE = "meta.json"
+
+
+def _iter_chunks(conn: sqlite3.Connection, table: str, chunk_size: int):
+    """גנרטור של מנות שורות מהטבלה, בדפדוף לפי rowid (Keyset) - זיכרון קבוע לכל גודל טבלה."""
+    names = ", ".join(name for name, _ in TABLES[table])
+    query = f"SELECT rowid, {names} FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?"
+    last_rowid = 0
+    while True:
+        rows = conn.execute(query, (last_rowid, chunk_size)).fetchall()
+        if not rows:
+            return
+        last_rowid = rows[-1][0]
+        yield [row[1:] for row in rows]
+
+
+def _open_snapshot(db_file: str) -> sqlite3.Connection:
+    """חיבור לקריאה בלבד בתוך טרנזקציה אחת: ב- WAL כל הקריאות רואות את אותה תמונת מצב, גם אם המשחק ממשיך לכתוב."""
+    conn = sqlite3.connect(f"file:{db_file}?mode=ro", uri=True, isolation_level=None)
+    conn.execute("BEGIN")
+    return conn
+
+
+def export_csv(db_file: str, directory: str, tables=tuple(TABLES), chunk_size: int = 50000) -> dict:
+    """מייצאת כל טבלה לקובץ <table>.csv. מחזירה כמה שורות נכתבו מכל טבלה."""
+    os.makedirs(directory, exist_ok=True)
+    conn = _open_snapshot(db_file)
+    counts = {}
+    try:
+        for table in tables:
+            with open(os.path.join(directory, f"{table}.csv"), "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(name for name, _ in TABLES[table])
+                counts[table] = 0
+                for rows in _iter_chunks(conn, table, chunk_size):
+                    writer.writerows(rows)
+                    counts[table] += len(rows)
+    finally:
+        conn.close()
+    return counts
+
+
+def export_columnar(db_file: str, directory: str, tables=tuple(TABLES), chunk_size: int = 50000) -> dict:
+    """
+    מייצאת כל טבלה לתיקייה <directory>/<table>/ עם קובץ לכל עמודה. מספר השורות ידוע מראש (באותה תמונת מצב),
+    ולכן כל עמודה נכתבת ישירות לקובץ ממופה (open_memmap) מנה אחרי מנה, בלי להחזיק את הטבלה בזיכרון.
+    ערכי NULL נכתבים כ- 0 (או מחרוזת ריקה) ומסומנים במסכה; מסכה של עמודה שאין בה אף NULL נמחקת בסוף.
+    """
+    conn = _open_snapshot(db_file)
+    meta = {}
+    try:
+        for table in tables:
+            table_dir = os.path.join(directory, table)
+            os.makedirs(table_dir, exist_ok=True)
+            total = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            columns = {}
+            codes = {}
+            nulls = {}  # מסכות NULL לעמודות שאין להן ערך פנוי לסימון NULL
+            has_nulls = set()
+            for name, kind in TABLES[table]:
+                path = os.path.join(table_dir, f"{name}.npy")
+                if kind not in ("code", "datetime"):
+                    nulls[name] = np.lib.format.open_memmap(path.replace(".npy", ".null.npy"), mode="w+", dtype=np.bool_, shape=(total,))
+                if kind == "str":
+                    # היסט התחלה לכל שורה + היסט סוף אחרון; הבלוק עצמו נכתב לקובץ נפרד תוך כדי
+                    offsets = np.lib.format.open_memmap(path.replace(".npy", ".offsets.npy"), mode="w+", dtype=np.int64, shape=(total + 1,))
+                    offsets[0] = 0
+                    columns[name] = (offsets, open(os.path.join(table_dir, f"{name}.bin"), "wb"))
+                else:
+                    dtype = {"code": np.int32, "datetime": "datetime64[s]"}.get(kind, kind)
+                    columns[name] = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=(total,))
+                if kind == "code":
+                    codes[name] = {}
+
+            written = 0
+            for rows in _iter_chunks(conn, table, chunk_size):
+                end = written + len(rows)
+                for index, (name, kind) in enumerate(TABLES[table]):
+                    values = [row[index] for row in rows]
+                    if name in nulls:
+                        missing = [value is None for value in values]
+                        if any(missing):
+                            nulls[name][written:end] = missing
+                            has_nulls.add(name)
+                            blank = "" if kind == "str" else 0
+                            values = [blank if value is None else value for value in values]
+                    if kind == "str":
+                        offsets, blob = columns[name]
+                        encoded = [value.encode("utf-8") for value in values]
+                        offsets[written + 1:end + 1] = offsets[written] + np.cumsum([len(value) for value in encoded])
+                        blob.write(b"".join(encoded))
+                    elif kind == "code":
+                        interned = codes[name]
+                        columns[name][written:end] = [-1 if v is None else interned.setdefault(v, len(interned)) for v in values]
+                    else:
+                        columns[name][written:end] = values
+                written = end
+
+            for name, kind in TABLES[table]:
+                if kind == "str":
+                    offsets, blob = columns[name]
+                    offsets.flush()
+                    blob.close()
+                else:
+                    columns[name].flush()
+            for mask in nulls.values():
+                mask.flush()
+            for name in set(nulls) - has_nulls:
+                del nulls[name]  # סוגרים את המיפוי לפני שמוחקים את המסכה הריקה
+                os.remove(os.path.join(table_dir, f"{name}.null.npy"))
+            meta[table] = {
+                "rows": written,
+                "columns": TABLES[table],
+                "codes": {name: list(interned) for name, interned in codes.items()},
+                "nulls": sorted(has_nulls),
+            }
+    finally:
+        conn.close()
+    with open(os.path.join(directory, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    return {table: info["rows"] for table, info in meta.items()}
+
+
+class ColumnarTable:
+    """
+    טבלה מיוצאת בפורמט העמודתי, פתוחה לקריאה דרך Memory-Mapping: העמודות הן np.memmap על הקבצים עצמם (בלי העתקה),
+    codes ממפה עמודות מקודדות לרשימת הערכים שלהן, ו- nulls ממפה עמודות שיש בהן NULL למסכה שלהן
+    (בעמודה עצמה במקום NULL יש 0; decode מחזיר None).
+    """
+    def __init__(self, directory: str, table: str):
+        with open(os.path.join(directory, META_FILE), encoding="utf-8") as f:
+            info = json.load(f)[table]
+        self.table = table
+        self.rows = info["rows"]
+        self.kinds = dict(info["columns"])
+        self.codes = info["codes"]
+        self.columns = {}
+        self._blobs = {}
+        table_dir = os.path.join(directory, table)
+        # ייצוא מלפני המסכות לא כולל את המפתח nulls
+        self.nulls = {name: np.load(os.path.join(table_dir, f"{name}.null.npy"), mmap_mode="r") for name in info.get("nulls", ())}
+        for name, kind in self.kinds.items():
+            if kind == "str":
+                self.columns[name] = np.load(os.path.join(table_dir, f"{name}.offsets.npy"), mmap_mode="r")
+                blob_path = os.path.join(table_dir, f"{name}.bin")
+                # np.memmap לא מסוגל למפות קובץ ריק
+                self._blobs[name] = np.memmap(blob_path, dtype=np.uint8, mode="r") if os.path.getsize(blob_path) else np.empty(0, np.uint8)
+            else:
+                self.columns[name] = np.load(os.path.join(table_dir, f"{name}.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def decode(self, name: str, start: int, stop: int) -> list:
+        """הערכים המקוריים (כמו שהם במסד, כולל NULL כ- None) של עמודה אחת בטווח שורות."""
+        kind = self.kinds[name]
+        if kind == "code":
+            values = self.codes[name]
+            return [None if code < 0 else values[code] for code in self.columns[name][start:stop].tolist()]
+        if kind == "datetime":
+            return [None if value == "NaT" else value.replace("T", " ")
+                    for value in np.datetime_as_string(self.columns[name][start:stop], unit="s").tolist()]
+        if kind == "str":
+            offsets, blob = self.columns[name], self._blobs[name]
+            values = [bytes(blob[offsets[i]:offsets[i + 1]]).decode("utf-8") for i in range(start, stop)]
+        else:
+            values = self.columns[name][start:stop].tolist()
+        mask = self.nulls.get(name)
+        if mask is None:
+            return values
+        return [None if missing else value for value, missing in zip(values, mask[start:stop].tolist())]
+
+    def iter_rows(self, chunk_size: int = 50000):
+        """מנות של שורות (tuples) בסדר העמודות של הטבלה - לייבוא חזרה למסד."""
+        for start in range(0, self.rows, chunk_size):
+            stop = min(start + chunk_size, self.rows)
+            yield list(zip(*(self.decode(name, start, stop) for name in self.kinds)))
+
+
+def history_frame(directory: str):
+    """HistoryFrame (ראו history_frame.py) מעל ייצוא עמודתי של history - העמודות המספריות נשארות ממופות מהקבצים."""
+    from history_frame import HistoryFrame, STATUS_WIN
+    history = ColumnarTable(directory, "history")
+    statuses = history.codes["status"]
+    win_code = statuses.index("WIN") if "WIN" in statuses else -2
+    return HistoryFrame.from_columns(
+        history["id"], history["outcome_number"], history["amount"],
+        np.where(history["status"] == win_code, STATUS_WIN, 0).astype(np.uint8),
+        history["bet_desc"], history.codes["bet_desc"]
+    )
+
+
+def _iter_csv(path: str, chunk_size: int):
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        next(reader)  # שורת הכותרת
+        chunk = []
+        for row in reader:
+            # תא ריק ב- CSV הוא NULL; את ההמרה למספרים עושה SQLite לפי סוג העמודה (Type Affinity)
+            chunk.append([value if value != "" else None for value in row])
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def import_data(db_file: str, directory: str, fmt: str = "csv", tables=tuple(TABLES), chunk_size: int = 50000,
+                rebuild_stats: bool = True) -> dict:
+    """
+    מייבאת טבלאות שיוצאו (עם אותם מזהים) לתוך db_file, שנוצר או מועבר לגרסת הסכמה העדכנית.
+    כל טבלה נטענת בטרנזקציה אחת עם executemany במנות, והאינדקסים שלה נבנים מחדש רק בסוף.
+    מזהה שכבר קיים ביעד מבטל את הייבוא של כל הטבלה (IntegrityError). בסוף מחושבות מחדש הסטטיסטיקות של השחקנים.
+    """
+    DatabaseManager(db_file).close()  # יצירת הקובץ / הגירת הסכמה
+    conn = sqlite3.connect(db_file, isolation_level=None)
+    counts = {}
+    try:
+        for table in tables:
+            if fmt == "csv":
+                path = os.path.join(directory, f"{table}.csv")
+                if not os.path.exists(path):
+                    continue
+                with open(path, newline="", encoding="utf-8") as f:
+                    names = next(csv.reader(f))
+                chunks = _iter_csv(path, chunk_size)
+            else:
+                if not os.path.isdir(os.path.join(directory, table)):
+                    continue
+                source = ColumnarTable(directory, table)
+                names = list(source.kinds)
+                chunks = source.iter_rows(chunk_size)
+            # העמודות לפי מה שיוצא בפועל: ייצוא מגרסה ישנה (למשל history בלי spin_id) נטען עם NULL בעמודות החסרות
+            insert = f"INSERT INTO {table} ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})"
+            indexes = conn.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (table,)
+            ).fetchall()
+            counts[table] = 0
+            conn.execute("BEGIN")
+            try:
+                for name, _ in indexes:
+                    conn.execute(f"DROP INDEX {name}")
+                for rows in chunks:
+                    conn.executemany(insert, rows)
+                    counts[table] += len(rows)
+                for _, sql in indexes:
+                    conn.execute(sql)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+    finally:
+        conn.close()
+    if rebuild_stats and {"history", "history_daily"} & set(counts):
+        with DatabaseManager(db_file) as db:
+            db.backfill_stats()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk export/import of the roulette database")
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("--db", default="casino.db")
+    parser.add_argument("--dir", required=True, help="directory to write to / read from")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--tables", default=",".join(TABLES))
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--no-stats", action="store_true", help="import: skip rebuilding player statistics")
+    opts = parser.parse_args()
+
+    tables = [t.strip() for t in opts.tables.split(",") if t.strip()]
+    unknown = set(tables) - set(TABLES)
+    if unknown:
+        parser.error(f"unknown tables: {', '.join(sorted(unknown))}")
+    if opts.command == "export":
+        export = export_csv if opts.format == "csv" else export_columnar
+        counts = export(opts.db, opts.dir, tables, opts.chunk_size)
+    else:
+        counts = import_data(opts.db, opts.dir, opts.format, tables, opts.chunk_size, not opts.no_stats)
+    for table, count in counts.items():
+        print(f"{table}: {count} rows")
+
+
+if __name__ == "__main__":
+    main()
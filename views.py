@@ -1,4 +1,5 @@
 import sys
+import time
 from MainController import MainController
 from models import NumberBet, ColorBet, ParityBet
 
@@ -7,9 +8,12 @@ class ConsoleView:
     המחלקה שתספק לנו את התצוגה. בעזרתה אנחנו עומדים בדרישה עבור פרויקטים לאקדמיה להשתמש
     ב- REPL (Read-Evaluate-Print Loop), שהוא בעצם מסך שחור שמקבל פקודות בקונסול ועובר הלאה בצורה מחזורית ללא הפסקה (while True).
     """
+    RISK_HORIZON_SPINS = 100  # כמות הסיבובים שעבורה מוצג סיכון פשיטת הרגל לפני אישור הימור
+    HISTORY_PAGE_SIZE = 10  # כמות השורות בכל עמוד של מסך ההיסטוריה
     def __init__(self, controller: MainController):
         # הממשק צריך חיבור ישיר לקונטרולר שהרגע יצרנו בכדי שמישהו (Controller) באמת יעבד את מה שהשחקן רשם.
         self.controller = controller
+        self._dealer_thread = None  # ה- Thread של תשובת הדילר הנוכחית (אם יש כזו)
 
     def start(self):
         """נקודת ההתחלה של הלולאה המרכזית (REPL)."""
@@ -23,7 +27,14 @@ class ConsoleView:
         
         print(f"\nWelcome back, {player.name}. Your bankroll is ${player.get_balance():.2f}")
         
-        # לולאת REPL אינסופית שמציגה 5 אופציות כנדרש 
+        try:
+            self._run_menu()
+        finally:
+            # ביציאה (רגילה או CTRL+C) כותבים לדיסק את כל הסיבובים שעדיין ממתינים בתור ה- Write-Behind
+            self.controller.db.flush()
+
+    def _run_menu(self):
+        """לולאת REPL אינסופית שמציגה 5 אופציות כנדרש."""
         while True:
             print("\n--- OPTIONS MENU ---")
             print("1. Play a Spin (Place Bet) - הימור ולסובב את הרולטה")
@@ -46,84 +57,172 @@ class ConsoleView:
             elif choice == '5':
                 print("Cashing out. See you next time!")
                 break # יציאה סופית משברת את תהליך ה- True
+            elif choice.startswith('metrics'):
+                # פקודה נסתרת (לא מופיעה בתפריט) לאבחון ביצועים: metrics / metrics on / metrics off / metrics reset
+                self.show_metrics(choice[len('metrics'):].strip())
             else:
                 print("Invalid option. Please choose 1-5.")
 
+    def show_metrics(self, action: str = ""):
+        """מציגה את מדדי הביצועים (metrics.py): מונה ואחוזוני זמן לכל פעולה, והסיבובים האיטיים ביותר."""
+        from metrics import METRICS
+        if action == "on":
+            METRICS.enable(slowest=max(METRICS.slowest_size, 5), profile_rate=METRICS.profile_rate)
+        elif action == "off":
+            METRICS.disable()
+        elif action == "reset":
+            METRICS.reset()
+        snapshot = METRICS.snapshot()
+        print(f"\n--- METRICS ({'on' if snapshot['enabled'] else 'off'}, since {snapshot['since']}) ---")
+        if not snapshot["operations"]:
+            print("No measurements yet. Use 'metrics on' to start measuring.")
+        for name, op in snapshot["operations"].items():
+            print(f"{name:<26} n={op['count']:<7} err={op['errors']:<3} mean={op['mean_ms']:.3f}ms "
+                  f"p50={op['p50_ms']:.3f}ms p99={op['p99_ms']:.3f}ms max={op['max_ms']:.3f}ms")
+        for spin in snapshot["slowest"]:
+            parts = ", ".join(f"{name} {ms:.3f}ms" for name, ms in spin["breakdown_ms"].items())
+            print(f"Slow {spin['op']} at {spin['at']}: {spin['total_ms']:.3f}ms ({parts})")
+
     def handle_betting(self):
         """מטפל בלוגיקת תצוגה בלבד, מקבל ממשתמש מספרים וקורה ל-Controller לסובב."""
         print("\n--- PLACE YOUR BET ---")
         print("1. Number Bet (0-36)")
         print("2. Color Bet (Red / Black)")
         print("3. Parity Bet (Even / Odd)")
+        print("4. Betting Slip (multiple bets on one spin)")
         
-        b_type = input("Select bet category (1-3): ").strip()
+        b_type = input("Select bet category (1-4): ").strip()
+        if b_type == '4':
+            self.handle_slip()
+            return
         if b_type not in ['1', '2', '3']:
             print("Invalid category.")
             return
-            
+
+        bet = self._build_bet(b_type)
+        if bet is None or not self._confirm_wager([bet]):
+            return
+                
+        print("\nSpinning the wheel...")
+        # כאן View מעביר את האחריות לעשות עבודה ל- Controller האמיתי 
+        result = self.controller.resolve_spin(bet)
+        print(f"\n>> The ball landed on: {result['winning_number']} <<")
+        
+        if result['is_win']:
+            print(f"WINNER! Payout: ${result['payout']:.2f}")
+        else:
+            print(f"LOSS. You lost ${bet.amount:.2f}")
+
+    def handle_slip(self):
+        """בניית טופס הימורים: השחקן מניח כמה הימורים ורק אז מסובבים את הרולטה פעם אחת לכולם."""
+        slip = []
+        committed = 0.0  # סכום שכבר הונח בטופס, כדי לבדוק תקציב לכל הטופס ולא רק להימור הבודד
+        print("\n--- BETTING SLIP --- (leave category empty to spin)")
+        while True:
+            b_type = input(f"[Slip: {len(slip)} bets, ${committed:.2f}] Bet category (1=Number, 2=Color, 3=Parity): ").strip()
+            if not b_type:
+                break
+            if b_type not in ['1', '2', '3']:
+                print("Invalid category.")
+                continue
+            bet = self._build_bet(b_type, committed)
+            if bet is not None:
+                slip.append(bet)
+                committed += bet.amount
+
+        if not slip:
+            print("Slip is empty. No spin.")
+            return
+        if not self._confirm_wager(slip):
+            return
+
+        print("\nSpinning the wheel...")
+        result = self.controller.resolve_slip(slip)
+        print(f"\n>> The ball landed on: {result['winning_number']} <<")
+        for item in result['results']:
+            bet = item['bet']
+            if item['is_win']:
+                print(f"  {bet.get_description()}: WIN ${item['payout']:.2f}")
+            else:
+                print(f"  {bet.get_description()}: LOSS ${bet.amount:.2f}")
+        net = result['total_payout'] - result['total_wager']
+        print(f"Slip total: wagered ${result['total_wager']:.2f} | paid ${result['total_payout']:.2f} | net ${net:+.2f}")
+
+    def _confirm_wager(self, bets) -> bool:
+        """
+        מציגה לשחקן את סיכון פשיטת הרגל אם ימשיך לשחק את אותו הימור, ומבקשת אישור לפני הסיבוב.
+        החישוב אנליטי (risk.py) ולוקח מילישניות, כך שאין צורך להריץ סימולציה בכל הימור.
+        """
+        try:
+            from risk import bankroll_distribution
+        except ImportError:
+            return True  # בלי NumPy אין מחשבון סיכון, והמשחק ממשיך כרגיל
+        dist = bankroll_distribution(bets, self.controller.current_player.get_balance(), self.RISK_HORIZON_SPINS)
+        print(f"Risk of ruin if you repeat this for {self.RISK_HORIZON_SPINS} spins: {dist.risk_of_ruin * 100:.1f}% "
+              f"(median bankroll ${dist.percentile(50):.2f})")
+        return input("Confirm wager? (y/n): ").strip().lower() != 'n'
+
+    def _build_bet(self, b_type: str, committed: float = 0.0):
+        """
+        מקבל מהשחקן סכום ויעד עבור קטגוריה אחת ומחזיר אובייקט הימור מתאים למודלים.
+        במקרה של קלט לא תקין מודפסת הודעה ומוחזר None.
+        """
         try:
             amount = float(input("Enter wager amount ($): "))
             if amount <= 0:
                 print("Wager must be positive.")
-                return
+                return None
         except ValueError:
             print("Amount must be a number.")
-            return
+            return None
             
-        if not self.controller.current_player.can_afford(amount):
+        if not self.controller.current_player.can_afford(committed + amount):
             print("Insufficient funds!")
-            return
-            
-        bet = None # מאתחל הימור כריק
+            return None
         
         # יצירת סוג ההימור והמרה לאובייקט מתאים למודלים
         if b_type == '1':
             try:
                 num = int(input("Enter number (0-36): "))
                 if 0 <= num <= 36:
-                    bet = NumberBet(amount, num)
-                else:
-                    print("Number out of bounds.")
-                    return
+                    return NumberBet(amount, num)
+                print("Number out of bounds.")
             except ValueError:
                 print("Invalid number.")
-                return
         elif b_type == '2':
             col = input("Red or Black? ").strip().lower()
             if col in ['red', 'black']:
-                bet = ColorBet(amount, col)
-            else:
-                print("Invalid color.")
-                return
+                return ColorBet(amount, col)
+            print("Invalid color.")
         elif b_type == '3':
             par = input("Even or Odd? ").strip().lower()
             if par in ['even', 'odd']:
-                bet = ParityBet(amount, par)
-            else:
-                print("Invalid parity.")
-                return
-                
-        print("\nSpinning the wheel...")
-        # כאן View מעביר את האחריות לעשות עבודה ל- Controller האמיתי 
-        result = self.controller.resolve_spin(bet)
-        print(f"\n>> The ball landed on: {result['winning_number']} <<")
-        
-        if result['is_win']:
-            print(f"WINNER! Payout: ${result['payout']:.2f}")
-        else:
-            print(f"LOSS. You lost ${bet.amount:.2f}")
-            
+                return ParityBet(amount, par)
+            print("Invalid parity.")
+        return None
 
     def show_history(self):
+        """
+        מדפדפת בהיסטוריה עמוד אחרי עמוד. ההיסטוריה נקראת מה- DB בעצלות (גנרטור), כך שגם שחקן עם
+        מאות אלפי הימורים לא טוען את כולם לזיכרון.
+        """
         # השגת היסטוריה מה- Controller שמשיג מ- DB
-        history = self.controller.db.get_player_history(self.controller.current_player.player_id, limit=10)
+        history = self.controller.db.iter_player_history(self.controller.current_player.player_id, page_size=self.HISTORY_PAGE_SIZE)
+        stats = self.controller.db.get_player_stats(self.controller.current_player.player_id)
+        print("\n--- PLAYER STATS ---")
+        print(f"Spins: {stats.spins} | Bets: {stats.total_bets} | Wins: {stats.win_count} | Wagered: ${stats.total_wagered:.2f} | Net: ${stats.net_pl:+.2f}")
+        print(f"Biggest win: ${stats.max_win:.2f} | Biggest loss: ${stats.max_loss:.2f}")
+        print(f"Hot numbers: {stats.hot_numbers() or '-'} | Last outcomes: {list(stats.recent) or '-'}")
         print("\n--- RECENT ACTION ---")
-        if not history:
+        shown = 0
+        for record in history:
+            print(f"[{record.timestamp}] Bet: {record.bet_desc} | Wager: ${record.amount:.2f} | Status: {record.status} | Rolled: #{record.outcome_number}")
+            shown += 1
+            if shown % self.HISTORY_PAGE_SIZE == 0:
+                if input("-- Enter for more, 'q' to stop: ").strip().lower() == 'q':
+                    break
+        if shown == 0:
             print("No action recorded yet.")
-        else:
-            for row in history:
-                # DB schema: id, player_id, bet_desc, amount, status, outcome_number, timestamp
-                print(f"[{row[6]}] Bet: {row[2]} | Wager: ${row[3]:.2f} | Status: {row[4]} | Rolled: #{row[5]}")
 
     def clear_history(self):
         confirm = input("Are you sure you want to clear your local history? (y/n): ").strip().lower()
@@ -132,9 +231,223 @@ class ConsoleView:
             print("History cleared.")
             
     def ask_dealer(self):
+        """
+        שולחת שאלה לדילר ב- Thread רקע: המילים מודפסות למסך ברגע שהן מגיעות,
+        ובינתיים אפשר להמשיך להשתמש בתפריט.
+        """
+        if self._dealer_thread is not None and self._dealer_thread.is_alive():
+            print("The dealer is still talking. Give them a second...")
+            return
         question = input("\nAsk the dealer AI a question: ").strip()
         if question:
-            print("Thinking...")
+            print("\nDealer AI: ", end="", flush=True)
             # הפניית תקשורת עם המודל של AI
-            response = self.controller.ask_ai_dealer(question)
-            print(f"\nDealer AI: {response}")
+            self._dealer_thread = self.controller.ask_ai_dealer_in_background(
+                question,
+                on_token=lambda token: print(token, end="", flush=True),
+                on_done=lambda: print(flush=True)
+            )
+
+
+class BatchView:
+    """
+    תצוגה לא-אינטראקטיבית: מריצה תסריט פקודות (מקובץ או מ- stdin) דרך אותו MainController, בלי input() ובלי אישורים.
+    לבדיקות רגרסיה, משחק בכמויות ועומסים. שורה אחת לכל פקודה, '#' מתחיל הערה:
+        login NAME                          - מעבר לשחקן (כניסה או הרשמה)
+        bet number|color|parity AMOUNT TARGET
+        slip TYPE AMOUNT TARGET; TYPE AMOUNT TARGET; ...   - כמה הימורים על סיבוב אחד
+        repeat N COMMAND                    - אותה פקודה N פעמים (מתפרקת פעם אחת בלבד; repeat בתוך repeat מכפיל)
+        history [N] | stats | balance | clear
+    הפלט נאסף בזיכרון ונכתב במנות, ובסוף נכתבת שורת JSON אחת עם סיכום הריצה.
+    """
+    OUTPUT_CHUNK_LINES = 4096  # כמות שורות פלט שנצברות לפני כתיבה אחת
+    PARSE_CACHE_SIZE = 4096  # שורות זהות (נפוץ בתסריטים) מתפרקות פעם אחת; ההימורים עצמם לא משתנים בסיבוב ולכן משותפים
+    MAX_ERROR_SAMPLES = 20
+    BET_TYPES = {"number": "1", "color": "2", "parity": "3", "1": "1", "2": "2", "3": "3"}
+
+    def __init__(self, controller: MainController, out=None, echo: bool = True, strict: bool = False):
+        self.controller = controller
+        self.out = out or sys.stdout
+        self.echo = echo  # False = בלי שורה לכל סיבוב (שגיאות, stats/history/balance והסיכום עדיין נכתבים)
+        self.strict = strict  # עצירה בשגיאה הראשונה
+        self._buffer = []
+        self._parsed = {}
+        self.summary = {
+            "lines": 0, "commands": 0, "spins": 0, "bets": 0, "wins": 0,
+            "wagered": 0.0, "paid": 0.0, "net": 0.0, "errors": 0, "error_samples": [], "players": {},
+        }
+
+    def run(self, lines, player_name: str = "PlayerOne") -> dict:
+        """מריצה את כל שורות התסריט (כל Iterable של מחרוזות - גם קובץ פתוח, שנקרא בזרימה) ומחזירה את הסיכום."""
+        import json  # נטען רק במצב Batch, כדי לא להאט את העלייה של המשחק הרגיל
+        started = time.perf_counter()
+        self._login(player_name)
+        try:
+            for lineno, line in enumerate(lines, start=1):
+                self.summary["lines"] = lineno
+                try:
+                    command = self._parse(line)
+                    if command is not None:
+                        self._execute(*command)
+                except ValueError as e:
+                    self._error(lineno, str(e))
+                    if self.strict:
+                        break
+        finally:
+            # כמו ב- ConsoleView: כל מה שממתין בתור ה- Write-Behind נכתב לפני הסיכום
+            self.controller.db.flush()
+            elapsed = time.perf_counter() - started
+            self.summary["elapsed_s"] = round(elapsed, 3)
+            self.summary["bets_per_s"] = round(self.summary["bets"] / elapsed, 1) if elapsed else 0.0
+            for key in ("wagered", "paid"):
+                self.summary[key] = round(self.summary[key], 2)
+            self.summary["players"] = {name: round(balance, 2) for name, balance in self.summary["players"].items()}
+            self.summary["net"] = round(self.summary["paid"] - self.summary["wagered"], 2)
+            self._emit(json.dumps(self.summary))
+            self._flush_output()
+        return self.summary
+
+    def _parse(self, line: str):
+        """מפרקת שורה ל- (פקודה, ארגומנטים, מספר חזרות), או None לשורה ריקה/הערה. שגיאות תחביר הן ValueError."""
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            return None
+        command = self._parsed.get(line)
+        if command is None:
+            command = self._parse_command(line)
+            if len(self._parsed) >= self.PARSE_CACHE_SIZE:
+                self._parsed.clear()
+            self._parsed[line] = command
+        return command
+
+    def _parse_command(self, line: str):
+        verb, _, rest = line.partition(" ")
+        verb, rest = verb.lower(), rest.strip()
+        if verb == "repeat":
+            count, _, inner = rest.partition(" ")
+            if not count.isdigit() or not inner.strip():
+                raise ValueError("Usage: repeat N COMMAND")
+            name, args, times = self._parse_command(inner.strip())
+            return name, args, int(count) * times
+        if verb == "bet":
+            return "bet", self._parse_bet(rest), 1
+        if verb == "slip":
+            bets = [self._parse_bet(part.strip()) for part in rest.split(";") if part.strip()]
+            if not bets:
+                raise ValueError("Usage: slip TYPE AMOUNT TARGET; TYPE AMOUNT TARGET; ...")
+            return "slip", bets, 1
+        if verb == "login":
+            if not rest:
+                raise ValueError("Usage: login NAME")
+            return "login", rest, 1
+        if verb == "history":
+            if rest and not rest.isdigit():
+                raise ValueError("Usage: history [N]")
+            return "history", int(rest or 10), 1
+        if verb in ("stats", "balance", "clear") and not rest:
+            return verb, None, 1
+        raise ValueError(f"Unknown command '{line}'")
+
+    def _parse_bet(self, text: str):
+        """אותם כללים כמו ב- ConsoleView._build_bet, בלי לשאול שוב על קלט לא תקין."""
+        parts = text.split()
+        if len(parts) != 3 or parts[0].lower() not in self.BET_TYPES:
+            raise ValueError(f"Bad bet '{text}' (expected: number|color|parity AMOUNT TARGET)")
+        b_type, target = self.BET_TYPES[parts[0].lower()], parts[2].lower()
+        try:
+            amount = float(parts[1])
+        except ValueError:
+            raise ValueError(f"Amount must be a number: '{parts[1]}'")
+        if amount <= 0:
+            raise ValueError("Wager must be positive.")
+        if b_type == "1":
+            if not target.isdigit() or not 0 <= int(target) <= 36:
+                raise ValueError(f"Number out of bounds: '{target}'")
+            return NumberBet(amount, int(target))
+        if b_type == "2":
+            if target not in ("red", "black"):
+                raise ValueError(f"Invalid color: '{target}'")
+            return ColorBet(amount, target)
+        if target not in ("even", "odd"):
+            raise ValueError(f"Invalid parity: '{target}'")
+        return ParityBet(amount, target)
+
+    def _execute(self, name: str, args, times: int):
+        handler = getattr(self, f"_do_{name}")
+        for _ in range(times):
+            handler(args)
+            # נספרות רק פקודות שהסתיימו: repeat שנעצר באמצע (למשל כשנגמרה היתרה) לא נספר במלואו
+            self.summary["commands"] += 1
+
+    def _do_bet(self, bet):
+        result = self.controller.resolve_spin(bet)
+        self._count_spin(1, bet.amount, result["payout"], result["is_win"])
+        if self.echo:
+            outcome = f"WIN paid ${result['payout']:.2f}" if result["is_win"] else f"LOSS -${bet.amount:.2f}"
+            self._emit(f"#{result['winning_number']} {bet.get_description()} {outcome} | balance ${result['new_balance']:.2f}")
+
+    def _do_slip(self, bets):
+        result = self.controller.resolve_slip(bets)
+        wins = sum(1 for item in result["results"] if item["is_win"])
+        self._count_spin(len(bets), result["total_wager"], result["total_payout"], wins)
+        if self.echo:
+            net = result["total_payout"] - result["total_wager"]
+            self._emit(f"#{result['winning_number']} slip of {len(bets)}: wagered ${result['total_wager']:.2f} "
+                       f"paid ${result['total_payout']:.2f} net ${net:+.2f} | balance ${result['new_balance']:.2f}")
+
+    def _do_login(self, name):
+        self._login(name)
+        if self.echo:
+            player = self.controller.current_player
+            self._emit(f"Logged in as {player.name} (balance ${player.get_balance():.2f})")
+
+    def _do_history(self, limit):
+        rows = self.controller.db.get_player_history(self.controller.current_player.player_id, limit)
+        for _, _, bet_desc, amount, status, outcome_number, timestamp in rows:
+            self._emit(f"[{timestamp}] Bet: {bet_desc} | Wager: ${amount:.2f} | Status: {status} | Rolled: #{outcome_number}")
+        if not rows:
+            self._emit("No action recorded yet.")
+
+    def _do_stats(self, _):
+        stats = self.controller.db.get_player_stats(self.controller.current_player.player_id)
+        self._emit(f"Spins: {stats.spins} | Bets: {stats.total_bets} | Wins: {stats.win_count} | "
+                   f"Wagered: ${stats.total_wagered:.2f} | Net: ${stats.net_pl:+.2f}")
+
+    def _do_balance(self, _):
+        self._emit(f"Balance: ${self.controller.current_player.get_balance():.2f}")
+
+    def _do_clear(self, _):
+        self.controller.db.clear_player_history(self.controller.current_player.player_id)
+        if self.echo:
+            self._emit("History cleared.")
+
+    def _login(self, name: str):
+        player = self.controller.login_or_register(name)
+        self.summary["players"][player.name] = player.get_balance()
+
+    def _count_spin(self, bets: int, wagered: float, paid: float, wins: int):
+        summary = self.summary
+        summary["spins"] += 1
+        summary["bets"] += bets
+        summary["wins"] += wins
+        summary["wagered"] += wagered
+        summary["paid"] += paid
+        player = self.controller.current_player
+        summary["players"][player.name] = player.get_balance()
+
+    def _error(self, lineno: int, message: str):
+        self.summary["errors"] += 1
+        if len(self.summary["error_samples"]) < self.MAX_ERROR_SAMPLES:
+            self.summary["error_samples"].append({"line": lineno, "error": message})
+        self._emit(f"line {lineno}: error: {message}")
+
+    def _emit(self, text: str):
+        self._buffer.append(text)
+        if len(self._buffer) >= self.OUTPUT_CHUNK_LINES:
+            self._flush_output()
+
+    def _flush_output(self):
+        if self._buffer:
+            self.out.write("\n".join(self._buffer) + "\n")
+            self._buffer = []
+        self.out.flush()